@@ -0,0 +1,190 @@
+import bisect
+import csv
+import difflib
+import heapq
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+AIRPORTS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "airports.csv")
+
+# common names for metro areas that are not in any airport's name or city
+METRO_ALIASES = {
+    "nyc": "New York",
+    "new york city": "New York",
+    "big apple": "New York",
+    "la": "Los Angeles",
+    "socal": "Los Angeles",
+    "bay area": "San Francisco Bay Area",
+    "dc": "Washington",
+    "washington dc": "Washington",
+    "dfw": "Dallas",
+    "chi town": "Chicago",
+    "south florida": "Miami",
+}
+# words that don't help tell airports apart
+STOPWORDS = {"airport", "international", "intl", "regional", "the"}
+# below this a match is only a suggestion, not a resolution
+MIN_RESOLVE_SCORE = 0.75
+# keys compared in detail for a fuzzy lookup, picked by shared trigrams
+FUZZY_CANDIDATES = 8
+
+class Airport(NamedTuple):
+    iata: str
+    name: str
+    city: str
+    region: str
+    country: str
+    metro: str
+    aliases: Tuple[str, ...]
+    rank: int  # position in the data file, airports of a city or metro are listed busiest first
+
+class AirportMatch(BaseModel):
+    iata: str
+    name: str
+    city: str
+    region: str
+    country: str
+    metro: str
+    score: float
+    matched: str  # the index key the query matched, e.g. "nyc" or "chicago"
+
+def normalize(text: str) -> str:
+    """lowercase ascii words without punctuation or stopwords, e.g. "São Paulo Int'l" -> "sao paulo"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    words = re.sub(r"[^a-z0-9]+", " ", text.lower().replace("'", "")).split()
+    return " ".join(word for word in words if word not in STOPWORDS)
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class AirportIndex:
+    """offline airport gazetteer with exact, prefix and fuzzy lookup
+
+    every airport is indexed under its IATA code, name, city, "city region", aliases (also
+    prefixed with the city) and metro area. Exact keys are a dict lookup, prefixes a binary search over the sorted keys, and
+    misspellings are matched by trigram overlap, so lookups take microseconds and never need
+    an LLM.
+    """
+
+    def __init__(self, airports: List[Airport]):
+        self.airports = {airport.iata: airport for airport in airports}
+        self.keys: Dict[str, List[str]] = {}
+        for airport in airports:
+            names = [airport.iata, airport.name, airport.city, f"{airport.city} {airport.region}", f"{airport.city} {airport.country}", airport.metro]
+            # aliases alone and with the city, e.g. "hobby" and "houston hobby"
+            names += [name for alias in airport.aliases for name in (alias, f"{airport.city} {alias}")]
+            for name in names:
+                self._add(normalize(name), airport.iata)
+        for alias, metro in METRO_ALIASES.items():
+            for airport in airports:
+                if airport.metro == metro:
+                    self._add(normalize(alias), airport.iata)
+        for codes in self.keys.values():
+            codes.sort(key=lambda code: self.airports[code].rank)
+        self.sorted_keys = sorted(self.keys)
+        self.trigram_index: Dict[str, Set[str]] = {}
+        self.trigram_counts: Dict[str, int] = {}
+        for key in self.keys:
+            grams = trigrams(key)
+            self.trigram_counts[key] = len(grams)
+            for gram in grams:
+                self.trigram_index.setdefault(gram, set()).add(key)
+        # users repeat the same few cities, so ranked results are memoized per query
+        self._ranked = lru_cache(maxsize=4096)(self._rank)
+
+    def _add(self, key: str, iata: str):
+        if key and iata not in self.keys.setdefault(key, []):
+            self.keys[key].append(iata)
+
+    def _matches(self, key: str, score: float) -> List[Tuple[str, float, str]]:
+        # the first airport of a key is the busiest, the others score slightly lower
+        return [(code, round(score - 0.01 * idx, 3), key) for idx, code in enumerate(self.keys[key])]
+
+    def search(self, query: str, limit: int = 5) -> List[AirportMatch]:
+        """best matching airports for free text such as "nyc", "Chicago O'Hare" or "Sna Fransisco" """
+        return [
+            AirportMatch(**{field: getattr(self.airports[code], field) for field in ("iata", "name", "city", "region", "country", "metro")}, score=score, matched=matched)
+            for code, score, matched in self._ranked(query)[:limit]
+        ]
+
+    def _rank(self, query: str) -> Tuple[Tuple[str, float, str], ...]:
+        candidates: List[Tuple[str, float, str]] = []
+        # an IATA code anywhere in the text, e.g. "New York (JFK)"
+        for code in re.findall(r"\b[A-Za-z]{3}\b", query):
+            if code.upper() in self.airports and (code.isupper() or len(query.strip()) == 3):
+                candidates.append((code.upper(), 1.0, code.upper()))
+
+        key = normalize(query)
+        if key in self.keys:
+            candidates += self._matches(key, 0.99)
+        elif key:
+            # prefixes, e.g. "san fran"
+            start = bisect.bisect_left(self.sorted_keys, key)
+            for other in self.sorted_keys[start:start + 20]:
+                if not other.startswith(key):
+                    break
+                candidates += self._matches(other, 0.8 + 0.15 * len(key) / len(other))
+            # misspellings: keys sharing the most trigrams, scored by the better of their
+            # Dice coefficient and an edit-based ratio, which forgives swapped letters
+            grams = trigrams(key)
+            shared: Dict[str, int] = {}
+            for gram in grams:
+                for other in self.trigram_index.get(gram, ()):
+                    shared[other] = shared.get(other, 0) + 1
+            for other in heapq.nlargest(FUZZY_CANDIDATES, shared, key=shared.get):
+                dice = 2 * shared[other] / (len(grams) + self.trigram_counts[other])
+                ratio = difflib.SequenceMatcher(None, key, other).ratio()
+                similarity = max(dice, ratio)
+                if similarity >= 0.5:
+                    candidates += self._matches(other, 0.9 * similarity)
+
+        best: Dict[str, Tuple[float, str]] = {}
+        for code, score, matched in candidates:
+            if code not in best or score > best[code][0]:
+                best[code] = (score, matched)
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], self.airports[item[0]].rank))
+        return tuple((code, score, matched) for code, (score, matched) in ranked)
+
+    def resolve(self, query: Optional[str]) -> Optional[str]:
+        """the IATA code of the busiest airport matching query, or None if nothing matches well enough"""
+        if not query or not str(query).strip():
+            return None
+        matches = self.search(str(query), limit=1)
+        if matches and matches[0].score >= MIN_RESOLVE_SCORE:
+            return matches[0].iata
+        return None
+
+def load_airports(path: str = AIRPORTS_CSV) -> List[Airport]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [
+            Airport(
+                iata=row["iata"],
+                name=row["name"],
+                city=row["city"],
+                region=row["region"],
+                country=row["country"],
+                metro=row["metro"],
+                aliases=tuple(alias for alias in row["aliases"].split(";") if alias),
+                rank=rank,
+            )
+            for rank, row in enumerate(csv.DictReader(f))
+        ]
+
+@lru_cache(maxsize=1)
+def get_airport_index() -> AirportIndex:
+    """the shared index, built on first use"""
+    return AirportIndex(load_airports())
+
+def resolve_airport(query: Optional[str]) -> Optional[str]:
+    """map a city, airport name, alias or code to an IATA code, e.g. "nyc" -> "JFK" """
+    return get_airport_index().resolve(query)
+
+def search_airports(query: str, limit: int = 5) -> List[AirportMatch]:
+    """ranked airport suggestions for free text"""
+    return get_airport_index().search(query, limit)
@@ -0,0 +1,29 @@
+import os
+from functools import lru_cache
+from typing import Optional
+from pydantic import BaseModel
+
+class Settings(BaseModel):
+    deepseek_api_key: Optional[str] = None
+    deepseek_base_url: str = "https://api.deepseek.com/v1/chat/completions"
+    booking_workers: int = 2
+    booking_max_rss_mb: float = 4096
+    booking_timeout_seconds: float = 1800
+    booking_max_queued: int = 100
+    booking_max_finished: int = 500
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """load .env once and read the app's settings, every module gets them from here"""
+    # imported here, nothing should touch the environment just by being imported
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return Settings(
+        deepseek_api_key=os.getenv("DEEPSEEK_API_KEY"),
+        booking_workers=int(os.getenv("BOOKING_WORKERS", "2")),
+        booking_max_rss_mb=float(os.getenv("BOOKING_MAX_RSS_MB", "4096")),
+        booking_timeout_seconds=float(os.getenv("BOOKING_TIMEOUT_SECONDS", "1800")),
+        booking_max_queued=int(os.getenv("BOOKING_MAX_QUEUED", "100")),
+        booking_max_finished=int(os.getenv("BOOKING_MAX_FINISHED", "500")),
+    )
@@ -1,15 +1,8 @@
-import os
-from dotenv import load_dotenv
-import requests
 import json
 import re
 from typing import List, Dict, Optional
-
-load_dotenv()
-
-# DeepSeek API configuration
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1/chat/completions"
+from .airports import resolve_airport
+from .config import get_settings
 
 def extract_flight_info_from_message(user_message: str) -> dict:
     """use LLM to extract flight information from the most recent user message"""
@@ -39,8 +32,12 @@ def extract_flight_info_from_message(user_message: str) -> dict:
         """
         
         # make API request to DeepSeek for extraction
+        # imported here, requests is slow to import and only needed once a message comes in
+        import requests
+
+        settings = get_settings()
         headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+            "Authorization": f"Bearer {settings.deepseek_api_key}",
             "Content-Type": "application/json"
         }
         
@@ -54,7 +51,7 @@ def extract_flight_info_from_message(user_message: str) -> dict:
             "temperature": 0.1  # Low temperature for consistent extraction
         }
         
-        response = requests.post(DEEPSEEK_BASE_URL, headers=headers, json=payload)
+        response = requests.post(settings.deepseek_base_url, headers=headers, json=payload)
         response.raise_for_status()
         
         result = response.json()
@@ -76,12 +73,15 @@ def extract_flight_info_from_message(user_message: str) -> dict:
 def update_flight_info(current_info: dict, new_info: dict) -> dict:
     """merge new flight information with existing information"""
     if not current_info:
-        return new_info
+        current_info = dict(new_info)
     
     # Update only non-null and non-empty values
     for key, value in new_info.items():
         # Skip if value is None, empty string, "null" string, or other falsy values
         if value is not None and value != "" and value != "null" and value != "None":
             current_info[key] = value
+            # map each newly mentioned city to its airport from the local gazetteer, no LLM call needed
+            if key in ("departure_city", "arrival_city"):
+                current_info[key.replace("_city", "_airport")] = resolve_airport(str(value))
     
-    return current_info 
\ No newline at end of file
+    return current_info 
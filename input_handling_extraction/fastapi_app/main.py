@@ -1,15 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 
+from .config import get_settings
 # Import routers
-from .routers import users, chat
+from .routers import users, chat, bookings
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """check the settings once at startup rather than when modules are imported"""
+    if not get_settings().deepseek_api_key:
+        raise RuntimeError("DEEPSEEK_API_KEY environment variable not set. Please add it to your .env file.")
+    yield
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Flight Booking Chat API",
     description="A chat-based API for collecting flight booking information",
-    version="1.3.0"
+    version="1.3.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware for frontend communication
@@ -24,6 +34,8 @@ app = FastAPI(
 # Include routers
 app.include_router(users.router)
 app.include_router(chat.router)
+app.include_router(bookings.router)
+app.include_router(bookings.assistance_router)
 
 # halth check endpoints
 @app.get("/")
@@ -34,21 +46,11 @@ def root():
 @app.get("/health")
 def health_check():
     """detailed health check"""
-    from .services.chat_service import ChatService
-    from .services.user_service import UserService
-    
-    # Initialize services to get session count
-    chat_service = ChatService(
-        deepseek_api_key="sk-62497041b697410a9df5f50e738e409d",
-        deepseek_base_url="https://api.deepseek.com/v1/chat/completions"
-    )
-    user_service = UserService()
-    
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_sessions": len(chat_service.chat_sessions),
-        "total_users": len(user_service.get_users_list())
+        "active_sessions": len(chat.get_chat_service().chat_sessions),
+        "total_users": len(users.user_service.get_users_list())
     }
 
 if __name__ == "__main__":
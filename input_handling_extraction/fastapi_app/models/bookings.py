@@ -0,0 +1,41 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Optional
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+class BookingJobRequest(BaseModel):
+    session_id: str
+    travelers: List[Dict[str, Any]]  # validated as src/models/chat.py UserInfo
+    billing: Dict[str, Any]  # validated as src/models/chat.py UserBillingInfo
+    # override or complete what the chat extracted, e.g. when only city names were mentioned
+    departure_airport: Optional[str] = None
+    arrival_airport: Optional[str] = None
+    cabin_class: Optional[str] = None
+    routing: Optional[str] = None
+    # no default, so a booking never goes to a live airline unless asked, "mock" for the local test site
+    site: str
+    max_steps_per_task: int = 30
+
+class StageProgress(BaseModel):
+    stage: str
+    status: str
+    success: bool
+    steps: int
+    wall_seconds: float
+
+class BookingJob(BaseModel):
+    job_id: str
+    session_id: str
+    site: str
+    status: JobStatus = "queued"
+    flight_info: Dict[str, Any]
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    stages: List[StageProgress] = []
+    failed_stage: Optional[str] = None
+    run_id: Optional[str] = None
+    total_steps: int = 0
+    total_tokens: int = 0
+    usage: Optional[Dict[str, Any]] = None  # peak memory and CPU time of the booking's worker process
+    error: Optional[str] = None
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException
+from ..config import get_settings
+from ..models.bookings import BookingJobRequest
+from ..services.booking_service import BookingService, QueueFullError
+from .chat import get_chat_service
+from agent.assistance import create_assistance_router
+
+router = APIRouter(prefix="/bookings", tags=["bookings"])
+
+# initialize booking service, its workers start with the first job
+settings = get_settings()
+booking_service = BookingService(
+    num_workers=settings.booking_workers,
+    max_rss_mb=settings.booking_max_rss_mb,
+    timeout_seconds=settings.booking_timeout_seconds,
+    max_queued=settings.booking_max_queued,
+    max_finished=settings.booking_max_finished,
+)
+
+# agents waiting on a human publish their requests here
+assistance_router = create_assistance_router(booking_service.assistance_broker)
+
+@router.post("", status_code=202)
+def create_booking(request: BookingJobRequest):
+    """validate a chat session's flight info with traveler and billing data and queue a booking"""
+    session = get_chat_service().get_session_data(request.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        job = booking_service.submit(session["flight_info"], request)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job.job_id, "status": job.status, "queue_size": booking_service.queue_size()}
+
+@router.get("")
+def list_bookings():
+    """list all booking jobs, newest first"""
+    return booking_service.list_jobs()
+
+@router.get("/{job_id}")
+def get_booking(job_id: str):
+    """get a booking job's status, per-stage progress and result"""
+    job = booking_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Booking job not found")
+    return job
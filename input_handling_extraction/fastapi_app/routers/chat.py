@@ -1,28 +1,26 @@
-import os
-from dotenv import load_dotenv
+from functools import lru_cache
 from fastapi import APIRouter, HTTPException
+from ..config import get_settings
 from ..models.chat import ChatRequest
 from ..services.chat_service import ChatService
-from ..services.user_service import UserService
-
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-if not DEEPSEEK_API_KEY:
-    raise RuntimeError("DEEPSEEK_API_KEY environment variable not set. Please add it to your .env file.")
+from .users import user_service
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# Initialize services
-chat_service = ChatService(
-    deepseek_api_key=DEEPSEEK_API_KEY,
-    deepseek_base_url="https://api.deepseek.com/v1/chat/completions"
-)
-user_service = UserService()
+@lru_cache(maxsize=1)
+def get_chat_service() -> ChatService:
+    """the chat service shared by all routers, created on first use"""
+    settings = get_settings()
+    return ChatService(
+        deepseek_api_key=settings.deepseek_api_key,
+        deepseek_base_url=settings.deepseek_base_url
+    )
 
 @router.post("")
 def chat(request: ChatRequest):
     """handle chat messages and return LLM response with extracted flight info"""
     
+    chat_service = get_chat_service()
     # process the chat message
     result = chat_service.process_chat_message(
         content=request.content,
@@ -42,5 +40,5 @@ def chat(request: ChatRequest):
 @router.delete("/clear_sessions")
 def clear_sessions():
     """manually clear all in-memory chat sessions (admin/testing only)"""
-    chat_service.clear_sessions()
+    get_chat_service().clear_sessions()
     return {"message": "All chat sessions cleared from memory."} 
\ No newline at end of file
@@ -1,11 +1,7 @@
-import os
-from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException
 from ..models.users import UserRegistration
 from ..services.user_service import UserService
 
-load_dotenv()
-
 router = APIRouter(prefix="/users", tags=["users"])
 
 # initialize user service
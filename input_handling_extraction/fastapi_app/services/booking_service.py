@@ -0,0 +1,207 @@
+import os
+import asyncio
+import logging
+import queue
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# the booking agent in the repository's src/ directory, run_app.sh puts it on PYTHONPATH
+from models.chat import FlightInfo, UserBillingInfo, UserInfo
+from agent.assistance import AssistanceBroker
+
+from ..airports import resolve_airport
+from ..models.bookings import BookingJob, BookingJobRequest, StageProgress
+
+EMPTY_VALUES = (None, "", "null", "None")
+FINISHED_STATUSES = ("succeeded", "failed")
+
+class QueueFullError(RuntimeError):
+    """raised by submit when max_queued bookings are already waiting for a worker"""
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def build_booking(session_flight_info: dict, request: BookingJobRequest) -> Tuple[dict, List[dict], dict]:
+    """validate chat-extracted flight info and the request's traveler and billing data into the agent's models
+
+    raises ValueError (pydantic's ValidationError included) describing what is missing or invalid
+    """
+    data = {key: value for key, value in (session_flight_info or {}).items() if value not in EMPTY_VALUES}
+    # the chat extractor calls the passenger count "passengers"
+    if "passengers" in data:
+        data.setdefault("adult_passengers", data.pop("passengers"))
+    for key in ("departure_airport", "arrival_airport", "cabin_class", "routing"):
+        if getattr(request, key) not in EMPTY_VALUES:
+            data[key] = getattr(request, key)
+    # codes the request didn't give come from the cities through the offline gazetteer
+    # the request may also name an airport instead of giving its code, e.g. "O'Hare"
+    for prefix in ("departure", "arrival"):
+        if data.get(f"{prefix}_airport"):
+            data[f"{prefix}_airport"] = resolve_airport(data[f"{prefix}_airport"]) or data[f"{prefix}_airport"]
+        else:
+            data[f"{prefix}_airport"] = resolve_airport(data.get(f"{prefix}_city"))
+
+    flight_info = FlightInfo.model_validate(data)
+    missing = [key for key in ("departure_airport", "arrival_airport") if not getattr(flight_info, key)]
+    if missing:
+        raise ValueError(f"Missing airport codes: {', '.join(missing)}. The cities could not be matched to an airport, pass the codes in the request.")
+    if flight_info.round_trip and not flight_info.return_date:
+        raise ValueError("return_date is required for a round trip")
+
+    travelers = [UserInfo.model_validate(traveler) for traveler in request.travelers]
+    if len(travelers) != flight_info.adult_passengers:
+        raise ValueError(f"{flight_info.adult_passengers} passengers were requested but {len(travelers)} travelers were given")
+    billing = UserBillingInfo.model_validate(request.billing)
+
+    booking_flight_info = flight_info.model_dump()
+    booking_flight_info["departure_airport"] = flight_info.departure_airport.upper()
+    booking_flight_info["arrival_airport"] = flight_info.arrival_airport.upper()
+    booking_flight_info["cabin_class"] = flight_info.cabin_class or "economy"
+    booking_flight_info["routing"] = flight_info.routing or "any"
+    return booking_flight_info, [t.model_dump() for t in travelers], billing.model_dump()
+
+class BookingService:
+    """runs booking jobs on a pool of worker threads, each supervising one booking subprocess at a time
+
+    submit() only validates and enqueues, so API requests never wait on a browser. Throughput
+    grows with num_workers, up to what the machine can run in parallel. Every booking runs in its
+    own process under limits, so a hung or memory-hungry browser only fails its own job.
+
+    at most max_queued bookings wait for a worker, and only the last max_finished finished jobs
+    are kept, so a long-running server holds a bounded number of jobs and payloads
+    """
+
+    def __init__(self, num_workers: int = 2, logs_path: str = os.path.join("logs", "bookings"), max_rss_mb: Optional[float] = 4096, timeout_seconds: Optional[float] = 30 * 60, max_queued: int = 100, max_finished: int = 500):
+        self.num_workers = num_workers
+        self.logs_path = logs_path
+        # per booking, over all of its processes, see agent.workers.WorkerLimits
+        self.max_rss_mb = max_rss_mb
+        self.timeout_seconds = timeout_seconds
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.assistance_broker = AssistanceBroker(max_finished=max_finished)
+        self.jobs: Dict[str, BookingJob] = {}
+        self._payloads: Dict[str, tuple] = {}
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+
+    def submit(self, session_flight_info: dict, request: BookingJobRequest) -> BookingJob:
+        """validate and enqueue a booking, returning the queued job
+
+        raises QueueFullError if max_queued bookings are already waiting
+        """
+        flight_info, travelers, billing = build_booking(session_flight_info, request)
+        job = BookingJob(
+            job_id=uuid.uuid4().hex[:12],
+            session_id=request.session_id,
+            site=request.site,
+            flight_info=flight_info,
+            created_at=_now(),
+        )
+        with self._lock:
+            if len(self._payloads) >= self.max_queued:
+                raise QueueFullError(f"{len(self._payloads)} bookings are already queued, try again later")
+            self.jobs[job.job_id] = job
+            # traveler and billing details stay out of the job status
+            self._payloads[job.job_id] = (flight_info, travelers, billing, request.site, request.max_steps_per_task)
+        self._ensure_workers()
+        self._queue.put(job.job_id)
+        return job.model_copy(deep=True)
+
+    def get_job(self, job_id: str) -> Optional[BookingJob]:
+        """get a job's current status and progress"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return job.model_copy(deep=True) if job else None
+
+    def list_jobs(self) -> List[BookingJob]:
+        """list all jobs, newest first"""
+        with self._lock:
+            return [job.model_copy(deep=True) for job in reversed(list(self.jobs.values()))]
+
+    def queue_size(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_workers(self):
+        with self._lock:
+            while len(self._workers) < self.num_workers:
+                worker = threading.Thread(target=self._work, name=f"booking-worker-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            job = self.jobs[job_id]
+            for key, value in changes.items():
+                setattr(job, key, value)
+            if job.status in FINISHED_STATUSES:
+                self._evict_finished()
+
+    def _evict_finished(self):
+        """drop the oldest finished jobs beyond max_finished, queued and running jobs are always kept"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                asyncio.run(self._run(job_id))
+            except Exception as e:
+                logging.exception(f"Booking job {job_id} failed")
+                self._update(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=_now())
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        # imported here: the booking agent is slow to import and only needed once a job runs
+        from agent.workers import WorkerLimits, run_booking_worker
+
+        with self._lock:
+            flight_info, travelers, billing, site, max_steps = self._payloads.pop(job_id)
+        self._update(job_id, status="running", started_at=_now())
+
+        async def on_stage_end(outcome):
+            progress = StageProgress(
+                stage=outcome.stage,
+                status=outcome.status,
+                success=outcome.success,
+                steps=outcome.steps,
+                wall_seconds=round(outcome.wall_seconds, 3),
+            )
+            with self._lock:
+                self.jobs[job_id].stages.append(progress)
+
+        worker = await run_booking_worker(
+            dict(
+                flight_info=flight_info,
+                user_info_ls=travelers,
+                user_billing_info=billing,
+                logs_path=os.path.join(self.logs_path, job_id),
+                keep_alive=False,
+                max_steps_per_task=max_steps,
+                site=site,
+            ),
+            limits=WorkerLimits(max_rss_mb=self.max_rss_mb, timeout_seconds=self.timeout_seconds),
+            on_stage_end=on_stage_end,
+            assistance_broker=self.assistance_broker,
+        )
+        result = worker.result
+        if result is None:
+            # killed over its limits, or crashed, before the booking finished
+            self._update(job_id, status="failed", error=f"{worker.status}: {worker.error}", usage=worker.usage.summary(), finished_at=_now())
+            return
+        self._update(
+            job_id,
+            status="succeeded" if result.success else "failed",
+            run_id=result.run_id,
+            failed_stage=result.failed_stage,
+            total_steps=result.total_steps,
+            total_tokens=result.total_tokens,
+            usage=worker.usage.summary(),
+            finished_at=_now(),
+        )
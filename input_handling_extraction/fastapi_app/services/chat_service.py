@@ -1,14 +1,10 @@
 import os
-from dotenv import load_dotenv
-import requests
 import json
 from datetime import datetime
 from typing import Dict, Optional
 from ..extractor import extract_flight_info_from_message, update_flight_info
 from data_persistence.chat_saver import save_message_to_user_file
 
-load_dotenv()
-
 class ChatService:
     def __init__(self, deepseek_api_key: str, deepseek_base_url: str):
         self.deepseek_api_key = deepseek_api_key
@@ -86,6 +82,9 @@ Keep your response concise and focused on collecting the missing information."""
             "temperature": 0.7
         }
 
+        # imported here, requests is slow to import and only needed once a message comes in
+        import requests
+
         response = requests.post(self.deepseek_base_url, headers=headers, json=payload)
         response.raise_for_status()
         result = response.json()
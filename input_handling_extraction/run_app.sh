@@ -2,9 +2,13 @@
 
 echo "✈️ Starting Flight Booking Chat App..."
 
+ROOT_DIR="$(cd "$(dirname "$0")/.." && pwd)"
+
 # tart FastAPI backend in background
+# bookings run the browser agent in src/, which needs browser-use, playwright and psutil from the
+# repository's root environment rather than this directory's poetry one
 echo "🚀 Starting FastAPI backend..."
-poetry run uvicorn fastapi_app.main:app --reload --port 8000 &
+PYTHONPATH="$ROOT_DIR/src${PYTHONPATH:+:$PYTHONPATH}" uv run --project "$ROOT_DIR" uvicorn fastapi_app.main:app --reload --port 8000 &
 FASTAPI_PID=$!
 
 # wait 2 seconds
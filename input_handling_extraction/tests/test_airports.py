@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test script to verify city-to-airport resolution works offline and fast
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fastapi_app.airports import AirportIndex, load_airports, resolve_airport, search_airports
+from fastapi_app.extractor import update_flight_info
+
+CASES = [
+    ("LAX", "LAX"),
+    ("Los Angeles", "LAX"),
+    ("nyc", "JFK"),
+    ("New York (JFK)", "JFK"),
+    ("Newark", "EWR"),
+    ("Chicago", "ORD"),
+    ("Chicago Midway", "MDW"),
+    ("Dallas", "DFW"),
+    ("Dallas Love Field", "DAL"),
+    ("Houston Hobby", "HOU"),
+    ("san fran", "SFO"),
+    ("Sna Fransisco", "SFO"),
+    ("Philladelphia", "PHL"),
+    ("Washington DC", "DCA"),
+    ("São Paulo", "GRU"),
+    ("the moon", None),
+]
+
+def test_resolution():
+    """Test that cities, airport names, aliases and misspellings map to the right airport"""
+    print("=== Test 1: Resolution ===")
+    for query, expected in CASES:
+        code = resolve_airport(query)
+        if code == expected:
+            print(f"✅ {query!r} -> {code}")
+        else:
+            print(f"❌ {query!r} -> {code}, expected {expected} (candidates: {[(m.iata, m.score) for m in search_airports(query, 3)]})")
+
+def test_speed():
+    """Test that lookups take microseconds"""
+    print("\n=== Test 2: Speed ===")
+    start = time.perf_counter()
+    index = AirportIndex(load_airports())
+    print(f"Index built in {(time.perf_counter() - start) * 1000:.1f}ms ({len(index.airports)} airports, {len(index.keys)} keys)")
+    for query in ("Chicago", "Sna Fransisco"):
+        start = time.perf_counter()
+        index.resolve(query + " ")  # not memoized yet
+        cold = (time.perf_counter() - start) * 1e6
+        start = time.perf_counter()
+        for _ in range(1000):
+            index.resolve(query + " ")
+        warm = (time.perf_counter() - start) * 1e3
+        status = "✅" if cold < 5000 else "❌"
+        print(f"{status} {query!r}: {cold:.0f}us first lookup, {warm:.1f}us repeated")
+
+def test_extractor_merge():
+    """Test that the extractor fills in airport codes when cities are mentioned"""
+    print("\n=== Test 3: Extractor merge ===")
+    info = update_flight_info({}, {"departure_city": "Dallas", "arrival_city": None})
+    info = update_flight_info(info, {"arrival_city": "Chicago", "departure_date": "2025-08-01"})
+    print(f"Merged: {info}")
+    if info.get("departure_airport") == "DFW" and info.get("arrival_airport") == "ORD":
+        print("✅ SUCCESS: airport codes resolved without an LLM call")
+    else:
+        print("❌ FAILED: airport codes missing or wrong")
+
+if __name__ == "__main__":
+    test_resolution()
+    test_speed()
+    test_extractor_merge()
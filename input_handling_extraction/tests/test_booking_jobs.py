@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script to verify booking jobs are queued without blocking the API
+"""
+
+import time
+import requests
+
+TRAVELER = {
+    "first_name": "Kenneth",
+    "last_name": "Lin",
+    "gender": "Male",
+    "date_of_birth": "1999-09-15",
+    "email": "kenneth.alex.lin@gmail.com",
+    "phone_number": "+1 626 375 6087",
+}
+
+BILLING = {
+    "name_on_card": "Kenneth Lin",
+    "card_number": "4147 5678 9100",
+    "expiration_date": "09-2026",
+    "cvv": "808",
+    "billing_address": "1234 Green Valley Rd",
+    "city": "Salt Lake City",
+    "state_province": "UT",
+    "zip_code": "71854",
+    "country_region": "USA",
+}
+
+def test_booking_job():
+    """Test that a booking job is accepted right away and its progress can be polled"""
+
+    base_url = "http://localhost:8000"
+
+    # Test 1: collect flight info through the chat
+    print("=== Test 1: Chat message ===")
+    message = {
+        "role": "user",
+        "content": "I want a one way flight from DAL to HOU on 2025-08-01 for 1 passenger"
+    }
+    response = requests.post(f"{base_url}/chat", json=message)
+    if response.status_code != 200:
+        print(f"Error: {response.status_code}")
+        return
+    session_id = response.json()["session_id"]
+    print(f"Session ID: {session_id}")
+    print(f"Flight Info: {response.json()['flight_info']}")
+
+    # Test 2: a booking with the wrong number of travelers is rejected
+    print("\n=== Test 2: Invalid booking ===")
+    invalid = {"session_id": session_id, "travelers": [], "billing": BILLING, "departure_airport": "DAL", "arrival_airport": "HOU", "site": "mock"}
+    response = requests.post(f"{base_url}/bookings", json=invalid)
+    if response.status_code == 422:
+        print(f"✅ SUCCESS: rejected with {response.json()['detail']}")
+    else:
+        print(f"❌ FAILED: Expected 422, got {response.status_code}")
+
+    # Test 3: a valid booking returns a job ID without waiting for the browser
+    print("\n=== Test 3: Submit booking ===")
+    booking = {
+        "session_id": session_id,
+        "travelers": [TRAVELER],
+        "billing": BILLING,
+        "departure_airport": "DAL",
+        "arrival_airport": "HOU",
+        "cabin_class": "Basic",
+        "routing": "one_stop",
+        "site": "mock",
+    }
+    start = time.time()
+    response = requests.post(f"{base_url}/bookings", json=booking)
+    elapsed = time.time() - start
+    if response.status_code != 202:
+        print(f"❌ FAILED: Expected 202, got {response.status_code}: {response.text}")
+        return
+    job_id = response.json()["job_id"]
+    print(f"Job ID: {job_id} (accepted in {elapsed:.2f}s)")
+    if elapsed < 2:
+        print("✅ SUCCESS: booking accepted without waiting on the browser")
+    else:
+        print("❌ FAILED: submitting the booking took too long")
+
+    # Test 4: poll the job's progress
+    print("\n=== Test 4: Poll booking status ===")
+    for _ in range(10):
+        job = requests.get(f"{base_url}/bookings/{job_id}").json()
+        print(f"Status: {job['status']}, stages done: {[s['stage'] for s in job['stages']]}")
+        if job["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(3)
+    if job["status"] in ("succeeded", "failed"):
+        if job["usage"] is not None:
+            print(f"✅ SUCCESS: worker used {job['usage']['peak_rss_mb']} MB and {job['usage']['cpu_seconds']}s of CPU")
+        else:
+            print("❌ FAILED: finished job has no resource usage")
+    if "card_number" not in str(job):
+        print("✅ SUCCESS: billing details are not exposed in the job status")
+    else:
+        print("❌ FAILED: job status contains billing details")
+
+if __name__ == "__main__":
+    test_booking_job()
@@ -0,0 +1,113 @@
+import asyncio
+import base64
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+GIF_MAX_WIDTH = 960
+GIF_FRAME_DURATION_MS = 1000
+
+
+def write_json(path: str, data) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+    return path
+
+
+def write_gif(path: str, screenshots: list[str], sample_every: int = 1) -> str | None:
+    """Encodes base64 screenshots into a GIF, keeping every sample_every-th frame plus the last one"""
+    from PIL import Image
+
+    frames_b64 = screenshots[::sample_every]
+    if screenshots and frames_b64[-1] is not screenshots[-1]:
+        frames_b64.append(screenshots[-1])
+    if not frames_b64:
+        return None
+
+    frames = []
+    for frame_b64 in frames_b64:
+        image = Image.open(io.BytesIO(base64.b64decode(frame_b64))).convert("RGB")
+        if image.width > GIF_MAX_WIDTH:
+            height = round(image.height * GIF_MAX_WIDTH / image.width)
+            image = image.resize((GIF_MAX_WIDTH, height), Image.Resampling.LANCZOS)
+        frames.append(image.quantize(colors=256))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frames[0].save(
+        path,
+        save_all=True,
+        append_images=frames[1:],
+        duration=GIF_FRAME_DURATION_MS,
+        loop=0,
+        optimize=False,
+    )
+    return path
+
+
+class ArtifactWriter:
+    """Writes run artifacts (GIFs, usage JSON, conversation dumps) in a background process pool.
+
+    Submitting never blocks the event loop and runs don't wait for artifacts to be written.
+    The queue is bounded by max_pending: when it is full, GIFs are dropped (they're optional)
+    and JSON artifacts are written from a thread instead.
+
+    One writer can be shared by all bookings in a process. Call shutdown() once at exit to
+    flush whatever is still queued.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 16,
+        generate_gifs: bool = True,
+        gif_sample_every: int = 1,
+    ):
+        # spawn avoids forking a process that is running an event loop and browser threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.max_pending = max_pending
+        self.generate_gifs = generate_gifs
+        self.gif_sample_every = gif_sample_every
+        self._pending: set[Future] = set()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _try_submit(self, fn, *args) -> bool:
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                return False
+            future = self._executor.submit(fn, *args)
+            self._pending.add(future)
+        future.add_done_callback(self._on_done)
+        return True
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logging.warning(f"Failed to write artifact: {future.exception()}")
+
+    async def submit_json(self, path: str, data):
+        if not self._try_submit(write_json, path, data):
+            await asyncio.to_thread(write_json, path, data)
+
+    async def submit_gif(self, path: str, screenshots: list[str]):
+        if not self.generate_gifs:
+            return
+        if not self._try_submit(write_gif, path, screenshots, self.gif_sample_every):
+            self.dropped += 1
+            logging.info(f"Artifact queue is full, skipping GIF {path}")
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,271 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from playwright.async_api import BrowserContext, Response, Route
+from pydantic import BaseModel
+
+DEFAULT_ASSET_CACHE_DIR = "asset_cache"
+# only these are shared between runs. Documents, XHR and fetch responses carry session state
+STATIC_RESOURCE_TYPES = {"script", "stylesheet", "font", "image"}
+# response headers replayed on a hit. Set-Cookie is never stored, and bodies are stored
+# decoded, so content-encoding and content-length are left to Playwright
+REPLAYED_HEADERS = {
+    "content-type",
+    "cache-control",
+    "etag",
+    "last-modified",
+    "expires",
+    "access-control-allow-origin",
+    "timing-allow-origin",
+}
+# cap for the heuristic freshness of responses without explicit caching headers
+MAX_HEURISTIC_SECONDS = 24 * 60 * 60
+
+
+def _cache_control(headers: dict) -> dict[str, str | None]:
+    directives = {}
+    for part in headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def freshness_seconds(headers: dict) -> float:
+    """How long a shared cache may serve a response without revalidating, following RFC 9111.
+
+    Returns
+        0 when the response must not be stored in a shared cache
+    """
+    directives = _cache_control(headers)
+    if {"no-store", "private", "no-cache"} & directives.keys():
+        return 0
+    if "set-cookie" in headers:
+        return 0
+    if "*" in headers.get("vary", "") or "cookie" in headers.get("vary", "").lower():
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if (directives.get(name) or "").isdigit():
+            return float(directives[name])
+    try:
+        if "expires" in headers:
+            expires = parsedate_to_datetime(headers["expires"])
+            date = (
+                parsedate_to_datetime(headers["date"])
+                if "date" in headers
+                else datetime.now(timezone.utc)
+            )
+            return max(0.0, (expires - date).total_seconds())
+        if "last-modified" in headers:
+            # heuristic freshness: 10% of the time since the asset last changed
+            age = datetime.now(timezone.utc) - parsedate_to_datetime(
+                headers["last-modified"]
+            )
+            return min(MAX_HEURISTIC_SECONDS, max(0.0, age.total_seconds() / 10))
+    except (TypeError, ValueError):
+        return 0
+    return 0
+
+
+class CachedAsset(BaseModel):
+    url: str
+    status: int
+    headers: dict[str, str]
+    stored_at: float
+    expires_at: float
+
+
+class AssetCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    stored: int = 0
+    bytes_served: int = 0
+    bytes_stored: int = 0
+
+    def summary(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            **self.model_dump(),
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class SharedAssetCache:
+    """HTTP cache for static assets shared by every booking run, even though each run starts
+    from a fresh browser profile.
+
+    Only publicly cacheable GET responses for scripts, stylesheets, fonts and images are
+    stored, using shared-cache rules: no Set-Cookie, no Cache-Control private/no-store/no-cache
+    and no Vary on cookies. Cookies, localStorage and every document or API response stay
+    per-run, so no session state leaks between bookings.
+
+    The cache is a directory of body and metadata files written atomically, so several
+    processes can share it. With read_only=True a pre-seeded directory is served as-is.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_ASSET_CACHE_DIR,
+        read_only: bool = False,
+        max_bytes: int = 500 * 1024 * 1024,
+    ):
+        self.cache_dir = cache_dir
+        self.read_only = read_only
+        self.max_bytes = max_bytes
+        self.stats = AssetCacheStats()
+        self.context: BrowserContext | None = None
+        # URLs answered from the cache, whose responses must not be stored again
+        self._served: set[str] = set()
+        if not read_only:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.prune()
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + ".json", base + ".body"
+
+    async def attach(self, context: BrowserContext):
+        """Serves cached assets to context and stores its cacheable responses.
+
+        Attach before RequestBlocker: Playwright runs the most recently registered route
+        handler first, so blocked requests never reach the cache.
+        """
+        if context is self.context:
+            return
+        self.context = context
+        await context.route("**/*", self._handle_route)
+        if not self.read_only:
+            context.on("response", self._on_response)
+
+    def lookup(self, url: str) -> tuple[CachedAsset, bytes] | None:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                asset = CachedAsset.model_validate_json(f.read())
+            if asset.url != url or asset.expires_at < time.time():
+                return None
+            with open(body_path, "rb") as f:
+                return asset, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def store(self, url: str, status: int, headers: dict, body: bytes) -> bool:
+        freshness = freshness_seconds(headers)
+        if freshness <= 0:
+            return False
+        now = time.time()
+        asset = CachedAsset(
+            url=url,
+            status=status,
+            headers={k: v for k, v in headers.items() if k in REPLAYED_HEADERS},
+            stored_at=now,
+            expires_at=now + freshness,
+        )
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # body first, so a reader never sees metadata without its body
+        for path, data in ((body_path, body), (meta_path, asset.model_dump_json())):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb" if isinstance(data, bytes) else "w") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return True
+
+    async def _handle_route(self, route: Route):
+        request = route.request
+        if (
+            request.method != "GET"
+            or request.resource_type not in STATIC_RESOURCE_TYPES
+        ):
+            await route.fallback()
+            return
+        cached = await asyncio.to_thread(self.lookup, request.url)
+        if cached is None:
+            self.stats.misses += 1
+            await route.fallback()
+            return
+        asset, body = cached
+        self._served.add(request.url)
+        self.stats.hits += 1
+        self.stats.bytes_served += len(body)
+        await route.fulfill(status=asset.status, headers=asset.headers, body=body)
+
+    async def _on_response(self, response: Response):
+        request = response.request
+        if (
+            request.method != "GET"
+            or request.resource_type not in STATIC_RESOURCE_TYPES
+            or response.status != 200
+            or response.from_service_worker
+            or "authorization" in request.headers
+        ):
+            return
+        if request.url in self._served:
+            self._served.discard(request.url)
+            return
+        headers = await response.all_headers()
+        if freshness_seconds(headers) <= 0:
+            return
+        try:
+            body = await response.body()
+        except Exception:
+            # redirected or evicted by the browser before it could be read
+            return
+        stored = await asyncio.to_thread(
+            self.store, request.url, response.status, headers, body
+        )
+        if stored:
+            self.stats.stored += 1
+            self.stats.bytes_stored += len(body)
+
+    def prune(self):
+        """Deletes expired entries, then the oldest ones until the cache fits in max_bytes"""
+        now = time.time()
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(root, name)
+                body_path = meta_path[: -len(".json")] + ".body"
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        asset = json.load(f)
+                    size = os.path.getsize(body_path)
+                except (OSError, ValueError):
+                    continue
+                entries.append(
+                    (
+                        asset["stored_at"],
+                        asset["expires_at"],
+                        size,
+                        meta_path,
+                        body_path,
+                    )
+                )
+
+        total = sum(size for _, _, size, _, _ in entries)
+        removed = 0
+        for stored_at, expires_at, size, meta_path, body_path in sorted(entries):
+            if expires_at >= now and total <= self.max_bytes:
+                continue
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        if removed:
+            logging.info(f"Pruned {removed} entries from asset cache {self.cache_dir}")
+
+    def reset_stats(self) -> AssetCacheStats:
+        stats, self.stats = self.stats, AssetCacheStats()
+        return stats
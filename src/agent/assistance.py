@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Callable, Literal
+
+from pydantic import BaseModel
+
+DEFAULT_ASSISTANCE_TIMEOUT = 15 * 60
+
+AssistanceStatus = Literal["pending", "answered", "timed_out", "cancelled"]
+
+
+class AssistanceRequest(BaseModel):
+    request_id: str
+    booking_id: str | None = None
+    message: str
+    status: AssistanceStatus = "pending"
+    answer: str | None = None
+    created_at: str
+    answered_at: str | None = None
+    timeout_seconds: float
+
+
+class AssistanceAnswer(BaseModel):
+    answer: str = "DONE"
+
+
+class AssistanceBroker:
+    """Hands agent requests for help to humans without blocking the event loop.
+
+    request() suspends only the calling agent on a future until a human answers or the
+    timeout passes, so any number of bookings can wait at the same time. Requests can be
+    listed and answered from any thread, e.g. the FastAPI router from create_assistance_router
+    or start_console_responder. Pending requests are always kept, of the finished ones only
+    the last max_finished.
+    """
+
+    def __init__(self, max_finished: int = 500):
+        self._lock = threading.Lock()
+        self.max_finished = max_finished
+        self._requests: dict[str, AssistanceRequest] = {}
+        self._finished: deque[str] = deque()
+        self._futures: dict[str, asyncio.Future] = {}
+        self._listeners: list[Callable[[AssistanceRequest], None]] = []
+
+    def on_request(self, listener: Callable[[AssistanceRequest], None]):
+        """Registers a callback for every new request, e.g. to notify an operator"""
+        self._listeners.append(listener)
+
+    async def request(
+        self,
+        message: str,
+        booking_id: str | None = None,
+        timeout: float = DEFAULT_ASSISTANCE_TIMEOUT,
+    ) -> AssistanceRequest:
+        """Publishes a request and waits for its answer.
+
+        Returns
+            the request, with status answered and the human's answer, or timed_out
+        """
+        loop = asyncio.get_running_loop()
+        request = AssistanceRequest(
+            request_id=uuid.uuid4().hex[:8],
+            booking_id=booking_id,
+            message=message,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+            timeout_seconds=timeout,
+        )
+        future = loop.create_future()
+        with self._lock:
+            self._requests[request.request_id] = request
+            self._futures[request.request_id] = future
+        logging.info(
+            f"Assistance request {request.request_id} for booking {booking_id}: {message}"
+        )
+        for listener in self._listeners:
+            try:
+                listener(request)
+            except Exception as e:
+                logging.warning(f"Assistance listener failed: {e}")
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._finish(request.request_id, "timed_out")
+        except asyncio.CancelledError:
+            self._finish(request.request_id, "cancelled")
+            raise
+        # not get(), the request may already be evicted
+        with self._lock:
+            return request.model_copy()
+
+    def answer(self, request_id: str, answer: str = "DONE") -> AssistanceRequest:
+        """Answers a pending request. Safe to call from any thread.
+
+        Raises
+            KeyError if the request doesn't exist, ValueError if it is no longer pending
+        """
+        with self._lock:
+            request = self._requests[request_id]
+            if request.status != "pending":
+                raise ValueError(f"Request {request_id} is already {request.status}")
+            request.status = "answered"
+            request.answer = answer
+            request.answered_at = datetime.now().isoformat(timespec="seconds")
+            future = self._futures.pop(request_id)
+            self._retire(request_id)
+        future.get_loop().call_soon_threadsafe(_resolve, future)
+        return request.model_copy()
+
+    def _finish(self, request_id: str, status: AssistanceStatus):
+        with self._lock:
+            request = self._requests[request_id]
+            if request.status == "pending":
+                request.status = status
+                self._retire(request_id)
+            self._futures.pop(request_id, None)
+
+    def _retire(self, request_id: str):
+        """Drops the oldest finished requests beyond max_finished, call with the lock held"""
+        self._finished.append(request_id)
+        while len(self._finished) > self.max_finished:
+            self._requests.pop(self._finished.popleft(), None)
+
+    def get(self, request_id: str) -> AssistanceRequest:
+        with self._lock:
+            return self._requests[request_id].model_copy()
+
+    def pending(self) -> list[AssistanceRequest]:
+        with self._lock:
+            return [
+                request.model_copy()
+                for request in self._requests.values()
+                if request.status == "pending"
+            ]
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def start_console_responder(broker: AssistanceBroker) -> threading.Thread:
+    """Answers requests from stdin on a daemon thread, so the event loop never waits on input.
+
+    Type "<request id> <answer>", or just the answer when a single request is pending.
+    """
+
+    def announce(request: AssistanceRequest):
+        print(
+            f"\n🫵 User assistance has been requested [{request.request_id}]."
+            f"\nHere's the agent's request: {request.message}"
+            f"\nType DONE (or '{request.request_id} DONE') when you would like to return control to the Agent: "
+        )
+
+    def read_answers():
+        while True:
+            try:
+                line = input().strip()
+            except EOFError:
+                return
+            if not line:
+                continue
+            pending = broker.pending()
+            request_id, _, answer = line.partition(" ")
+            if request_id not in {request.request_id for request in pending}:
+                if len(pending) != 1:
+                    print(
+                        f"Prefix your answer with one of the pending request ids: {', '.join(r.request_id for r in pending) or 'none'}"
+                    )
+                    continue
+                request_id, answer = pending[0].request_id, line
+            try:
+                broker.answer(request_id, answer or "DONE")
+            except (KeyError, ValueError) as e:
+                print(e)
+
+    broker.on_request(announce)
+    thread = threading.Thread(
+        target=read_answers, name="assistance-console", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+_console_broker: AssistanceBroker | None = None
+
+
+def console_broker() -> AssistanceBroker:
+    """Process-wide broker answered from stdin, for bookings started from the command line"""
+    global _console_broker
+    if _console_broker is None:
+        _console_broker = AssistanceBroker()
+        start_console_responder(_console_broker)
+    return _console_broker
+
+
+def create_assistance_router(broker: AssistanceBroker):
+    """FastAPI router to list and answer assistance requests"""
+    from fastapi import APIRouter, HTTPException
+
+    router = APIRouter(prefix="/assistance", tags=["assistance"])
+
+    @router.get("")
+    def list_pending() -> list[AssistanceRequest]:
+        """list assistance requests waiting for an answer"""
+        return broker.pending()
+
+    @router.get("/{request_id}")
+    def get_request(request_id: str) -> AssistanceRequest:
+        """get an assistance request by id"""
+        try:
+            return broker.get(request_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Unknown assistance request")
+
+    @router.post("/{request_id}/answer")
+    def answer_request(request_id: str, body: AssistanceAnswer) -> AssistanceRequest:
+        """answer an assistance request and resume the waiting agent"""
+        try:
+            return broker.answer(request_id, body.answer)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Unknown assistance request")
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    return router
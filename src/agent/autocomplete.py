@@ -0,0 +1,153 @@
+import asyncio
+import logging
+
+from browser_use import BrowserSession
+from pydantic import BaseModel, Field
+
+# Shared helpers: the suggestion options that belong to an autocomplete input. Options in the
+# listbox the input points at (aria-controls / aria-owns) win, otherwise any visible option.
+OPTION_HELPERS_JS = r"""
+const isVisible = el => {
+  const rect = el.getBoundingClientRect();
+  const style = window.getComputedStyle(el);
+  return rect.width > 0 && rect.height > 0 && style.visibility !== "hidden" && style.display !== "none";
+};
+const OPTION_SELECTOR = '[role="option"], [role="listbox"] li, ul[class*="autocomplete" i] li, ul[class*="suggest" i] li';
+const suggestionsFor = input => {
+  const ids = [input.getAttribute("aria-controls"), input.getAttribute("aria-owns")]
+    .filter(Boolean).flatMap(value => value.split(/\s+/));
+  const listboxes = ids.map(id => document.getElementById(id)).filter(Boolean);
+  const roots = listboxes.length ? listboxes : [document];
+  return roots.flatMap(root => Array.from(root.querySelectorAll(OPTION_SELECTOR))).filter(isVisible);
+};
+// IATA codes are printed in capitals, so "DAL" matches "Dallas (Love Field) - DAL" but not "Dallas"
+const mentionsCode = (text, code) => new RegExp(`(^|[^A-Z])${code}([^A-Z]|$)`).test(text || "");
+"""
+
+# Waits for a suggestion mentioning the airport code to render, watching the DOM with a
+# MutationObserver instead of polling from Python. The option is tagged with a marker
+# attribute so Playwright can click it like a user would.
+WAIT_FOR_OPTION_JS = (
+    r"""
+(input, { code, timeoutMs, marker }) => new Promise(resolve => {
+"""
+    + OPTION_HELPERS_JS
+    + r"""
+  let observer = null;
+  let timer = null;
+  const find = () => {
+    const options = suggestionsFor(input);
+    const option = options.find(o => o.dataset && o.dataset.code === code)
+      || options.find(o => mentionsCode(o.innerText, code));
+    if (!option) return false;
+    option.setAttribute("data-select-airport", marker);
+    if (observer) observer.disconnect();
+    clearTimeout(timer);
+    resolve({ found: true, text: option.innerText.trim() });
+    return true;
+  };
+  if (find()) return;
+  observer = new MutationObserver(find);
+  observer.observe(document.body, { childList: true, subtree: true, attributes: true, characterData: true });
+  timer = setTimeout(() => {
+    observer.disconnect();
+    const shown = suggestionsFor(input).map(o => o.innerText.trim()).filter(Boolean).slice(0, 8);
+    resolve({ found: false, options: shown });
+  }, timeoutMs);
+})
+"""
+)
+
+VERIFY_AIRPORT_JS = (
+    r"""
+(input, code) => {
+"""
+    + OPTION_HELPERS_JS
+    + r"""
+  const displayed = input.value !== undefined ? input.value : input.innerText;
+  const listboxOpen = input.getAttribute("aria-expanded") === "true" || suggestionsFor(input).length > 0;
+  return { ok: mentionsCode(displayed.toUpperCase(), code) && !listboxOpen, displayed, listbox_open: listboxOpen };
+}
+"""
+)
+
+
+class SelectAirportAction(BaseModel):
+    index: int = Field(description="element index of the airport input")
+    code: str = Field(description="three letter IATA airport code, e.g. DAL")
+
+
+class SelectAirportResult(BaseModel):
+    ok: bool
+    option: str = ""
+    displayed: str = ""
+    error: str | None = None
+
+
+async def select_airport_option(
+    browser_session: BrowserSession,
+    index: int,
+    code: str,
+    timeout: float = 5.0,
+) -> SelectAirportResult:
+    """Types an airport code into an autocomplete input and picks the matching suggestion.
+
+    Args
+        timeout: seconds to wait for the suggestion to appear and to click it
+
+    Returns
+        the selected option's text and the field value read back, ok only when the field
+        shows the code and the suggestion list has closed
+    """
+    code = code.strip().upper()
+    element_node = await browser_session.get_dom_element_by_index(index)
+    if element_node is None:
+        return SelectAirportResult(
+            ok=False, error=f"element index {index} does not exist"
+        )
+    handle = await browser_session.get_locate_element(element_node)
+    if handle is None:
+        return SelectAirportResult(
+            ok=False, error=f"element index {index} is not on the page"
+        )
+    page = await browser_session.get_current_page()
+    frame = await handle.owner_frame() or page.main_frame
+
+    # typing key by key fires the keydown/input events autocomplete widgets listen for
+    await handle.fill("")
+    await handle.type(code, delay=50)
+
+    marker = f"{index}-{code}"
+    found = await handle.evaluate(
+        WAIT_FOR_OPTION_JS,
+        {"code": code, "timeoutMs": int(timeout * 1000), "marker": marker},
+    )
+    if not found["found"]:
+        shown = ", ".join(found["options"]) or "none"
+        result = SelectAirportResult(
+            ok=False,
+            error=f"no suggestion for {code} within {timeout:g}s (suggestions shown: {shown})",
+        )
+        logging.info(f"select_airport {code} on element {index}: {result}")
+        return result
+
+    result = SelectAirportResult(ok=False, option=found["text"])
+    await frame.locator(f'[data-select-airport="{marker}"]').first.click(
+        timeout=timeout * 1000
+    )
+    # some widgets animate the listbox closed
+    for _ in range(5):
+        verified = await handle.evaluate(VERIFY_AIRPORT_JS, code)
+        result.ok = verified["ok"]
+        result.displayed = verified["displayed"]
+        if result.ok:
+            break
+        await asyncio.sleep(0.1)
+    if not result.ok:
+        result.error = (
+            "the suggestion list is still open"
+            if verified["listbox_open"]
+            else f"the field does not show {code}"
+        )
+    logging.info(f"select_airport {code} on element {index}: {result}")
+    return result
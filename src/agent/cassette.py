@@ -0,0 +1,237 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Literal, TypeVar
+
+from browser_use.llm.base import BaseChatModel
+from browser_use.llm.messages import BaseMessage
+from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
+from pydantic import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+CassetteMode = Literal["record", "replay", "auto"]
+
+# parts of the prompt that change between otherwise identical runs
+VOLATILE_PATTERNS = [
+    # browser-use adds the wall clock time to every step
+    (re.compile(r"Current date and time: [^\n]*"), "Current date and time: <now>"),
+    # temp dirs and agent ids, e.g. browser_use_agent_0687f1c2-...
+    (
+        re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"),
+        "<uuid>",
+    ),
+    (re.compile(r"\b[0-9a-f]{16,}\b"), "<hex>"),
+    (re.compile(r"[ \t]+"), " "),
+]
+
+
+class CassetteMissError(Exception):
+    pass
+
+
+class CassetteStats(BaseModel):
+    hits: int = 0
+    # replay requests that matched no recording and raised CassetteMissError
+    misses: int = 0
+    # fingerprint misses answered with the next unused recording, only when strict=False
+    sequential_hits: int = 0
+    recorded: int = 0
+
+    def summary(self) -> dict:
+        return self.model_dump()
+
+
+class CassetteEntry(BaseModel):
+    """One recorded LLM call"""
+
+    index: int
+    fingerprint: str
+    model: str
+    output_format: str | None = None
+    completion: dict | str
+    thinking: str | None = None
+    usage: ChatInvokeUsage | None = None
+    latency_seconds: float | None = None
+
+
+def normalize_message(message: BaseMessage) -> str:
+    """Text of a message with images dropped and volatile parts replaced by placeholders"""
+    text = f"{message.role}: {message.text}"
+    for pattern, replacement in VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def fingerprint_request(
+    messages: list[BaseMessage], output_format: type[BaseModel] | None = None
+) -> str:
+    parts = [normalize_message(m) for m in messages]
+    parts.append(output_format.__name__ if output_format is not None else "str")
+    return hashlib.sha256("\n\n".join(parts).encode()).hexdigest()
+
+
+class CassetteLLM:
+    """Wraps a browser_use chat model and records or replays its responses from a JSONL cassette.
+
+    Requests are matched by a fingerprint of the normalized prompt text (screenshots and the
+    current time are ignored).
+
+    Modes
+        record: call the wrapped llm for every request and overwrite the cassette
+        replay: never call the wrapped llm. Works without network access or API keys. A
+            request that matches no recording raises CassetteMissError and is counted in
+            misses, e.g. after a prompt or DOM change. With strict=False the next unused
+            recording is returned instead, in the order it was recorded, which keeps a
+            drifting run going but feeds the agent answers to other prompts. Every such miss
+            is logged as a warning and counted in sequential_hits
+        auto: replay fingerprint matches and record (append) every request that doesn't match
+
+    stats() covers the whole cassette, reset_stats() the calls since the last reset, e.g. for
+    a stage's metrics.
+    """
+
+    _verified_api_keys: bool = True
+
+    def __init__(
+        self,
+        llm: BaseChatModel | None,
+        path: str,
+        mode: CassetteMode = "auto",
+        strict: bool = True,
+        model: str | None = None,
+    ):
+        if llm is None and mode != "replay":
+            raise ValueError(f"An llm is required in {mode} mode")
+        self.llm = llm
+        self.path = path
+        self.mode = mode
+        self.strict = strict
+        self.entries: list[CassetteEntry] = []
+        self._used: set[int] = set()
+        self._next_sequential = 0
+        self.totals = CassetteStats()
+        self.stage_stats = CassetteStats()
+
+        if mode == "record" or not os.path.exists(path):
+            if mode == "replay":
+                raise FileNotFoundError(f"Cassette {path} does not exist")
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            open(path, "w", encoding="utf-8").close()
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = [
+                    CassetteEntry.model_validate_json(line)
+                    for line in f
+                    if line.strip()
+                ]
+        # the recorded model name keeps token accounting consistent in replay-only runs
+        self.model = model or (
+            llm.model if llm is not None else self._recorded_model() or "cassette"
+        )
+        logging.info(
+            f"Opened LLM cassette {path} in {mode} mode with {len(self.entries)} recorded calls"
+        )
+
+    @property
+    def provider(self) -> str:
+        return self.llm.provider if self.llm is not None else "cassette"
+
+    @property
+    def name(self) -> str:
+        return self.model
+
+    @property
+    def model_name(self) -> str:
+        return self.model
+
+    def _recorded_model(self) -> str | None:
+        return self.entries[0].model if self.entries else None
+
+    def _find(self, fingerprint: str) -> CassetteEntry | None:
+        for entry in self.entries:
+            if entry.index not in self._used and entry.fingerprint == fingerprint:
+                self._count("hits")
+                return entry
+        if self.strict or self.mode != "replay":
+            return None
+        while self._next_sequential < len(self.entries):
+            entry = self.entries[self._next_sequential]
+            self._next_sequential += 1
+            if entry.index not in self._used:
+                self._count("sequential_hits")
+                logging.warning(
+                    f"Cassette {self.path} has no recording for request {fingerprint[:12]}, "
+                    f"replaying recorded call {entry.index} in order instead"
+                )
+                return entry
+        return None
+
+    def _count(self, field: str):
+        for stats in (self.totals, self.stage_stats):
+            setattr(stats, field, getattr(stats, field) + 1)
+
+    async def ainvoke(
+        self, messages: list[BaseMessage], output_format: type[T] | None = None
+    ) -> ChatInvokeCompletion:
+        fingerprint = fingerprint_request(messages, output_format)
+
+        if self.mode != "record":
+            entry = self._find(fingerprint)
+            if entry is not None:
+                self._used.add(entry.index)
+                self._next_sequential = max(self._next_sequential, entry.index + 1)
+                completion = entry.completion
+                if output_format is not None:
+                    completion = output_format.model_validate(completion)
+                return ChatInvokeCompletion(
+                    completion=completion, thinking=entry.thinking, usage=entry.usage
+                )
+            if self.mode == "replay":
+                self._count("misses")
+                raise CassetteMissError(
+                    f"No recorded response left in {self.path} for request {fingerprint[:12]}"
+                )
+
+        return await self._record(messages, output_format, fingerprint)
+
+    async def _record(
+        self,
+        messages: list[BaseMessage],
+        output_format: type[T] | None,
+        fingerprint: str,
+    ) -> ChatInvokeCompletion:
+        start = time.perf_counter()
+        result = await self.llm.ainvoke(messages, output_format)
+        latency = time.perf_counter() - start
+
+        completion = result.completion
+        if isinstance(completion, BaseModel):
+            # exclude_unset keeps action models to the single action the LLM chose,
+            # which is how browser-use reads them back
+            completion = completion.model_dump(mode="json", exclude_unset=True)
+        entry = CassetteEntry(
+            index=len(self.entries),
+            fingerprint=fingerprint,
+            model=self.llm.model,
+            output_format=output_format.__name__ if output_format is not None else None,
+            completion=completion,
+            thinking=result.thinking,
+            usage=result.usage,
+            latency_seconds=round(latency, 3),
+        )
+        self.entries.append(entry)
+        self._used.add(entry.index)
+        self._count("recorded")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(entry.model_dump_json() + "\n")
+        return result
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, **self.totals.summary()}
+
+    def reset_stats(self) -> CassetteStats:
+        stats, self.stage_stats = self.stage_stats, CassetteStats()
+        return stats
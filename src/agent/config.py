@@ -0,0 +1,50 @@
+import os
+from functools import lru_cache
+
+from pydantic import BaseModel
+
+# browser-use keeps its profiles and telemetry id here
+DEFAULT_BROWSER_USE_CONFIG_DIR = os.path.expanduser(
+    "~/Desktop/aitinerary/browser_config"
+)
+
+
+class AgentConfig(BaseModel):
+    google_api_key: str | None = None
+    openai_api_key: str | None = None
+    browser_use_config_dir: str | None = None
+
+
+@lru_cache(maxsize=1)
+def load_config() -> AgentConfig:
+    """Loads .env into the environment and reads the agent's settings, once per process.
+
+    Nothing is read at import, so importing agent modules has no side effects. Call this at
+    the start of an entry point, before creating LLM clients that read their keys from the
+    environment.
+    """
+    # imported here, only entry points need it
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return AgentConfig(
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        browser_use_config_dir=os.getenv("BROWSER_USE_CONFIG_DIR"),
+    )
+
+
+def configure_browser_use(config_dir: str | None = None) -> str:
+    """Points browser-use at config_dir, creating it.
+
+    browser-use reads BROWSER_USE_CONFIG_DIR when it is first imported, so call this before
+    importing it.
+    """
+    config_dir = (
+        config_dir
+        or load_config().browser_use_config_dir
+        or DEFAULT_BROWSER_USE_CONFIG_DIR
+    )
+    os.makedirs(config_dir, exist_ok=True)
+    os.environ["BROWSER_USE_CONFIG_DIR"] = config_dir
+    return config_dir
@@ -1,11 +1,48 @@
+import json
 import sys
+from datetime import date
 
 from browser_use import ActionResult, BrowserSession, Controller
 
+from agent.assistance import AssistanceBroker, console_broker
+from agent.autocomplete import SelectAirportAction, select_airport_option
+from agent.date_picker import SetDateAction, set_date_field
+from agent.dom_filter import FILTER_KINDS, extract_page_elements
+from agent.fare_capture import FareCapture
+from agent.fares import SelectFlightAction, select_cheapest_fare
+from agent.forms import FillFormAction, fill_form_fields
+from agent.stability import (
+    POPOVER_FIXED_SECONDS,
+    PageStability,
+    StabilityResult,
+    wait_for_stable,
+)
 
-def create_custom_controller(allow_request_assistance: bool = False) -> Controller:
+
+def create_custom_controller(
+    allow_request_assistance: bool = False,
+    page_stability: PageStability | None = None,
+    assistance_broker: AssistanceBroker | None = None,
+    booking_id: str | None = None,
+    fare_capture: FareCapture | None = None,
+) -> Controller:
     custom_controller = Controller()
 
+    async def settle(
+        browser_session: BrowserSession, fixed_seconds: float, timeout: float = 5.0
+    ) -> StabilityResult:
+        if page_stability is not None:
+            return await page_stability.wait(
+                fixed_seconds=fixed_seconds, timeout=timeout
+            )
+        page = await browser_session.get_current_page()
+        return await wait_for_stable(page, timeout=timeout)
+
+    def describe(result: StabilityResult) -> str:
+        if result.settled:
+            return f"The page settled after {result.seconds}s."
+        return f"The page was still changing ({result.waiting_on}) after {result.seconds}s."
+
     @custom_controller.action("Click and clear text in a text input element")
     async def clear_text(index: int, browser_session: BrowserSession) -> ActionResult:
         element_node = await browser_session.get_dom_element_by_index(index)
@@ -27,24 +64,145 @@ def create_custom_controller(allow_request_assistance: bool = False) -> Controll
     async def close_selected_popover(browser_session: BrowserSession) -> ActionResult:
         page = await browser_session.get_current_page()
         await page.keyboard.press("Escape")
+        result = await settle(browser_session, fixed_seconds=POPOVER_FIXED_SECONDS)
+        return ActionResult(
+            extracted_content=f"Closed an active popover that was obscuring page content. {describe(result)}"
+        )
+
+    @custom_controller.action(
+        "Wait until the page stops changing: no network requests, DOM updates or animations. Returns as soon as the page settles, or after timeout seconds. Use this instead of the wait action."
+    )
+    async def wait_for_page_stable(
+        timeout: float, browser_session: BrowserSession
+    ) -> ActionResult:
+        # not a replacement for a fixed delay, timeout is only an upper bound
+        result = await settle(
+            browser_session, fixed_seconds=0, timeout=min(max(timeout, 0.5), 10)
+        )
+        return ActionResult(extracted_content=describe(result))
+
+    @custom_controller.action(
+        f"List only the page elements relevant to the current booking step as compact JSON. kind must be one of {', '.join(FILTER_KINDS)}: search (flight search form), fares (flight result rows), traveler (passenger fields), payment (billing fields)."
+    )
+    async def list_page_elements(
+        kind: str, browser_session: BrowserSession
+    ) -> ActionResult:
+        elements = await extract_page_elements(browser_session, kind)
+        return ActionResult(
+            extracted_content=json.dumps(elements, separators=(",", ":")),
+            include_extracted_content_only_once=True,
+        )
+
+    @custom_controller.action(
+        "Fill several form fields at once. Each field targets an element index or a visible label. Existing text is replaced, so clear_text is not needed. Dropdowns take the option text, checkboxes take true/false. Returns per-field verification; fix any failed fields individually. Do not use for autocomplete or date picker fields.",
+        param_model=FillFormAction,
+    )
+    async def fill_form(
+        params: FillFormAction, browser_session: BrowserSession
+    ) -> ActionResult:
+        results = await fill_form_fields(browser_session, params.fields)
+        failed = [r for r in results if not r["ok"]]
+        summary = f"Filled {len(results) - len(failed)}/{len(results)} fields."
+        if failed:
+            summary += " Failed: " + "; ".join(
+                f"{r['target']} ({r.get('error')}, current value {r.get('actual')!r})"
+                for r in failed
+            )
+        return ActionResult(
+            extracted_content=f"{summary}\n{json.dumps(results, separators=(',', ':'))}",
+            include_extracted_content_only_once=True,
+            long_term_memory=summary,
+            # so the agent, steps_from_history and trajectory replay all see the failure
+            error=summary if failed else None,
+        )
+
+    @custom_controller.action(
+        "Set a date field, or the date picker opened by the element, to a date given as YYYY-MM-DD. Detects the picker type, falls back to navigating the calendar, verifies the displayed value and closes the picker, all in one action.",
+        param_model=SetDateAction,
+    )
+    async def set_date(
+        params: SetDateAction, browser_session: BrowserSession
+    ) -> ActionResult:
+        try:
+            target = date.fromisoformat(params.date)
+        except ValueError:
+            return ActionResult(
+                error=f"Invalid date {params.date!r}, expected YYYY-MM-DD"
+            )
+        result = await set_date_field(
+            browser_session, params.index, target, close_picker=params.close_picker
+        )
+        if not result.ok:
+            return ActionResult(
+                error=f"Could not set element {params.index} to {params.date} ({result.error or 'value did not verify'}). The field currently shows {result.displayed!r}."
+            )
+        return ActionResult(
+            extracted_content=f"Set element {params.index} to {params.date} using the {result.method} method. The field shows {result.displayed!r}."
+        )
+
+    @custom_controller.action(
+        "Enter an airport into an autocomplete field: types the IATA code, waits for the suggestions, picks the one with the code and verifies the field, all in one action.",
+        param_model=SelectAirportAction,
+    )
+    async def select_airport(
+        params: SelectAirportAction, browser_session: BrowserSession
+    ) -> ActionResult:
+        result = await select_airport_option(browser_session, params.index, params.code)
+        if not result.ok:
+            return ActionResult(
+                error=f"Could not select airport {params.code} in element {params.index} ({result.error}). The field currently shows {result.displayed!r}."
+            )
         return ActionResult(
-            extracted_content="Closed an active popover that was obscuring page content."
+            extracted_content=f"Selected {result.option!r} in element {params.index}. The field shows {result.displayed!r}."
         )
 
+    @custom_controller.action(
+        "Select the cheapest flight fare on a flight results page: reads every flight row, picks the cheapest fare in cabin_class on a flight allowed by routing and within budget, clicks it and verifies the selection, all in one action. Use it on every departing and returning flight selection page.",
+        param_model=SelectFlightAction,
+    )
+    async def select_flight(
+        params: SelectFlightAction, browser_session: BrowserSession
+    ) -> ActionResult:
+        captured_rows = None
+        if fare_capture is not None:
+            page = await browser_session.get_current_page()
+            captured_rows = await fare_capture.rows_for(page.url)
+        result = await select_cheapest_fare(
+            browser_session,
+            params.cabin_class,
+            params.routing,
+            params.budget,
+            captured_rows=captured_rows,
+        )
+        source = "the search results" if result.source == "network" else "the page"
+        if not result.ok:
+            return ActionResult(
+                error=f"Could not select a flight ({result.error}). Read {result.rows} flights from {source}."
+            )
+        summary = f"Selected the {result.describe()}, the cheapest of {result.matching} matching fares among {result.rows} flights read from {source}."
+        if not result.verified:
+            summary += (
+                " The page does not mark the fare as selected, check the screenshot."
+            )
+        return ActionResult(extracted_content=summary, long_term_memory=summary)
+
     if allow_request_assistance:
+        broker = assistance_broker or console_broker()
 
         @custom_controller.action(
             "Request user assistance completing the current task. Use the request_msg parameter to describe what you need assistance with. The user will take over control of the browser and return control to you it when your request has been completed."
         )
         async def request_assistance(request_msg: str) -> ActionResult:
-            val = await input(
-                f"""
-                🫵 User assistance has been requested. 
-                Here's the agent's request: {request_msg} 
-                Type DONE when you would like to return control to the Agent: """
-            )
-            if val != "DONE":
-                raise ValueError(f"Expected value 'DONE' but received {val} instead.")
+            # only this agent waits for the answer, other bookings keep running
+            request = await broker.request(request_msg, booking_id=booking_id)
+            if request.status != "answered":
+                return ActionResult(
+                    error=f"No one answered the assistance request within {request.timeout_seconds:g} seconds. Continue without assistance, or use the done action with success=False if you cannot."
+                )
+            if request.answer.strip().upper() != "DONE":
+                return ActionResult(
+                    extracted_content=f'The user answered your assistance request "{request_msg}" with: "{request.answer}". The page may have changed from the last time it has been seen.'
+                )
             return ActionResult(
                 extracted_content=f'The user has provided assistance. The page may have changed from the last time it has been seen. Here is what the user was asked to do: "{request_msg}"'
             )
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+from datetime import date
+
+from browser_use import BrowserSession
+from pydantic import BaseModel, Field
+
+# Shared helpers: does some text show the target date, in any of the formats airline sites use?
+DATE_HELPERS_JS = r"""
+const MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december"];
+const pad = n => String(n).padStart(2, "0");
+const dateParts = iso => {
+  const [year, month, day] = iso.split("-").map(Number);
+  return { year, month, day };
+};
+const displaysDate = (text, iso) => {
+  const { year, month, day } = dateParts(iso);
+  const t = (text || "").toLowerCase().replace(/\s+/g, " ").trim();
+  if (!t) return false;
+  const name = MONTHS[month - 1];
+  const numeric = [
+    iso, `${pad(month)}/${pad(day)}/${year}`, `${month}/${day}/${year}`, `${pad(month)}/${pad(day)}/${String(year).slice(2)}`,
+    `${pad(day)}/${pad(month)}/${year}`, `${pad(month)}-${pad(day)}-${year}`, `${pad(month)}/${pad(day)}`, `${month}/${day}`,
+  ];
+  if (numeric.some(f => new RegExp(`(^|\\D)${f.replace(/[/-]/g, m => "\\" + m)}(\\D|$)`).test(t))) return true;
+  const named = new RegExp(`(${name}|${name.slice(0, 3)})\\.? ${day}(\\D|$)|(^|\\D)${day} (${name}|${name.slice(0, 3)})`);
+  return named.test(t);
+};
+"""
+
+# Sets the value of a date field directly. Native date inputs take ISO dates. Text inputs get
+# the date in the format their placeholder, hint or current value suggests.
+SET_DATE_JS = (
+    r"""
+(el, iso) => {
+"""
+    + DATE_HELPERS_JS
+    + r"""
+  const { year, month, day } = dateParts(iso);
+  const displayed = () => el.value !== undefined ? el.value : el.innerText;
+  el.scrollIntoView({ block: "center" });
+
+  const isInput = el instanceof HTMLInputElement;
+  if (!isInput) return { method: "none", ok: false, displayed: el.innerText || "" };
+
+  let value;
+  if (el.type === "date") {
+    value = iso;
+  } else if (el.type === "month") {
+    value = iso.slice(0, 7);
+  } else {
+    const hint = [el.placeholder, el.getAttribute("aria-label"), el.getAttribute("aria-describedby") &&
+      document.getElementById(el.getAttribute("aria-describedby"))?.innerText,
+      el.parentElement?.innerText, el.value].filter(Boolean).join(" ").toUpperCase();
+    if (/YYYY-MM-DD/.test(hint) || /^\d{4}-\d{2}-\d{2}$/.test(el.value)) value = iso;
+    else if (/DD\/MM\/YYYY/.test(hint)) value = `${pad(day)}/${pad(month)}/${year}`;
+    else if (/MM\/DD\/YY(?!YY)/.test(hint)) value = `${pad(month)}/${pad(day)}/${String(year).slice(2)}`;
+    else if (/MM\/DD\/YYYY/.test(hint) || /^\d{2}\/\d{2}\/\d{4}$/.test(el.value)) value = `${pad(month)}/${pad(day)}/${year}`;
+    else if (/MM\/DD/.test(hint) || /^\d{2}\/\d{2}$/.test(el.value)) value = `${pad(month)}/${pad(day)}`;
+    else if (/MMDD/.test(hint)) value = `${pad(month)}${pad(day)}`;
+    else value = `${pad(month)}/${pad(day)}/${year}`;
+  }
+
+  el.focus();
+  const proto = HTMLInputElement.prototype;
+  Object.getOwnPropertyDescriptor(proto, "value").set.call(el, value);
+  el.dispatchEvent(new InputEvent("input", { bubbles: true, data: value, inputType: "insertText" }));
+  el.dispatchEvent(new Event("change", { bubbles: true }));
+  return { method: el.type === "date" || el.type === "month" ? "native" : "text", value, ok: displaysDate(displayed(), iso), displayed: displayed() };
+}
+"""
+)
+
+# One step of calendar navigation: click the target day if the open calendar shows it,
+# otherwise click the next/previous month button in the right direction.
+CALENDAR_STEP_JS = (
+    r"""
+(iso) => {
+"""
+    + DATE_HELPERS_JS
+    + r"""
+  const { year, month, day } = dateParts(iso);
+  const isVisible = el => {
+    const rect = el.getBoundingClientRect();
+    const style = window.getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== "hidden" && style.display !== "none";
+  };
+  const clickable = Array.from(document.querySelectorAll('button, td, [role="gridcell"], [role="button"], a, [data-date], [data-day]'))
+    .filter(isVisible);
+  const enabled = el => !el.disabled && el.getAttribute("aria-disabled") !== "true";
+
+  const dayCell = clickable.find(el => enabled(el) && (
+    el.getAttribute("data-date") === iso || el.getAttribute("data-day") === iso ||
+    [el.getAttribute("aria-label"), el.getAttribute("title")].some(label => label && displaysDate(label, iso) && label.includes(String(year)))
+  ));
+  if (dayCell) {
+    dayCell.click();
+    return { action: "clicked" };
+  }
+
+  // find which month is showing from calendar headings
+  const headings = Array.from(document.querySelectorAll('[role="dialog"] *, [role="grid"] *, [class*="calendar" i] *, [class*="picker" i] *'))
+    .filter(el => el.children.length === 0 && isVisible(el))
+    .map(el => el.innerText.toLowerCase().trim())
+    .map(text => {
+      const match = text.match(new RegExp(`(${MONTHS.join("|")})\\s+(\\d{4})`));
+      return match ? Number(match[2]) * 12 + MONTHS.indexOf(match[1]) : null;
+    })
+    .filter(v => v !== null);
+  if (!headings.length) return { action: "none", error: "no open calendar found" };
+  const target = year * 12 + (month - 1);
+  const shownFirst = Math.min(...headings);
+  const shownLast = Math.max(...headings);
+  if (target >= shownFirst && target <= shownLast) {
+    return { action: "none", error: `day ${iso} is shown but not selectable` };
+  }
+  const direction = target > shownLast ? "next" : "prev";
+  const pattern = direction === "next" ? /next|forward|›|»|>/i : /prev|back|‹|«|</i;
+  const nav = clickable.find(el => enabled(el) && pattern.test(
+    [el.getAttribute("aria-label"), el.getAttribute("title"), el.className, el.innerText].filter(Boolean).join(" ")
+  ));
+  if (!nav) return { action: "none", error: `no ${direction} month button found` };
+  nav.click();
+  return { action: direction };
+}
+"""
+)
+
+VERIFY_DATE_JS = (
+    r"""
+(el, iso) => {
+"""
+    + DATE_HELPERS_JS
+    + r"""
+  const displayed = el.value !== undefined && el.value !== "" ? el.value : el.innerText;
+  return { ok: displaysDate(displayed, iso), displayed };
+}
+"""
+)
+
+
+class SetDateAction(BaseModel):
+    index: int = Field(
+        description="element index of the date field or the button that opens the date picker"
+    )
+    date: str = Field(description="the date to set, as YYYY-MM-DD")
+    close_picker: bool = Field(
+        default=True, description="press Escape afterwards to close the picker"
+    )
+
+
+class SetDateResult(BaseModel):
+    ok: bool
+    method: str
+    displayed: str = ""
+    error: str | None = None
+
+
+async def set_date_field(
+    browser_session: BrowserSession,
+    index: int,
+    target: date,
+    close_picker: bool = True,
+    max_calendar_steps: int = 24,
+) -> SetDateResult:
+    """Sets a date field to target and verifies the displayed value.
+
+    The value is set directly for native and text date inputs. If that doesn't stick, or the
+    element is a button that opens a picker, the calendar is opened and navigated month by
+    month to the target day.
+    """
+    iso = target.isoformat()
+    element_node = await browser_session.get_dom_element_by_index(index)
+    if element_node is None:
+        return SetDateResult(
+            ok=False, method="none", error=f"element index {index} does not exist"
+        )
+    handle = await browser_session.get_locate_element(element_node)
+    if handle is None:
+        return SetDateResult(
+            ok=False, method="none", error=f"element index {index} is not on the page"
+        )
+    page = await browser_session.get_current_page()
+
+    direct = await handle.evaluate(SET_DATE_JS, iso)
+    result = SetDateResult(
+        ok=direct["ok"], method=direct["method"], displayed=direct["displayed"]
+    )
+
+    if not result.ok:
+        result.method = "calendar"
+        await handle.click()
+        for _ in range(max_calendar_steps):
+            # calendars animate between months
+            await asyncio.sleep(0.15)
+            step = await page.evaluate(CALENDAR_STEP_JS, iso)
+            if step["action"] == "clicked":
+                break
+            if step["action"] == "none":
+                result.error = step["error"]
+                break
+        else:
+            result.error = f"gave up after {max_calendar_steps} calendar months"
+        await asyncio.sleep(0.15)
+        verified = await handle.evaluate(VERIFY_DATE_JS, iso)
+        result.ok = verified["ok"]
+        result.displayed = verified["displayed"]
+        if result.ok:
+            result.error = None
+
+    if close_picker:
+        await page.keyboard.press("Escape")
+    logging.info(f"set_date {iso} on element {index}: {result}")
+    return result
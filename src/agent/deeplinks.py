@@ -0,0 +1,132 @@
+import logging
+import re
+from datetime import date
+from urllib.parse import urlencode, urlparse
+
+from browser_use import BrowserSession
+from pydantic import BaseModel
+
+from agent.fares import extract_fare_rows
+
+# local mock airline served by evaluation/mock_airline for hermetic benchmarks
+MOCK_AIRLINE_URL = "http://127.0.0.1:8765"
+# united's cabin codes for the sc parameter
+UNITED_CABIN_CODES = {"economy": 7, "premium economy": 2, "business": 6, "first": 6}
+
+
+def _southwest_url(flight_info: dict, base_url: str) -> str:
+    round_trip = flight_info["round_trip"]
+    params = {
+        "originationAirportCode": flight_info["departure_airport"],
+        "destinationAirportCode": flight_info["arrival_airport"],
+        "departureDate": flight_info["departure_date"],
+        "departureTimeOfDay": "ALL_DAY",
+        "returnDate": flight_info["return_date"] if round_trip else "",
+        "returnTimeOfDay": "ALL_DAY",
+        "tripType": "roundtrip" if round_trip else "oneway",
+        "adultPassengersCount": flight_info["adult_passengers"],
+        "passengerType": "ADULT",
+        "fareType": "USD",
+    }
+    return f"{base_url}/select-depart.html?{urlencode(params)}"
+
+
+def _united_url(flight_info: dict) -> str:
+    cabin = UNITED_CABIN_CODES.get((flight_info.get("cabin_class") or "").lower(), 7)
+    params = {
+        "f": flight_info["departure_airport"],
+        "t": flight_info["arrival_airport"],
+        "d": flight_info["departure_date"],
+    }
+    if flight_info["round_trip"]:
+        params["r"] = flight_info["return_date"]
+        params["sc"] = f"{cabin},{cabin}"
+    else:
+        params["tt"] = 1
+        params["sc"] = cabin
+    params.update(px=flight_info["adult_passengers"], taxng=1, newHP="True", clm=7)
+    return (
+        f"https://www.united.com/en/us/fsr/choose-flights?{urlencode(params, safe=',')}"
+    )
+
+
+def build_search_url(site: str, flight_info: dict) -> str | None:
+    """Returns a deep link to the site's flight results for flight_info, or None if the site
+    only accepts searches through its form (delta posts the search, so it has none).
+
+    The mock airline's results page reads the same parameters as southwest's.
+    """
+    if site == "mock":
+        return _southwest_url(flight_info, MOCK_AIRLINE_URL)
+    if site == "southwest":
+        return _southwest_url(flight_info, "https://www.southwest.com/air/booking")
+    if site == "united":
+        return _united_url(flight_info)
+    return None
+
+
+class DeepLinkCheck(BaseModel):
+    accepted: bool
+    url: str
+    rows: int = 0
+    reason: str | None = None
+
+
+def _date_patterns(iso_date: str) -> list[str]:
+    """Ways results pages write a date, e.g. 2025-08-01, Aug 1, August 01, 8/1 or 1 Aug"""
+    day = date.fromisoformat(iso_date)
+    month = day.strftime("%b")
+    return [
+        re.escape(iso_date),
+        rf"\b{month}[a-z]*\.?\s+0?{day.day}\b",
+        rf"\b0?{day.day}\s+{month}",
+        rf"\b0?{day.month}/0?{day.day}\b",
+    ]
+
+
+def search_mismatch(page_text: str, flight_info: dict) -> str | None:
+    """Returns why page_text doesn't show the results for flight_info's departing flight, or
+    None if it shows both airports and the departure date.
+
+    Sites fill in defaults, e.g. the last search or today's date, for parameters they don't
+    accept, so results alone don't mean they are for the search in the deep link.
+    """
+    for key in ("departure_airport", "arrival_airport"):
+        code = flight_info[key].upper()
+        if not re.search(rf"\b{re.escape(code)}\b", page_text):
+            return f"{code} not shown on the results page"
+    departure_date = flight_info["departure_date"]
+    if not any(
+        re.search(pattern, page_text, re.IGNORECASE)
+        for pattern in _date_patterns(departure_date)
+    ):
+        return f"departure date {departure_date} not shown on the results page"
+    return None
+
+
+async def check_search_results(
+    browser_session: BrowserSession, url: str, flight_info: dict, timeout: float = 10.0
+) -> DeepLinkCheck:
+    """Checks that opening the deep link url ended on a results page listing flights for the
+    route and date in flight_info.
+
+    Sites reject deep links they don't like by redirecting to the home page or the search
+    form, by showing an error instead of results, or by searching for something else.
+    """
+    page = await browser_session.get_current_page()
+    check = DeepLinkCheck(accepted=False, url=page.url)
+    if urlparse(page.url).path.rstrip("/") != urlparse(url).path.rstrip("/"):
+        check.reason = f"redirected to {page.url}"
+        return check
+    rows = await extract_fare_rows(browser_session, timeout=timeout)
+    check.rows = len(rows)
+    if not rows:
+        check.reason = f"no flight results shown within {timeout:g}s"
+        return check
+    page_text = await page.evaluate("() => document.body.innerText")
+    check.reason = search_mismatch(page_text or "", flight_info)
+    if check.reason:
+        return check
+    check.accepted = True
+    logging.info(f"Deep link {url} shows {len(rows)} flights")
+    return check
@@ -0,0 +1,203 @@
+import logging
+
+from browser_use import BrowserSession
+from browser_use.dom.views import DEFAULT_INCLUDE_ATTRIBUTES, DOMElementNode
+from pydantic import BaseModel
+
+from agent.hooks import patch_method
+
+# attribute set on elements that should survive pruning. It is not in browser-use's
+# include_attributes, so the agent never sees it
+KEEP_ATTRIBUTE = "data-aitinerary-keep"
+
+# kinds of pages in the booking flow, and what matters on each of them
+FILTER_KINDS = ("search", "fares", "traveler", "payment")
+
+# Marks the stage-relevant elements on the page and returns a compact description of them.
+# Dialogs, listboxes, calendars and alerts are always kept, since the critical rules require
+# the agent to deal with cookie banners and open popovers before anything else.
+MARK_ELEMENTS_JS = r"""
+(kind) => {
+  const KEEP = "data-aitinerary-keep";
+  const FIELD_PATTERNS = {
+    search: /from|to\b|origin|destination|depart|return|one.?way|round.?trip|passenger|traveler|adult|date|calendar|search|find flights|promo/i,
+    fares: /sort|filter|nonstop|stops|price|fare|select|continue|next/i,
+    traveler: /first|last|middle|name|suffix|birth|gender|email|phone|redress|known traveler|rewards|frequent|country|address|passport|continue|next/i,
+    payment: /card|name on|number|expir|month|year|cvv|cvc|security code|billing|address|city|state|province|zip|postal|country|continue|review/i,
+  };
+  const ACTION_PATTERN = /accept|agree|close|dismiss|continue|next|search|find flights|submit|select|done|apply/i;
+  const pattern = FIELD_PATTERNS[kind];
+
+  document.querySelectorAll(`[${KEEP}]`).forEach(el => el.removeAttribute(KEEP));
+
+  const isVisible = el => {
+    const rect = el.getBoundingClientRect();
+    const style = window.getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== "hidden" && style.display !== "none";
+  };
+  const labelOf = el => {
+    if (el.getAttribute("aria-label")) return el.getAttribute("aria-label");
+    const labelledBy = el.getAttribute("aria-labelledby");
+    if (labelledBy) return labelledBy.split(" ").map(id => document.getElementById(id)?.innerText || "").join(" ");
+    if (el.labels?.length) return Array.from(el.labels).map(l => l.innerText).join(" ");
+    return el.placeholder || el.title || el.name || el.innerText || el.value || "";
+  };
+  const clean = text => (text || "").replace(/\s+/g, " ").trim().slice(0, 80);
+
+  const kept = [];
+  const keep = (el, role) => {
+    if (el.hasAttribute(KEEP) || !isVisible(el)) return;
+    el.setAttribute(KEEP, role);
+    kept.push(el);
+    (el.labels || []).forEach(l => l.setAttribute(KEEP, "label"));
+  };
+
+  document.querySelectorAll('[role="dialog"], [role="alertdialog"], [role="listbox"], [role="grid"], [role="alert"], [aria-modal="true"]')
+    .forEach(el => keep(el, "overlay"));
+
+  document.querySelectorAll('input:not([type="hidden"]), select, textarea, [role="combobox"], [role="radio"], [role="checkbox"], [contenteditable="true"]')
+    .forEach(el => { if (!el.disabled && pattern.test(labelOf(el))) keep(el, "field"); });
+
+  document.querySelectorAll('button, a, [role="button"], [role="tab"], input[type="submit"]')
+    .forEach(el => {
+      const label = labelOf(el);
+      if (ACTION_PATTERN.test(label) || pattern.test(label)) keep(el, "control");
+    });
+
+  if (kind === "fares") {
+    // a fare row is the smallest element showing a departure time, an arrival time and a price
+    const TIME = /\b\d{1,2}:\d{2}\s?(AM|PM)?/gi;
+    const PRICE = /\$\s?\d/;
+    const candidates = Array.from(document.querySelectorAll('li, tr, [role="row"], article, section, div'))
+      .filter(el => {
+        const text = el.innerText || "";
+        return PRICE.test(text) && (text.match(TIME) || []).length >= 2 && text.length < 1500;
+      });
+    const candidateSet = new Set(candidates);
+    candidates
+      .filter(el => !Array.from(el.querySelectorAll("*")).some(child => candidateSet.has(child)))
+      .forEach(el => keep(el, "fare_row"));
+  }
+
+  return kept.map(el => ({
+    role: el.getAttribute(KEEP),
+    tag: el.tagName.toLowerCase(),
+    type: el.type || el.getAttribute("role") || null,
+    label: clean(labelOf(el)),
+    value: el.value ? clean(el.value) : null,
+    text: el.getAttribute(KEEP) === "fare_row" || el.getAttribute(KEEP) === "overlay" ? clean(el.innerText).slice(0, 200) : undefined,
+    required: el.required || el.getAttribute("aria-required") === "true" || undefined,
+  }));
+}
+"""
+
+
+async def extract_page_elements(
+    browser_session: BrowserSession, kind: str
+) -> list[dict]:
+    """Runs the stage-specific extractor in the current page.
+
+    Matching elements are marked with KEEP_ATTRIBUTE as a side effect, which is what
+    DomPruner uses to prune the serialized DOM.
+    """
+    if kind not in FILTER_KINDS:
+        raise ValueError(f"Unknown filter kind {kind}. Valid values are {FILTER_KINDS}")
+    page = await browser_session.get_current_page()
+    return await page.evaluate(MARK_ELEMENTS_JS, kind)
+
+
+def contains_marked(node: DOMElementNode) -> bool:
+    if KEEP_ATTRIBUTE in node.attributes:
+        return True
+    return any(
+        isinstance(child, DOMElementNode) and contains_marked(child)
+        for child in node.children
+    )
+
+
+def prune_element_tree(node: DOMElementNode) -> bool:
+    """Drops every subtree that contains no marked element. Marked elements are kept whole.
+
+    Returns
+        True if anything under node was kept
+    """
+    if KEEP_ATTRIBUTE in node.attributes:
+        return True
+    node.children = [
+        child
+        for child in node.children
+        if isinstance(child, DOMElementNode) and prune_element_tree(child)
+    ]
+    return bool(node.children)
+
+
+class DomPruningStats(BaseModel):
+    """Size of the serialized DOM sent to the LLM, before and after pruning, one entry per state capture"""
+
+    chars_before: list[int] = []
+    chars_after: list[int] = []
+
+    def summary(self) -> dict:
+        n = len(self.chars_before)
+        if n == 0:
+            return {"states": 0}
+        before = sum(self.chars_before) / n
+        after = sum(self.chars_after) / n
+        return {
+            "states": n,
+            "avg_dom_chars_before": round(before),
+            "avg_dom_chars_after": round(after),
+            # rough estimate of ~4 characters per token
+            "avg_dom_tokens_before": round(before / 4),
+            "avg_dom_tokens_after": round(after / 4),
+        }
+
+
+class DomPruner:
+    """Prunes the DOM that browser-use serializes for the agent down to stage-relevant elements.
+
+    Set kind to one of FILTER_KINDS before each stage, or None to disable pruning. If the
+    extractor finds nothing on a page, the full DOM is sent so the agent is never left blind.
+    """
+
+    def __init__(self, browser_session: BrowserSession):
+        self.kind: str | None = None
+        self.stats = DomPruningStats()
+        self.restore = patch_method(
+            browser_session, "get_state_summary", self._wrap(browser_session)
+        )
+
+    def _wrap(self, browser_session: BrowserSession):
+        def make_wrapper(get_state_summary):
+            async def pruned_get_state_summary(*args, **kwargs):
+                kind = self.kind
+                marked = []
+                if kind is not None:
+                    try:
+                        marked = await extract_page_elements(browser_session, kind)
+                    except Exception as e:
+                        logging.debug(f"DOM filter {kind} failed: {e}")
+
+                state = await get_state_summary(*args, **kwargs)
+                tree = state.element_tree
+                if not marked or not contains_marked(tree):
+                    return state
+
+                before = len(
+                    tree.clickable_elements_to_string(DEFAULT_INCLUDE_ATTRIBUTES)
+                )
+                prune_element_tree(tree)
+                after = len(
+                    tree.clickable_elements_to_string(DEFAULT_INCLUDE_ATTRIBUTES)
+                )
+                self.stats.chars_before.append(before)
+                self.stats.chars_after.append(after)
+                return state
+
+            return pruned_get_state_summary
+
+        return make_wrapper
+
+    def reset_stats(self) -> DomPruningStats:
+        stats, self.stats = self.stats, DomPruningStats()
+        return stats
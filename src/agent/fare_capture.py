@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Callable
+from urllib.parse import urlparse
+
+from playwright.async_api import BrowserContext, Request, Response
+from pydantic import BaseModel
+
+from agent.fares import FareOption, FareRow
+
+SearchParser = Callable[[dict], list[FareRow]]
+
+
+def parse_mock_search(data: dict) -> list[FareRow]:
+    """Parses the mock airline's /api/search response, see evaluation/mock_airline"""
+    rows = []
+    for idx, flight in enumerate(data["flights"]):
+        rows.append(
+            FareRow(
+                row=idx,
+                depart_time=flight["depart_time"],
+                arrive_time=flight["arrive_time"],
+                next_day=flight.get("next_day", False),
+                stops=flight["stops"],
+                duration_minutes=flight.get("duration_minutes"),
+                text=f"Flight # {' / '.join(flight.get('flight_numbers', []))}",
+                fares=[
+                    FareOption(cabin=cabin, price=price)
+                    for cabin, price in flight["fares"].items()
+                    if price is not None
+                ],
+            )
+        )
+    return rows
+
+
+# Per-site search APIs: a pattern for the url path of the XHR/fetch request that returns the
+# flight results, and a parser for its JSON body. Live airline APIs change without notice, so
+# sites are only added here together with a parser checked against a captured response.
+SEARCH_APIS: dict[str, tuple[re.Pattern, SearchParser]] = {
+    "mock": (re.compile(r"^/api/search$"), parse_mock_search),
+}
+
+
+class CapturedSearch(BaseModel):
+    page_url: str
+    api_url: str
+    rows: list[FareRow]
+    seconds: float  # from the request being sent to its response being parsed
+
+
+class FareCaptureStats(BaseModel):
+    responses: int = 0
+    flights: int = 0
+    parse_errors: int = 0
+    response_seconds: list[float] = []
+
+    def summary(self) -> dict:
+        return {
+            "responses": self.responses,
+            "flights": self.flights,
+            "parse_errors": self.parse_errors,
+            "avg_response_seconds": round(
+                sum(self.response_seconds) / len(self.response_seconds), 3
+            )
+            if self.response_seconds
+            else None,
+        }
+
+
+class FareCapture:
+    """Taps the flight search API responses of a browser context and parses them into fare rows.
+
+    Result pages are rendered from these responses, so the full fare list is known as soon as
+    the request completes, before the page has rendered a single row, including flights that
+    are filtered out or not rendered yet. Captures are keyed by the url of the page that sent
+    the request, so each results page (departing, returning) gets its own fare list.
+    """
+
+    def __init__(self, site: str):
+        self.site = site
+        self.api = SEARCH_APIS.get(site)
+        self.searches: dict[str, CapturedSearch] = {}
+        self.stats = FareCaptureStats()
+        self.context: BrowserContext | None = None
+        self._pending: dict[str, asyncio.Event] = {}
+        # page url and start time of each search in flight, the page may have navigated
+        # away by the time its response arrives
+        self._started: dict[Request, tuple[str, float]] = {}
+
+    @staticmethod
+    def supports(site: str) -> bool:
+        return site in SEARCH_APIS
+
+    async def attach(self, context: BrowserContext):
+        if self.api is None or context is self.context:
+            return
+        self.context = context
+        context.on("request", self._on_request)
+        context.on("response", self._on_response)
+        context.on("requestfailed", self._on_request_failed)
+        logging.info(f"Capturing flight search responses for {self.site}")
+
+    def _is_search(self, request: Request) -> bool:
+        return request.resource_type in ("xhr", "fetch") and bool(
+            self.api[0].search(urlparse(request.url).path)
+        )
+
+    def _on_request(self, request: Request):
+        if not self._is_search(request):
+            return
+        page_url = _page_url(request)
+        # a new search from the same page replaces the previous results
+        self.searches.pop(page_url, None)
+        self._pending.setdefault(page_url, asyncio.Event())
+        self._started[request] = (page_url, time.perf_counter())
+
+    async def _on_response(self, response: Response):
+        request = response.request
+        if not self._is_search(request):
+            return
+        page_url, started = self._started.pop(
+            request, (_page_url(request), time.perf_counter())
+        )
+        try:
+            rows = self.api[1](await response.json())
+        except Exception as e:
+            self.stats.parse_errors += 1
+            logging.info(f"Could not parse flight search response {response.url}: {e}")
+        else:
+            seconds = round(time.perf_counter() - started, 3)
+            self.searches[page_url] = CapturedSearch(
+                page_url=page_url, api_url=response.url, rows=rows, seconds=seconds
+            )
+            self.stats.responses += 1
+            self.stats.flights += len(rows)
+            self.stats.response_seconds.append(seconds)
+            logging.info(
+                f"Captured {len(rows)} flights from {response.url} in {seconds}s"
+            )
+        event = self._pending.pop(page_url, None)
+        if event is not None:
+            event.set()
+
+    def _on_request_failed(self, request: Request):
+        if not self._is_search(request):
+            return
+        page_url, _ = self._started.pop(request, (_page_url(request), 0))
+        event = self._pending.pop(page_url, None)
+        if event is not None:
+            event.set()
+
+    async def rows_for(
+        self, page_url: str, timeout: float = 10.0
+    ) -> list[FareRow] | None:
+        """Fare rows captured for the page at page_url, waiting for a search still in flight.
+
+        Returns
+            None if the page sent no search request, or its response could not be parsed
+        """
+        event = self._pending.get(page_url)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                logging.info(
+                    f"Flight search for {page_url} still running after {timeout}s"
+                )
+        search = self.searches.get(page_url)
+        return search.rows if search is not None else None
+
+    def reset_stats(self) -> FareCaptureStats:
+        stats, self.stats = self.stats, FareCaptureStats()
+        return stats
+
+
+def _page_url(request: Request) -> str:
+    try:
+        return request.frame.page.url
+    except Exception:
+        # requests from service workers have no frame
+        return ""
@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Literal
+
+from browser_use import BrowserSession
+from pydantic import BaseModel, Field
+
+from agent.stability import wait_for_stable
+
+# attribute set on every fare button the extractor finds, so the chosen one can be clicked
+# without going through browser-use's element indices
+FARE_OPTION_ATTRIBUTE = "data-fare-option"
+
+# Reads every flight result row into a structured record in one call. A row is the smallest
+# element showing a departure time, an arrival time and a price, as in dom_filter's fares
+# filter. Its fares are the clickable elements inside it that show a price. A fare's cabin
+# comes from a data attribute, else from the column header above it, else from its label.
+EXTRACT_FARES_JS = r"""
+(attribute) => {
+  const TIME = /\b\d{1,2}:\d{2}\s?(?:AM|PM)?/gi;
+  const PRICE = /\$\s?(\d[\d,]*(?:\.\d{2})?)/;
+  const clean = text => (text || "").replace(/\s+/g, " ").trim();
+  const isVisible = el => {
+    const rect = el.getBoundingClientRect();
+    const style = window.getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== "hidden" && style.display !== "none";
+  };
+
+  document.querySelectorAll(`[${attribute}]`).forEach(el => el.removeAttribute(attribute));
+
+  const candidates = Array.from(document.querySelectorAll('li, tr, [role="row"], article, section, div'))
+    .filter(el => {
+      const text = el.innerText || "";
+      return PRICE.test(text) && (text.match(TIME) || []).length >= 2 && text.length < 1500;
+    });
+  const candidateSet = new Set(candidates);
+  const rows = candidates
+    .filter(el => !Array.from(el.querySelectorAll("*")).some(child => candidateSet.has(child)))
+    .filter(isVisible);
+  if (!rows.length) return [];
+
+  // column headers: short leaf texts above the first row, outside every row
+  const top = Math.min(...rows.map(row => row.getBoundingClientRect().top));
+  const headers = Array.from(document.body.querySelectorAll("*"))
+    .filter(el => !el.childElementCount && isVisible(el) && !rows.some(row => row.contains(el)))
+    .map(el => ({ text: clean(el.innerText), rect: el.getBoundingClientRect() }))
+    .filter(h => h.text && h.text.length <= 40 && !PRICE.test(h.text) && !h.text.match(TIME) && h.rect.bottom <= top + 1);
+  const headerAbove = rect => {
+    const center = (rect.left + rect.right) / 2;
+    const above = headers.filter(h => h.rect.left <= center && center <= h.rect.right);
+    above.sort((a, b) => b.rect.bottom - a.rect.bottom);
+    return above.length ? above[0].text : null;
+  };
+
+  const labelOf = el => [el.innerText, el.getAttribute("aria-label"), el.value, ...Array.from(el.labels || []).map(l => l.innerText)]
+    .map(clean).filter(Boolean).join(" ");
+  const isSelected = el => ["aria-pressed", "aria-checked", "aria-selected"].some(a => el.getAttribute(a) === "true")
+    || el.checked === true || /\b(selected|active|is-selected)\b/i.test(el.className || "");
+
+  return rows.map((row, rowIdx) => {
+    const text = clean(row.innerText);
+    const times = text.match(TIME) || [];
+    let stops = null;
+    if (/non.?stop|direct/i.test(text)) stops = 0;
+    const stopMatch = text.match(/(\d+)\s*stops?/i);
+    if (stopMatch) stops = Number(stopMatch[1]);
+    const duration = text.match(/(\d+)\s*h(?:rs?|ours?)?\s*(?:(\d+)\s*m)?/i);
+
+    const options = Array.from(row.querySelectorAll('button, [role="button"], [role="radio"], input[type="radio"], a'))
+      .filter(el => !el.disabled && el.getAttribute("aria-disabled") !== "true" && isVisible(el) && PRICE.test(labelOf(el)));
+    const fares = options.map((el, fareIdx) => {
+      const label = labelOf(el);
+      const handle = `${rowIdx}-${fareIdx}`;
+      el.setAttribute(attribute, handle);
+      const cabin = el.dataset.fareClass || el.dataset.fareType || el.dataset.cabin
+        || headerAbove(el.getBoundingClientRect())
+        || clean(label.replace(PRICE, "").replace(TIME, "").replace(/\b(fare|departs|select|from)\b/gi, "").replace(/[,|]/g, " "));
+      return {
+        cabin: clean(cabin),
+        price: Number(label.match(PRICE)[1].replace(/,/g, "")),
+        handle,
+        selected: isSelected(el),
+      };
+    });
+    return {
+      row: rowIdx,
+      depart_time: times[0] || null,
+      arrive_time: times[1] || null,
+      next_day: /\+\s?1\b|next day/i.test(text),
+      stops,
+      duration_minutes: duration ? Number(duration[1]) * 60 + Number(duration[2] || 0) : null,
+      text: text.slice(0, 200),
+      fares,
+    };
+  });
+}
+"""
+
+# highest number of stops allowed by each routing value of FlightInfo
+ROUTING_MAX_STOPS = {"direct": 0, "one_stop": 1, "any": None}
+
+
+class FareOption(BaseModel):
+    cabin: str
+    price: float
+    # value of FARE_OPTION_ATTRIBUTE on the fare's button, None for fares read from the network
+    handle: str | None = None
+    selected: bool = False
+
+
+class FareRow(BaseModel):
+    row: int
+    depart_time: str | None = None
+    arrive_time: str | None = None
+    next_day: bool = False
+    stops: int | None = None
+    duration_minutes: int | None = None
+    text: str = ""
+    fares: list[FareOption] = []
+
+
+class SelectFlightAction(BaseModel):
+    cabin_class: str = Field(
+        description="the cabin class or fare name to book, e.g. 'Basic' or 'Economy'"
+    )
+    routing: Literal["direct", "one_stop", "any"] = Field(
+        default="any",
+        description="direct for nonstop flights only, one_stop for at most one stop, any for no limit",
+    )
+    budget: float | None = Field(
+        default=None, description="highest acceptable fare in dollars, if any"
+    )
+
+
+class FareSelection(BaseModel):
+    ok: bool
+    source: Literal["page", "network"] = "page"  # where the fare list was read from
+    rows: int = 0
+    matching: int = 0  # fares in the cabin that meet routing and budget
+    row: FareRow | None = None
+    fare: FareOption | None = None
+    verified: bool = False
+    error: str | None = None
+
+    def describe(self) -> str:
+        if self.row is None or self.fare is None:
+            return ""
+        stops = {None: "unknown stops", 0: "nonstop", 1: "1 stop"}.get(
+            self.row.stops, f"{self.row.stops} stops"
+        )
+        return f"{self.fare.cabin} ${self.fare.price:g} on the {self.row.depart_time} -> {self.row.arrive_time} flight ({stops})"
+
+
+def normalize_cabin(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def normalize_time(text: str | None) -> str:
+    return re.sub(r"\s+", "", text or "").upper()
+
+
+def find_on_page(
+    rows: list[FareRow], row: FareRow, fare: FareOption
+) -> tuple[FareRow, FareOption] | None:
+    """The page's row and fare button showing the same flight and fare as row and fare,
+    matched by departure time, cabin and price, since pages may sort or filter the list
+    """
+    for page_row in rows:
+        if normalize_time(page_row.depart_time) != normalize_time(row.depart_time):
+            continue
+        for page_fare in page_row.fares:
+            if page_fare.price == fare.price and normalize_cabin(
+                page_fare.cabin
+            ) == normalize_cabin(fare.cabin):
+                return page_row, page_fare
+    return None
+
+
+def cabin_fares(
+    rows: list[FareRow], cabin_class: str
+) -> list[tuple[FareRow, FareOption]]:
+    """Fares whose cabin is cabin_class. Exact names win, so "Wanna Get Away" never matches
+    "Wanna Get Away Plus" when both are on the page. Without an exact match, a cabin containing
+    the wanted name, or contained in it, is accepted, e.g. "Economy" for "Main Cabin Economy".
+    """
+    wanted = normalize_cabin(cabin_class)
+    fares = [(row, fare) for row in rows for fare in row.fares]
+    exact = [
+        (row, fare) for row, fare in fares if normalize_cabin(fare.cabin) == wanted
+    ]
+    if exact or not wanted:
+        return exact
+
+    def overlaps(cabin: str) -> bool:
+        cabin = normalize_cabin(cabin)
+        return bool(cabin) and (
+            f" {wanted} " in f" {cabin} " or f" {cabin} " in f" {wanted} "
+        )
+
+    return [(row, fare) for row, fare in fares if overlaps(fare.cabin)]
+
+
+def choose_fare(
+    rows: list[FareRow],
+    cabin_class: str,
+    routing: str = "any",
+    budget: float | None = None,
+) -> FareSelection:
+    """Picks the cheapest fare in cabin_class among flights allowed by routing and budget.
+
+    Ties go to the earlier row on the page. Flights whose stops couldn't be read only count
+    when routing is any.
+
+    Returns
+        a FareSelection with the chosen row and fare, or ok=False and the reason nothing matched
+    """
+    selection = FareSelection(ok=False, rows=len(rows))
+    if not rows:
+        selection.error = "no flight result rows found on the page"
+        return selection
+
+    in_cabin = cabin_fares(rows, cabin_class)
+    if not in_cabin:
+        cabins = sorted({fare.cabin for row in rows for fare in row.fares})
+        selection.error = (
+            f"no {cabin_class!r} fares (fares offered: {', '.join(cabins) or 'none'})"
+        )
+        return selection
+
+    max_stops = ROUTING_MAX_STOPS.get(routing)
+    routed = [
+        (row, fare)
+        for row, fare in in_cabin
+        if max_stops is None or (row.stops is not None and row.stops <= max_stops)
+    ]
+    if not routed:
+        selection.error = (
+            f"no {cabin_class!r} fares on flights allowed by routing {routing!r}"
+        )
+        return selection
+
+    row, fare = min(routed, key=lambda item: (item[1].price, item[0].row))
+    affordable = [item for item in routed if budget is None or item[1].price <= budget]
+    selection.matching = len(affordable)
+    if not affordable:
+        selection.error = f"the cheapest matching fare is ${fare.price:g}, above the budget of ${budget:g}"
+        return selection
+
+    selection.ok = True
+    selection.row = row
+    selection.fare = fare
+    return selection
+
+
+async def extract_fare_rows(
+    browser_session: BrowserSession, timeout: float = 10.0, poll: float = 0.25
+) -> list[FareRow]:
+    """Reads all flight result rows on the current page.
+
+    Result lists often stream in, so this waits until at least one row is shown and the row
+    count stopped changing between two reads, or timeout passes.
+    """
+    page = await browser_session.get_current_page()
+    deadline = time.monotonic() + timeout
+    previous: list[dict] | None = None
+    while True:
+        try:
+            rows = await page.evaluate(EXTRACT_FARES_JS, FARE_OPTION_ATTRIBUTE)
+        except Exception as e:
+            logging.debug(f"Fare extraction failed: {e}")
+            rows = []
+        settled = previous is not None and len(rows) == len(previous)
+        if (rows and settled) or time.monotonic() >= deadline:
+            return [FareRow.model_validate(row) for row in rows]
+        previous = rows
+        await asyncio.sleep(poll)
+
+
+async def select_cheapest_fare(
+    browser_session: BrowserSession,
+    cabin_class: str,
+    routing: str = "any",
+    budget: float | None = None,
+    timeout: float = 10.0,
+    captured_rows: list[FareRow] | None = None,
+) -> FareSelection:
+    """Picks the cheapest matching fare with choose_fare and clicks it.
+
+    With captured_rows, e.g. from agent.fare_capture, the fare is chosen from the complete list
+    the search API returned, and only its button is looked up on the page. Otherwise, or if
+    that button can't be found, the fare table is extracted from the page.
+
+    The selection is verified by reading the table again: pages that re-render after a click
+    must show the same fare as selected. A page that navigates away on click counts as verified.
+    """
+    selection = None
+    if captured_rows:
+        selection = choose_fare(captured_rows, cabin_class, routing, budget)
+        selection.source = "network"
+        if not selection.ok:
+            # the search API returned every flight, so the page has nothing better to offer
+            logging.info(f"select_flight {cabin_class}/{routing}: {selection.error}")
+            return selection
+        rows = await extract_fare_rows(browser_session, timeout=timeout)
+        found = find_on_page(rows, selection.row, selection.fare)
+        if found is None:
+            logging.info(
+                f"select_flight: the {selection.describe()} fare from the search API is not shown on the page, reading the page instead"
+            )
+            selection = None
+        else:
+            selection.row, selection.fare = found
+
+    if selection is None:
+        rows = await extract_fare_rows(browser_session, timeout=timeout)
+        selection = choose_fare(rows, cabin_class, routing, budget)
+        if not selection.ok:
+            logging.info(f"select_flight {cabin_class}/{routing}: {selection.error}")
+            return selection
+
+    page = await browser_session.get_current_page()
+    url = page.url
+    try:
+        await page.locator(
+            f'[{FARE_OPTION_ATTRIBUTE}="{selection.fare.handle}"]'
+        ).first.click(timeout=5000)
+    except Exception as e:
+        selection.ok = False
+        selection.error = f"could not click the {selection.describe()} fare: {e}"
+        logging.info(f"select_flight {cabin_class}/{routing}: {selection.error}")
+        return selection
+
+    await wait_for_stable(page, timeout=3.0)
+    if page.url != url:
+        selection.verified = True
+    else:
+        after = await extract_fare_rows(browser_session, timeout=1.0)
+        selection.verified = any(
+            fare.selected
+            and fare.cabin == selection.fare.cabin
+            and fare.price == selection.fare.price
+            for row in after
+            if row.depart_time == selection.row.depart_time
+            for fare in row.fares
+        )
+    logging.info(
+        f"select_flight {cabin_class}/{routing}: chose {selection.describe()} out of {selection.rows} {selection.source} rows, verified={selection.verified}"
+    )
+    return selection
@@ -0,0 +1,190 @@
+import logging
+
+from browser_use import BrowserSession
+from pydantic import BaseModel, Field
+
+# Fills a batch of form controls and reads every value back. Each entry carries either an
+# element (resolved from a browser-use index) or a label to search for. Values are written
+# with the native value setter, so frameworks that track input values (React, Vue) see the
+# change, followed by the input/change/blur events a user would trigger.
+FILL_FORM_JS = r"""
+(entries) => {
+  const norm = text => (text || "").replace(/\s+/g, " ").trim().toLowerCase();
+  const digits = text => (text || "").replace(/\D/g, "");
+  const isVisible = el => {
+    const rect = el.getBoundingClientRect();
+    const style = window.getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== "hidden" && style.display !== "none";
+  };
+  const labelsOf = el => {
+    const labels = [];
+    if (el.labels) labels.push(...Array.from(el.labels).map(l => l.innerText));
+    const labelledBy = el.getAttribute("aria-labelledby");
+    if (labelledBy) labels.push(labelledBy.split(" ").map(id => document.getElementById(id)?.innerText || "").join(" "));
+    labels.push(el.getAttribute("aria-label"), el.placeholder, el.name, el.id);
+    return labels.map(norm).filter(Boolean);
+  };
+  const controls = () => Array.from(document.querySelectorAll(
+    'input:not([type="hidden"]):not([type="submit"]):not([type="button"]), select, textarea, [contenteditable="true"]'
+  )).filter(el => !el.disabled && !el.readOnly && isVisible(el));
+  const findByLabel = (label, taken) => {
+    const wanted = norm(label);
+    const candidates = controls().filter(el => !taken.has(el));
+    return candidates.find(el => labelsOf(el).includes(wanted))
+      || candidates.find(el => labelsOf(el).some(l => l.startsWith(wanted)))
+      || candidates.find(el => labelsOf(el).some(l => l.includes(wanted)));
+  };
+  const describe = el => labelsOf(el)[0] || el.tagName.toLowerCase();
+
+  const setNativeValue = (el, value) => {
+    const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, "value").set.call(el, value);
+  };
+  const fire = (el, type) => el.dispatchEvent(new Event(type, { bubbles: true }));
+  const truthy = value => ["true", "yes", "1", "on", "checked", "x"].includes(norm(value));
+
+  const fill = (el, value) => {
+    el.scrollIntoView({ block: "center" });
+    el.focus();
+    if (el instanceof HTMLSelectElement) {
+      const options = Array.from(el.options);
+      const option = options.find(o => norm(o.value) === norm(value) || norm(o.text) === norm(value))
+        || options.find(o => norm(o.text).startsWith(norm(value)))
+        || options.find(o => norm(value) && norm(o.text).includes(norm(value)));
+      if (!option) {
+        return `no option matching "${value}" (options: ${options.map(o => o.text.trim()).filter(Boolean).slice(0, 15).join(" | ")})`;
+      }
+      el.value = option.value;
+      fire(el, "input");
+      fire(el, "change");
+    } else if (el.type === "checkbox" || el.type === "radio") {
+      if (el.checked !== truthy(value)) el.click();
+    } else if (el.isContentEditable) {
+      el.textContent = value;
+      el.dispatchEvent(new InputEvent("input", { bubbles: true, data: value, inputType: "insertText" }));
+    } else {
+      setNativeValue(el, value);
+      el.dispatchEvent(new InputEvent("input", { bubbles: true, data: value, inputType: "insertText" }));
+      fire(el, "change");
+    }
+    el.blur();
+    el.dispatchEvent(new FocusEvent("focusout", { bubbles: true }));
+    return null;
+  };
+  const readBack = el => {
+    if (el instanceof HTMLSelectElement) return el.selectedOptions[0]?.text.trim() || "";
+    if (el.type === "checkbox" || el.type === "radio") return el.checked ? "checked" : "unchecked";
+    if (el.isContentEditable) return el.textContent;
+    return el.value;
+  };
+  const matches = (el, expected, actual) => {
+    if (el.type === "checkbox" || el.type === "radio") return actual === (truthy(expected) ? "checked" : "unchecked");
+    if (el instanceof HTMLSelectElement) {
+      return norm(actual) === norm(expected) || norm(el.value) === norm(expected) || norm(actual).includes(norm(expected));
+    }
+    if (norm(actual) === norm(expected)) return true;
+    // masked inputs reformat values, e.g. "4147 5678" or "(626) 375-6087"
+    return digits(expected).length > 0 && digits(actual) === digits(expected);
+  };
+
+  const taken = new Set();
+  return entries.map(entry => {
+    const result = { target: entry.target, value: entry.value, ok: false };
+    const el = entry.element || (entry.label ? findByLabel(entry.label, taken) : null);
+    if (!el) {
+      result.error = entry.label ? `no visible form field labelled "${entry.label}"` : "element not found";
+      return result;
+    }
+    taken.add(el);
+    result.field = describe(el);
+    try {
+      result.error = fill(el, entry.value);
+    } catch (e) {
+      result.error = String(e);
+    }
+    result.actual = readBack(el);
+    result.ok = !result.error && matches(el, entry.value, result.actual);
+    if (el.getAttribute("aria-invalid") === "true") {
+      result.ok = false;
+      result.error = result.error || "the page marked the field as invalid";
+    }
+    if (!result.ok && !result.error) result.error = "value did not stick, the field may need to be typed into";
+    if (!result.error) delete result.error;
+    return result;
+  });
+}
+"""
+
+
+class FormField(BaseModel):
+    target: str = Field(
+        description="the element index of the field, e.g. '12', or its visible label, e.g. 'First name'"
+    )
+    value: str = Field(
+        description="text to enter, option text for dropdowns, or true/false for checkboxes"
+    )
+
+
+class FillFormAction(BaseModel):
+    fields: list[FormField]
+
+
+async def fill_form_fields(
+    browser_session: BrowserSession, fields: list[FormField]
+) -> list[dict]:
+    """Fills every field with one in-page script per frame and returns per-field verification.
+
+    Index targets are resolved through browser-use's selector map, so they work inside iframes
+    too. Label targets are looked up in the main frame.
+
+    Returns
+        one dict per field with the target, the value read back from the page, ok, and an
+        error message when the field could not be filled or verified
+    """
+    page = await browser_session.get_current_page()
+    # entries are grouped by the frame their element lives in, keeping the original order
+    batches: dict = {}
+    results: list[dict | None] = [None] * len(fields)
+
+    for position, field in enumerate(fields):
+        target = field.target.strip()
+        entry = {"target": field.target, "value": field.value}
+        frame = page.main_frame
+        if target.isdigit():
+            element_node = await browser_session.get_dom_element_by_index(int(target))
+            handle = (
+                await browser_session.get_locate_element(element_node)
+                if element_node is not None
+                else None
+            )
+            if handle is None:
+                results[position] = {
+                    **entry,
+                    "ok": False,
+                    "error": f"element index {target} does not exist",
+                }
+                continue
+            entry["element"] = handle
+            frame = await handle.owner_frame() or frame
+        else:
+            entry["label"] = target
+        batches.setdefault(frame, []).append((position, entry))
+
+    for frame, batch in batches.items():
+        try:
+            filled = await frame.evaluate(FILL_FORM_JS, [entry for _, entry in batch])
+        except Exception as e:
+            logging.warning(f"fill_form script failed: {e}")
+            filled = [
+                {
+                    "target": entry["target"],
+                    "value": entry["value"],
+                    "ok": False,
+                    "error": str(e),
+                }
+                for _, entry in batch
+            ]
+        for (position, _), result in zip(batch, filled):
+            results[position] = result
+
+    return results
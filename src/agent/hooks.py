@@ -0,0 +1,28 @@
+from typing import Any, Callable
+
+
+def patch_method(
+    obj: Any, name: str, make_wrapper: Callable[[Callable], Callable]
+) -> Callable[[], None]:
+    """Replaces obj.<name> on this instance only with make_wrapper(original).
+
+    browser-use objects such as BrowserSession are pydantic models whose __setattr__ won't
+    shadow methods, so the wrapper is written straight into the instance __dict__. This is
+    the same trick browser-use's TokenCostService uses to track llm.ainvoke.
+
+    Returns
+        a function that restores the previous attribute. Patches should be restored in
+        reverse order of application.
+    """
+    had_own = name in obj.__dict__
+    previous = obj.__dict__.get(name)
+    original = getattr(obj, name)
+    object.__setattr__(obj, name, make_wrapper(original))
+
+    def restore():
+        if had_own:
+            object.__setattr__(obj, name, previous)
+        else:
+            obj.__dict__.pop(name, None)
+
+    return restore
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterator
+
+from pydantic import BaseModel
+
+from agent.hooks import patch_method
+
+if TYPE_CHECKING:
+    # agent.pipeline imports browser-use, which is slow to import for analyze_runs.py
+    from agent.pipeline import PipelineResult, StageOutcome
+
+DEFAULT_LEDGER_PATH = os.path.join("logs", "ledger.jsonl")
+
+# USD per 1M tokens: (input, cached input, output)
+MODEL_PRICING = {
+    "gemini-2.0-flash": (0.10, 0.025, 0.40),
+    "gemini-2.5-flash": (0.30, 0.075, 2.50),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+
+
+def estimate_cost(
+    model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0
+) -> float | None:
+    """Returns the USD cost of the given token counts, or None if the model has no known pricing"""
+    if model not in MODEL_PRICING:
+        return None
+    input_price, cached_price, output_price = MODEL_PRICING[model]
+    uncached = prompt_tokens - cached_tokens
+    cost = (
+        uncached * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    )
+    return round(cost / 1_000_000, 6)
+
+
+def _cassette_misses(stats: dict | None) -> int | None:
+    """Strict misses plus sequential hits from a stage's CassetteStats summary"""
+    if stats is None:
+        return None
+    return stats.get("misses", 0) + stats.get("sequential_hits", 0)
+
+
+class RunRecord(BaseModel):
+    """One ledger line: a single stage of a single booking run.
+
+    browser_seconds is the wall time not spent waiting on the LLM, i.e. page loads, DOM
+    extraction, screenshots and actions. page_load_seconds is the average load time of the
+    documents the stage navigated to.
+    """
+
+    run_id: str
+    started_at: str
+    label: str | None = None
+    prompt_version: str | None = None
+    site: str
+    stage: str
+    model: str
+    status: str  # agent.pipeline.StageStatus
+    success: bool
+    attempts: int = 0
+    steps: int = 0
+    replayed_steps: int = 0
+    shortcut: bool = False
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost_usd: float | None = None
+    wall_seconds: float = 0.0
+    llm_seconds: float = 0.0
+    browser_seconds: float = 0.0
+    blocking_mode: str | None = None
+    bytes_transferred: int | None = None
+    page_load_seconds: float | None = None
+    # LLM calls with no cassette recording of their prompt, whether they raised or were
+    # answered with the recording of a different prompt, see CassetteLLM
+    cassette_misses: int | None = None
+
+    @classmethod
+    def from_outcome(
+        cls,
+        outcome: "StageOutcome",
+        run_id: str,
+        started_at: str,
+        site: str,
+        model: str,
+        label: str | None = None,
+        prompt_version: str | None = None,
+    ) -> "RunRecord":
+        network = outcome.metrics.get("network", {})
+        return cls(
+            run_id=run_id,
+            started_at=started_at,
+            label=label,
+            prompt_version=prompt_version,
+            site=site,
+            stage=outcome.stage,
+            model=model,
+            status=outcome.status,
+            success=outcome.success,
+            attempts=outcome.attempts,
+            steps=outcome.steps,
+            replayed_steps=outcome.replayed_steps,
+            shortcut=outcome.shortcut,
+            prompt_tokens=outcome.prompt_tokens,
+            cached_prompt_tokens=outcome.cached_prompt_tokens,
+            completion_tokens=outcome.completion_tokens,
+            total_tokens=outcome.total_tokens,
+            cost_usd=estimate_cost(
+                model,
+                outcome.prompt_tokens,
+                outcome.completion_tokens,
+                outcome.cached_prompt_tokens,
+            ),
+            wall_seconds=round(outcome.wall_seconds, 3),
+            llm_seconds=round(outcome.llm_seconds, 3),
+            browser_seconds=round(
+                max(0.0, outcome.wall_seconds - outcome.llm_seconds), 3
+            ),
+            blocking_mode=network.get("mode"),
+            bytes_transferred=network.get("bytes_transferred"),
+            page_load_seconds=network.get("avg_page_load_seconds"),
+            cassette_misses=_cassette_misses(outcome.metrics.get("cassette")),
+        )
+
+
+class RunLedger:
+    """Append-only JSONL file with one RunRecord per stage per run.
+
+    Every record is written with a single write call, so several processes can append to the
+    same ledger without interleaving lines.
+    """
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, records: list[RunRecord]):
+        if not records:
+            return
+        lines = "".join(record.model_dump_json() + "\n" for record in records)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    async def record_run(
+        self,
+        result: "PipelineResult",
+        started_at: datetime,
+        site: str,
+        model: str,
+        label: str | None = None,
+        prompt_version: str | None = None,
+    ):
+        """Appends one record per stage outcome of a finished run, skipped stages included"""
+        records = [
+            RunRecord.from_outcome(
+                outcome,
+                run_id=result.run_id,
+                started_at=started_at.isoformat(timespec="seconds"),
+                site=site,
+                model=model,
+                label=label,
+                prompt_version=prompt_version,
+            )
+            for outcome in result.outcomes
+        ]
+        await asyncio.to_thread(self.append, records)
+
+
+def read_ledger(path: str = DEFAULT_LEDGER_PATH) -> Iterator[dict]:
+    """Yields ledger records as dicts. Truncated lines, e.g. from a run that was killed mid-write, are skipped"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class LLMTimer:
+    """Accumulates the time spent waiting on llm.ainvoke.
+
+    Apply it before the llm is handed to any Agent, so it times the provider call itself
+    rather than browser-use's token tracking wrappers.
+    """
+
+    def __init__(self, llm):
+        self.seconds = 0.0
+        self.calls = 0
+        self.restore = patch_method(llm, "ainvoke", self._make_wrapper)
+
+    def _make_wrapper(self, ainvoke):
+        async def timed_ainvoke(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await ainvoke(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - start
+                self.calls += 1
+
+        return timed_ainvoke
+
+    def reset(self) -> float:
+        seconds, self.seconds, self.calls = self.seconds, 0.0, 0
+        return seconds
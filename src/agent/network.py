@@ -0,0 +1,231 @@
+import logging
+from collections import Counter
+from typing import Literal
+from urllib.parse import urlparse
+
+from playwright.async_api import BrowserContext, Page, Request, Route
+from pydantic import BaseModel, Field
+
+BlockingMode = Literal["off", "lean", "strict"]
+
+# Third-party hosts that never affect what a booking step sees or does. A rule matches the
+# host itself and any subdomain.
+TRACKER_HOSTS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "bat.bing.com",
+    "clarity.ms",
+    "hotjar.com",
+    "quantummetric.com",
+    "demdex.net",
+    "omtrdc.net",
+    "everesttech.net",
+    "adobedtm.com",
+    "tiktok.com",
+    "analytics.tiktok.com",
+    "snapchat.com",
+    "pinterest.com",
+    "criteo.com",
+    "criteo.net",
+    "taboola.com",
+    "outbrain.com",
+    "adnxs.com",
+    "rlcdn.com",
+    "krxd.net",
+    "nr-data.net",
+    "newrelic.com",
+    "segment.io",
+    "mparticle.com",
+    "branch.io",
+    "optimizely.com",
+    "qualtrics.com",
+    "medallia.com",
+    "tealiumiq.com",
+    "tiqcdn.com",
+]
+CHAT_HOSTS = [
+    "liveperson.net",
+    "lpsnmedia.net",
+    "intercom.io",
+    "zendesk.com",
+    "zdassets.com",
+    "livechatinc.com",
+    "nuance.com",
+    "inq.com",
+    "drift.com",
+]
+# resource types that never matter for a booking step. Pings are analytics beacons
+LEAN_BLOCKED_TYPES = {"media", "ping"}
+# strict mode also drops fonts, which only change glyph shapes, and third-party images
+STRICT_BLOCKED_TYPES = LEAN_BLOCKED_TYPES | {"font"}
+
+
+class SiteRules(BaseModel):
+    """Per-site overrides. allow wins over every other rule, e.g. for bot-protection scripts
+    the site refuses to work without"""
+
+    hosts: list[str] = Field(default_factory=list)
+    allow: list[str] = Field(default_factory=list)
+    deny: list[str] = Field(default_factory=list)
+
+
+SITE_RULES = {
+    "southwest": SiteRules(
+        hosts=["southwest.com", "swacdn.com"],
+        # Akamai bot manager, blocking it gets the session flagged
+        allow=["akamaihd.net", "akstat.io"],
+    ),
+    "united": SiteRules(hosts=["united.com"], allow=["akamaihd.net"]),
+    "delta": SiteRules(hosts=["delta.com"], allow=["akamaihd.net"]),
+    "mock": SiteRules(hosts=["127.0.0.1", "localhost"]),
+}
+
+# Page load time of the current document from the Navigation Timing API
+PAGE_LOAD_JS = r"""
+() => {
+  const [entry] = performance.getEntriesByType("navigation");
+  // loadEventEnd is still 0 while load handlers run
+  const end = entry && (entry.loadEventEnd || entry.loadEventStart);
+  return end ? end - entry.startTime : null;
+}
+"""
+
+
+def host_matches(host: str, patterns: list[str]) -> bool:
+    return any(host == p or host.endswith("." + p) for p in patterns)
+
+
+class NetworkStats(BaseModel):
+    mode: str
+    requests: int = 0
+    blocked: int = 0
+    blocked_by_reason: dict[str, int] = Field(default_factory=dict)
+    bytes_transferred: int = 0
+    page_loads: int = 0
+    page_load_seconds: float = 0
+
+    def summary(self) -> dict:
+        return {
+            **self.model_dump(),
+            "page_load_seconds": round(self.page_load_seconds, 3),
+            "avg_page_load_seconds": round(self.page_load_seconds / self.page_loads, 3)
+            if self.page_loads
+            else None,
+        }
+
+
+class RequestBlocker:
+    """Blocks non-essential requests of a browser context and measures what the pages load.
+
+    Modes
+        off: block nothing, only measure
+        lean: block trackers, ads, chat widgets, media and beacons. Layout CSS, scripts, fonts
+            and images load as usual, so screenshots look the same
+        strict: lean, plus fonts and images from third-party hosts
+
+    Blocked requests are aborted. Every other request falls back to the next route handler,
+    so other handlers registered on the context still see it.
+    """
+
+    def __init__(
+        self,
+        site: str,
+        mode: BlockingMode = "lean",
+        rules: SiteRules | None = None,
+    ):
+        self.site = site
+        self.mode = mode
+        self.rules = rules or SITE_RULES.get(site, SiteRules())
+        self.stats = NetworkStats(mode=mode)
+        self._blocked_by_reason: Counter = Counter()
+        self.context: BrowserContext | None = None
+
+    async def attach(self, context: BrowserContext):
+        if context is self.context:
+            return
+        self.context = context
+        context.on("request", self._on_request)
+        context.on("requestfinished", self._on_request_finished)
+        context.on("page", self._watch_page)
+        for page in context.pages:
+            self._watch_page(page)
+        if self.mode != "off":
+            await context.route("**/*", self._handle_route)
+        logging.info(f"Request blocking for {self.site} in {self.mode} mode")
+
+    def block_reason(self, request: Request) -> str | None:
+        """Why a request should be blocked in the current mode, or None to let it through"""
+        if self.mode == "off":
+            return None
+        url = urlparse(request.url)
+        if url.scheme not in ("http", "https"):
+            return None
+        host = url.hostname or ""
+        if host_matches(host, self.rules.allow):
+            return None
+        if host_matches(host, self.rules.deny):
+            return "site_deny"
+        if host_matches(host, TRACKER_HOSTS):
+            return "tracker"
+        if host_matches(host, CHAT_HOSTS):
+            return "chat"
+        blocked_types = (
+            STRICT_BLOCKED_TYPES if self.mode == "strict" else LEAN_BLOCKED_TYPES
+        )
+        if request.resource_type in blocked_types:
+            return request.resource_type
+        if (
+            self.mode == "strict"
+            and request.resource_type == "image"
+            and self.rules.hosts
+            and not host_matches(host, self.rules.hosts)
+        ):
+            return "third_party_image"
+        return None
+
+    async def _handle_route(self, route: Route):
+        reason = self.block_reason(route.request)
+        if reason is None:
+            await route.fallback()
+            return
+        self._blocked_by_reason[reason] += 1
+        await route.abort("blockedbyclient")
+
+    def _on_request(self, request: Request):
+        self.stats.requests += 1
+
+    async def _on_request_finished(self, request: Request):
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            # the page or context closed before the sizes could be read
+            return
+        self.stats.bytes_transferred += (
+            sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        )
+
+    def _watch_page(self, page: Page):
+        async def on_load(page: Page):
+            try:
+                load_ms = await page.evaluate(PAGE_LOAD_JS)
+            except Exception:
+                return
+            if load_ms is not None:
+                self.stats.page_loads += 1
+                self.stats.page_load_seconds += load_ms / 1000
+
+        page.on("load", on_load)
+
+    def reset_stats(self) -> NetworkStats:
+        stats = self.stats
+        stats.blocked = sum(self._blocked_by_reason.values())
+        stats.blocked_by_reason = dict(self._blocked_by_reason)
+        self.stats = NetworkStats(mode=self.mode)
+        self._blocked_by_reason = Counter()
+        return stats
@@ -1,35 +1,9 @@
 import asyncio
 import json
-from datetime import datetime
-import sys
-sys.stdout.reconfigure(encoding='utf-8')
-import os
-import platform
 import re
+import sys
 
-# Set up browser-use config directory before importing
-config_dir = os.path.expanduser('~/Desktop/aitinerary/browser_config')
-os.makedirs(config_dir, exist_ok=True)
-os.environ['BROWSER_USE_CONFIG_DIR'] = config_dir
-
-# Now safely import browser-use
-try:
-    from browser_use import Agent, BrowserSession, Controller, ActionResult
-    print("Successfully imported browser-use")
-except Exception as e:
-    print(f"Still having import issues: {e}")
-    sys.exit(1)
-
-from dotenv import load_dotenv
-from browser_use.llm import ChatAnthropic
-from pydantic import BaseModel
-BrowserSession.capture_element_screenshots = False
-from browser_use.llm import ChatGoogle
-
-load_dotenv()
-BrowserSession.clear_context_on_start = True
-
-llm = ChatGoogle(model="gemini-2.5-flash-lite-preview-06-17")
+from agent.config import configure_browser_use, load_config
 
 message_context = """
 When URL contains '/traveler/choose-travelers' (or any of the specified segments), do NOT click, go back, or perform any further actions. Immediately output:
@@ -81,64 +55,87 @@ Once on a URL containing '/traveler/choose-travelers' or '/booking/passenger':
 """
 
 # customer functions for DOM filtering
-
-controller = Controller()
-
-@controller.action("Return flight booking controls")
-async def filter_booking_controls() -> ActionResult:
-    js = r"""
-    const needed = ["one-way", "round-trip", "depart", "return", "find flights", "select", "continue", "next"];
-    return Array.from(document.querySelectorAll('button, select, input[type="text"], input[type="date"]'))
-      .filter(el => {
-        const text = (el.innerText || el.value || el.getAttribute('aria-label') || "").toLowerCase();
-        return needed.some(k => text.includes(k));
-      })
-      .map(el => ({
-        tag: el.tagName,
-        selector: el.tagName.toLowerCase()
-                  + (el.id ? `#${el.id}` : el.name ? `[name="${el.name}"]` : ""),
-        text: (el.innerText || el.value || el.getAttribute('aria-label') || "").trim()
-      }));
-    """
-    return ActionResult(js=js)
-
-
-@controller.action("Return named, focused, and relevant DOM fields")
-async def filter_interactive_fields() -> ActionResult:
-    js = r"""
-    function getName(el) {
-      if (el.ariaLabel) return el.ariaLabel;
-      const abz = el.getAttribute('aria-labelledby');
-      if (abz) return abz.split(' ').map(id => document.getElementById(id)?.innerText).join(' ');
-      if (el.labels?.length) return Array.from(el.labels).map(l => l.innerText).join(' ');
-      if (el.placeholder) return el.placeholder;
-      if (el.title) return el.title;
-      return el.innerText?.trim() || null;
-    }
-    return Array.from(document.querySelectorAll(
-      'input:not([type=hidden]):not([disabled]), select:not([disabled]), textarea:not([disabled])'
-    )).filter(el => {
-      const name = getName(el);
-      return name && /First name|Last name|Middle|Birth|Gender|Suffix|Frequent flyer/i.test(name);
-    }).map(el => {
-      const rect = el.getBoundingClientRect();
-      return {
-        tag: el.tagName,
-        type: el.type || null,
-        selector: el.tagName.toLowerCase() +
-          (el.name ? `[name="${el.name}"]` : el.id ? `#${el.id}` : ''),
-        name: getName(el),
-        value: el.value || null,
-        required: el.required || el.getAttribute('aria-required') === 'true',
-        visible: rect.width > 0 && rect.height > 0
-      };
-    });
-    """
-    return ActionResult(js=js)
-
+# NOTE: agent.dom_filter has the maintained, stage-specific versions of these extractors
+
+def build_controller():
+    # imported here, after main() pointed browser-use at its config dir
+    from browser_use import ActionResult, BrowserSession, Controller
+
+    async def _run_extractor(browser_session: BrowserSession, js: str) -> ActionResult:
+        # ActionResult has no js field, so the script has to be evaluated in the page here
+        page = await browser_session.get_current_page()
+        elements = await page.evaluate(f"() => {{ {js} }}")
+        return ActionResult(extracted_content=json.dumps(elements), include_extracted_content_only_once=True)
+
+    controller = Controller()
+
+    @controller.action("Return flight booking controls")
+    async def filter_booking_controls(browser_session: BrowserSession) -> ActionResult:
+        js = r"""
+        const needed = ["one-way", "round-trip", "depart", "return", "find flights", "select", "continue", "next"];
+        return Array.from(document.querySelectorAll('button, select, input[type="text"], input[type="date"]'))
+          .filter(el => {
+            const text = (el.innerText || el.value || el.getAttribute('aria-label') || "").toLowerCase();
+            return needed.some(k => text.includes(k));
+          })
+          .map(el => ({
+            tag: el.tagName,
+            selector: el.tagName.toLowerCase()
+                      + (el.id ? `#${el.id}` : el.name ? `[name="${el.name}"]` : ""),
+            text: (el.innerText || el.value || el.getAttribute('aria-label') || "").trim()
+          }));
+        """
+        return await _run_extractor(browser_session, js)
+
+    @controller.action("Return named, focused, and relevant DOM fields")
+    async def filter_interactive_fields(browser_session: BrowserSession) -> ActionResult:
+        js = r"""
+        function getName(el) {
+          if (el.ariaLabel) return el.ariaLabel;
+          const abz = el.getAttribute('aria-labelledby');
+          if (abz) return abz.split(' ').map(id => document.getElementById(id)?.innerText).join(' ');
+          if (el.labels?.length) return Array.from(el.labels).map(l => l.innerText).join(' ');
+          if (el.placeholder) return el.placeholder;
+          if (el.title) return el.title;
+          return el.innerText?.trim() || null;
+        }
+        return Array.from(document.querySelectorAll(
+          'input:not([type=hidden]):not([disabled]), select:not([disabled]), textarea:not([disabled])'
+        )).filter(el => {
+          const name = getName(el);
+          return name && /First name|Last name|Middle|Birth|Gender|Suffix|Frequent flyer/i.test(name);
+        }).map(el => {
+          const rect = el.getBoundingClientRect();
+          return {
+            tag: el.tagName,
+            type: el.type || null,
+            selector: el.tagName.toLowerCase() +
+              (el.name ? `[name="${el.name}"]` : el.id ? `#${el.id}` : ''),
+            name: getName(el),
+            value: el.value || null,
+            required: el.required || el.getAttribute('aria-required') === 'true',
+            visible: rect.width > 0 && rect.height > 0
+          };
+        });
+        """
+        return await _run_extractor(browser_session, js)
+
+    return controller
 
 
 async def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    # browser-use reads its config dir when first imported
+    configure_browser_use()
+    load_config()
+    from browser_use import Agent, BrowserSession
+    from browser_use.llm import ChatGoogle
+
+    BrowserSession.capture_element_screenshots = False
+    BrowserSession.clear_context_on_start = True
+    llm = ChatGoogle(model="gemini-2.5-flash-lite-preview-06-17")
+    controller = build_controller()
+
     # pre-agent: setup a valid session (e.g., login/search) to get to booking page
     setup_agent = Agent(
         task=task_setup,
@@ -183,4 +180,6 @@ async def main():
 
     print("🧩 Interactive fields found:", fields)
 
-asyncio.run(main())
+
+if __name__ == "__main__":
+    asyncio.run(main())
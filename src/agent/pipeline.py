@@ -0,0 +1,309 @@
+import logging
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Literal
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    # browser-use is slow to import, and the models here are also used by processes that
+    # never run an agent, e.g. the booking worker supervisor and analyze_runs.py
+    from browser_use import Agent
+    from browser_use.agent.views import AgentHistoryList
+
+    from agent.trajectory import TrajectoryReplayer, TrajectoryStep
+
+StageStatus = Literal["success", "failed", "max_steps", "error", "skipped"]
+
+
+class Stage(BaseModel):
+    """A single agent task in the booking pipeline, e.g. searching for flights"""
+
+    name: str
+    task: str
+    initial_actions: list[dict] | None = None
+    allow_request_assistance: bool = False
+    max_actions_per_step: int | None = None
+    dom_filter: str | None = None  # one of agent.dom_filter.FILTER_KINDS
+    # actions that may complete the stage without an agent, e.g. opening a search deep link.
+    # The pipeline's run_shortcut callback runs and checks them
+    shortcut: list[dict] | None = None
+
+
+class RetryPolicy(BaseModel):
+    """Controls which stage outcomes are retried with a fresh Agent before the pipeline stops.
+
+    max_attempts counts the first attempt, so the default of 1 means "never retry".
+    """
+
+    max_attempts: int = 1
+    retry_on_failed: bool = True
+    retry_on_max_steps: bool = True
+    retry_on_error: bool = True
+
+    def should_retry(self, status: StageStatus, attempt: int) -> bool:
+        if attempt >= self.max_attempts:
+            return False
+        if status == "failed":
+            return self.retry_on_failed
+        if status == "max_steps":
+            return self.retry_on_max_steps
+        if status == "error":
+            return self.retry_on_error
+        return False
+
+
+class StageOutcome(BaseModel):
+    """Typed result of running one stage. Steps and tokens are summed across all attempts.
+
+    steps counts LLM-decided steps only. replayed_steps counts actions replayed from the
+    trajectory cache without calling the LLM. shortcut is True when the stage's shortcut
+    completed it, so neither replay nor an agent ran. step_input_tokens holds the prompt tokens of
+    every LLM call, and step_cached_tokens and step_image_tokens the parts of them that were
+    served from the provider's prompt cache or were images, where the provider reports it.
+    step_seconds holds the wall time of every agent step. wall_seconds covers the whole stage
+    including replay and retries, and llm_seconds the part of it spent waiting on the LLM,
+    when the caller measures it. metrics collects optional measurements such as DOM pruning
+    and screenshot stats.
+    """
+
+    stage: str
+    status: StageStatus
+    attempts: int = 0
+    steps: int = 0
+    replayed_steps: int = 0
+    shortcut: bool = False
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    step_input_tokens: list[int] = []
+    step_cached_tokens: list[int] = []
+    step_image_tokens: list[int] = []
+    step_seconds: list[float] = []
+    wall_seconds: float = 0.0
+    llm_seconds: float = 0.0
+    error: str | None = None
+    final_result: str | None = None
+    metrics: dict = {}
+
+    @property
+    def success(self) -> bool:
+        return self.status == "success"
+
+
+class PipelineResult(BaseModel):
+    """Summary of a booking run. failed_stage is the name of the stage that stopped the run, if any."""
+
+    run_id: str
+    outcomes: list[StageOutcome] = []
+    failed_stage: str | None = None
+
+    @property
+    def success(self) -> bool:
+        return self.failed_stage is None and all(o.success for o in self.outcomes)
+
+    @property
+    def total_steps(self) -> int:
+        return sum(o.steps for o in self.outcomes)
+
+    @property
+    def total_replayed_steps(self) -> int:
+        return sum(o.replayed_steps for o in self.outcomes)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(o.total_tokens for o in self.outcomes)
+
+
+AgentFactory = Callable[[Stage], "Agent"]
+StageCallback = Callable[[StageOutcome], Awaitable[None]]
+# runs a stage's shortcut and returns whether it completed the stage
+ShortcutCallback = Callable[[Stage], Awaitable[bool]]
+# called after every agent attempt with the history it produced, or None if it raised
+AttemptCallback = Callable[[Stage, int, "AgentHistoryList | None"], Awaitable[None]]
+
+
+def count_steps(history: "AgentHistoryList") -> int:
+    """Counts the steps an agent actually took. browser-use appends an extra
+    history item without metadata when max_steps is reached, so that one is skipped.
+    """
+    return sum(1 for h in history.history if h.metadata is not None)
+
+
+def classify_history(history: "AgentHistoryList", max_steps: int) -> StageStatus:
+    """Maps the history returned by agent.run() to a stage status"""
+    if history.is_done():
+        return "success" if history.is_successful() else "failed"
+    if count_steps(history) >= max_steps:
+        return "max_steps"
+    # agent stopped early without calling done, e.g. too many consecutive failures
+    return "error"
+
+
+async def run_stage(
+    stage: Stage,
+    make_agent: AgentFactory,
+    model: str,
+    max_steps: int,
+    retry_policy: RetryPolicy,
+    replayer: "TrajectoryReplayer | None" = None,
+    on_attempt_end: AttemptCallback | None = None,
+    run_shortcut: ShortcutCallback | None = None,
+) -> StageOutcome:
+    """Runs a single stage, creating a fresh Agent for every attempt allowed by retry_policy.
+
+    If the stage has a shortcut and run_shortcut is given, the shortcut is tried first. When it
+    completes the stage, nothing else runs. Otherwise the stage runs as if it had none.
+
+    If a replayer is given and has a cached trajectory for this stage, it is replayed first.
+    A fully replayed stage never creates an Agent. If the page diverges from the recording,
+    the first Agent picks up from wherever replay stopped.
+
+    Args
+        stage: the stage to run
+        make_agent: builds the Agent for an attempt at this stage
+        model: model name used to look up token usage from the agent's token cost service
+        max_steps: maximum number of steps per attempt
+        retry_policy: decides whether an unsuccessful attempt is retried
+        replayer (optional): replays and records cached trajectories for this run
+        on_attempt_end (optional): called with the stage, attempt number and history after every attempt
+        run_shortcut (optional): runs the stage's shortcut and reports whether it completed the stage
+
+    Returns
+        a StageOutcome summarizing all attempts at this stage
+    """
+    started = time.perf_counter()
+    outcome = StageOutcome(stage=stage.name, status="error")
+    agent_stage = stage
+    replayed: list[TrajectoryStep] = []
+
+    if stage.shortcut and run_shortcut is not None:
+        try:
+            completed = await run_shortcut(stage)
+        except Exception as e:
+            logging.warning(f"Shortcut for stage {stage.name} raised: {e}")
+            completed = False
+        if completed:
+            outcome.status = "success"
+            outcome.shortcut = True
+            outcome.wall_seconds = time.perf_counter() - started
+            logging.info(f"Stage {stage.name} completed by its shortcut")
+            return outcome
+        logging.info(f"Shortcut for stage {stage.name} did not complete it")
+
+    if replayer is not None:
+        replay = await replayer.replay(stage.name, stage.initial_actions)
+        if replay is not None:
+            outcome.replayed_steps = replay.replayed_steps
+            if replay.completed:
+                outcome.status = "success"
+                outcome.wall_seconds = time.perf_counter() - started
+                logging.info(
+                    f"Stage {stage.name} completed by replaying {replay.replayed_steps} cached steps"
+                )
+                return outcome
+            # initial actions already ran, so the agent continues from the current page
+            agent_stage = stage.model_copy(update={"initial_actions": None})
+            replayed = replay.steps
+
+    while True:
+        outcome.attempts += 1
+        agent = make_agent(agent_stage)
+        history = None
+        try:
+            history = await agent.run(max_steps=max_steps)
+            outcome.status = classify_history(history, max_steps)
+            outcome.steps += count_steps(history)
+            outcome.step_seconds += [
+                round(h.metadata.duration_seconds, 3)
+                for h in history.history
+                if h.metadata is not None
+            ]
+            outcome.final_result = history.final_result()
+            outcome.error = None if outcome.success else _last_error(history)
+        except Exception as e:
+            logging.exception(f"Stage {stage.name} raised an exception")
+            outcome.status = "error"
+            outcome.steps += agent.state.n_steps - 1
+            outcome.error = str(e)
+
+        usage = agent.token_cost_service.get_usage_tokens_for_model(model)
+        outcome.prompt_tokens += usage.prompt_tokens
+        outcome.cached_prompt_tokens += usage.prompt_cached_tokens
+        outcome.completion_tokens += usage.completion_tokens
+        outcome.total_tokens += usage.total_tokens
+        for entry in agent.token_cost_service.usage_history:
+            if entry.model == model:
+                outcome.step_input_tokens.append(entry.usage.prompt_tokens)
+                outcome.step_cached_tokens.append(entry.usage.prompt_cached_tokens or 0)
+                outcome.step_image_tokens.append(entry.usage.prompt_image_tokens or 0)
+
+        logging.info(
+            f"Stage {stage.name} attempt {outcome.attempts} finished with status "
+            f"'{outcome.status}' after {outcome.steps} total steps"
+        )
+        if on_attempt_end is not None:
+            await on_attempt_end(stage, outcome.attempts, history)
+        if outcome.success and replayer is not None:
+            await replayer.record(stage.name, replayed, history)
+        if outcome.success or not retry_policy.should_retry(
+            outcome.status, outcome.attempts
+        ):
+            outcome.wall_seconds = time.perf_counter() - started
+            return outcome
+        logging.info(f"Retrying stage {stage.name}")
+        # a retry starts the stage over, so the replayed prefix no longer applies
+        agent_stage = stage
+        replayed = []
+
+
+async def run_pipeline(
+    run_id: str,
+    stages: list[Stage],
+    make_agent: AgentFactory,
+    model: str,
+    max_steps_per_stage: int = 30,
+    retry_policy: RetryPolicy | None = None,
+    on_stage_end: StageCallback | None = None,
+    replayer: "TrajectoryReplayer | None" = None,
+    on_attempt_end: AttemptCallback | None = None,
+    run_shortcut: ShortcutCallback | None = None,
+) -> PipelineResult:
+    """Runs stages in order and stops at the first stage that does not succeed.
+
+    Stages after a failed stage are recorded as "skipped" and no Agent is created for them.
+    """
+    retry_policy = retry_policy or RetryPolicy()
+    result = PipelineResult(run_id=run_id)
+
+    for stage in stages:
+        if result.failed_stage is not None:
+            result.outcomes.append(StageOutcome(stage=stage.name, status="skipped"))
+            continue
+
+        outcome = await run_stage(
+            stage=stage,
+            make_agent=make_agent,
+            model=model,
+            max_steps=max_steps_per_stage,
+            retry_policy=retry_policy,
+            replayer=replayer,
+            on_attempt_end=on_attempt_end,
+            run_shortcut=run_shortcut,
+        )
+        result.outcomes.append(outcome)
+        if on_stage_end is not None:
+            await on_stage_end(outcome)
+
+        if not outcome.success:
+            result.failed_stage = stage.name
+            logging.warning(
+                f"Stage {stage.name} failed with status '{outcome.status}'. Skipping remaining stages."
+            )
+
+    return result
+
+
+def _last_error(history: "AgentHistoryList") -> str | None:
+    errors = [e for e in history.errors() if e is not None]
+    return errors[-1] if errors else None
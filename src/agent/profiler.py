@@ -0,0 +1,203 @@
+import time
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from agent.hooks import patch_method
+
+if TYPE_CHECKING:
+    # only annotations, so analyze_runs.py can summarize traces without importing browser-use
+    from browser_use import Agent, BrowserSession, Controller
+
+    from agent.trajectory import TrajectoryReplayer
+
+# Categories of a step's time. Each span only counts its own time, without the spans nested
+# in it, so the categories add up to the profiled time:
+#   llm: waiting on the model provider
+#   dom: building the browser state for the LLM, mostly DOM extraction and serialization
+#   screenshot: capturing (and post-processing) the page screenshot
+#   page_wait: waiting for pages and frames to load
+#   action: executing controller actions, e.g. clicks, typing, set_date
+#   agent: the rest of a step, e.g. building messages and parsing the model output
+CATEGORIES = ("llm", "dom", "screenshot", "page_wait", "action", "agent")
+# the methods timed on each browser session, and the category of their spans
+SESSION_METHODS = {
+    "get_state_summary": "dom",
+    "take_screenshot": "screenshot",
+    "_wait_for_page_and_frames_load": "page_wait",
+}
+
+_open_spans: ContextVar[tuple["_Span", ...]] = ContextVar("open_spans", default=())
+
+
+class _Span:
+    __slots__ = ("child_seconds",)
+
+    def __init__(self):
+        self.child_seconds = 0.0
+
+
+class StepProfiler:
+    """Records a per-step timeline of a booking run, split into CATEGORIES.
+
+    The llm and browser session are instrumented on construction, agents and controllers as
+    they are created. Create the profiler after everything else that patches the session
+    (ScreenshotPipeline, DomPruner), or the time they add is not attributed to its spans.
+    trace() exports the timeline as Chrome trace JSON, which opens in chrome://tracing or
+    https://ui.perfetto.dev with one track per category. Call restore() when the run is over.
+    """
+
+    def __init__(self, run_id: str, browser_session: "BrowserSession", llm: Any):
+        self.run_id = run_id
+        self.stage: str | None = None
+        self.events: list[dict] = []
+        self._started = time.perf_counter()
+        self._restores = [patch_method(llm, "ainvoke", self._wrap("llm", "llm"))]
+        for name, category in SESSION_METHODS.items():
+            self._restores.append(
+                patch_method(browser_session, name, self._wrap(name, category))
+            )
+
+    def instrument_agent(self, agent: "Agent"):
+        """Times every step of agent and every action its controller executes"""
+        self._restores.append(
+            patch_method(agent, "step", self._wrap("step", "agent", step_of=agent))
+        )
+        self.instrument_controller(agent.controller)
+
+    def instrument_controller(self, controller: "Controller"):
+        self._restores.append(
+            patch_method(
+                controller.registry,
+                "execute_action",
+                self._wrap(None, "action", named_by_first_arg=True),
+            )
+        )
+
+    def instrument_replayer(self, replayer: "TrajectoryReplayer"):
+        """Attributes replayed steps to their stage and times the actions they execute"""
+
+        def make_wrapper(replay):
+            async def profiled_replay(stage_name: str, *args, **kwargs):
+                self.stage = stage_name
+                return await replay(stage_name, *args, **kwargs)
+
+            return profiled_replay
+
+        self._restores.append(patch_method(replayer, "replay", make_wrapper))
+        self.instrument_controller(replayer.controller)
+
+    def _wrap(
+        self,
+        name: str | None,
+        category: str,
+        step_of: "Agent | None" = None,
+        named_by_first_arg: bool = False,
+    ) -> Callable[[Callable[..., Awaitable]], Callable[..., Awaitable]]:
+        def make_wrapper(method):
+            async def profiled(*args, **kwargs):
+                span = _Span()
+                # a step's number is only known before it runs
+                event_args = {"step": step_of.state.n_steps} if step_of else {}
+                parents = _open_spans.get()
+                token = _open_spans.set(parents + (span,))
+                start = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    seconds = time.perf_counter() - start
+                    _open_spans.reset(token)
+                    if parents:
+                        parents[-1].child_seconds += seconds
+                    self._record(
+                        str(args[0]) if named_by_first_arg and args else name,
+                        category,
+                        start,
+                        seconds,
+                        max(0.0, seconds - span.child_seconds),
+                        event_args,
+                    )
+
+            return profiled
+
+        return make_wrapper
+
+    def _record(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        seconds: float,
+        self_seconds: float,
+        args: dict,
+    ):
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self._started) * 1e6),
+                "dur": round(seconds * 1e6),
+                "pid": 1,
+                "tid": CATEGORIES.index(category) + 1,
+                "args": {
+                    "stage": self.stage,
+                    "self_ms": round(self_seconds * 1000, 3),
+                    **args,
+                },
+            }
+        )
+
+    def trace(self) -> dict:
+        """The timeline in Chrome trace event format"""
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": 1,
+                "args": {"name": f"run {self.run_id}"},
+            }
+        ] + [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": idx,
+                "args": {"name": category},
+            }
+            for idx, category in enumerate(CATEGORIES, 1)
+        ]
+        return {
+            "traceEvents": metadata + sorted(self.events, key=lambda e: e["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {"run_id": self.run_id},
+        }
+
+    def stage_summary(self, stage: str) -> dict:
+        """Seconds per category for one stage, e.g. for the stage's metrics"""
+        return summarize_events(
+            [e for e in self.events if e["args"].get("stage") == stage]
+        )
+
+    def restore(self):
+        for restore in reversed(self._restores):
+            restore()
+        self._restores = []
+
+
+def summarize_events(events: list[dict]) -> dict:
+    """Self time in seconds and number of spans per category, from Chrome trace events"""
+    summary = {category: {"seconds": 0.0, "spans": 0} for category in CATEGORIES}
+    for event in events:
+        if event.get("ph") != "X" or event.get("cat") not in summary:
+            continue
+        summary[event["cat"]]["seconds"] += event["args"]["self_ms"] / 1000
+        summary[event["cat"]]["spans"] += 1
+    total = sum(entry["seconds"] for entry in summary.values())
+    for entry in summary.values():
+        entry["share"] = round(entry["seconds"] / total, 3) if total else None
+        entry["seconds"] = round(entry["seconds"], 3)
+    summary["steps"] = sum(
+        1 for e in events if e.get("ph") == "X" and e.get("name") == "step"
+    )
+    summary["profiled_seconds"] = round(total, 3)
+    return summary
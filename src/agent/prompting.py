@@ -1,7 +1,17 @@
-def get_initial_actions(site: str) -> list[dict]:
-    """Returns a list of initial actions for the agent to take"""
+from agent.deeplinks import MOCK_AIRLINE_URL, build_search_url
+
+
+def get_initial_actions(site: str, flight_info: dict | None = None) -> list[dict]:
+    """Returns a list of initial actions for the agent to take.
+
+    With flight_info, the actions navigate straight to the site's flight results for it when
+    the site accepts search deep links, see build_search_url. Otherwise they open the home page.
+    """
     actions = []
-    if site == "delta":
+    search_url = build_search_url(site, flight_info) if flight_info else None
+    if search_url is not None:
+        actions.append({"go_to_url": {"url": search_url, "new_tab": False}})
+    elif site == "delta":
         actions.append(
             {"go_to_url": {"url": "https://www.delta.com", "new_tab": False}}
         )
@@ -13,19 +23,141 @@ def get_initial_actions(site: str) -> list[dict]:
         actions.append(
             {"go_to_url": {"url": "https://www.southwest.com", "new_tab": False}}
         )
+    elif site == "mock":
+        actions.append({"go_to_url": {"url": MOCK_AIRLINE_URL, "new_tab": False}})
     else:
         actions.append({"go_to_url": {"url": site, "new_tab": False}})
 
     return actions
 
 
+def get_select_flight_actions(flight_info: dict) -> list[dict]:
+    """Returns the initial actions of the flight selection stage: picking the departing fare
+    deterministically, so the agent only has to continue, or take over if nothing was selected
+    """
+    return [
+        {
+            "select_flight": {
+                "cabin_class": flight_info["cabin_class"],
+                "routing": flight_info["routing"],
+                "budget": flight_info.get("budget"),
+            }
+        }
+    ]
+
+
+# Bump whenever SYSTEM_PREFIX changes, so runs can be compared per prompt version.
+PROMPT_VERSION = "7"
+
+# Everything that is the same for every stage, step and run. It is sent as the system message
+# extension, so it sits right after browser-use's own system prompt and forms a long shared
+# prefix that providers can cache. Nothing user- or run-specific may go in here.
+SYSTEM_PREFIX = f"""
+<booking_rules version="{PROMPT_VERSION}">
+<critical_rules>
+You will be interacting with very dense, dynamic pages. Be conservative when using any actions that will alter your view of the page.
+Below is a list of CRITICAL rules that must always be followed. Failure to adhere to them will lead to unstable page interactions that may make accomplishing your goal impossible.
+1. After interacting with any date picker, dropdown, or other popover, you MUST IMMEDIATELY use the close_selected_popover action before taking any other action. It waits for the page to settle, so no wait action is needed afterwards. If the page is still loading or animating, use wait_for_page_stable instead of the wait action. Do not proceed until you confirm the page is in a clean state.
+2. Never click or input text into an element on the page that is obscured or partly obscured. Use the provided screenshot of the page in order to confirm that the target element is fully visible before taking action. If it's obscured, take action to reveal it such as scrolling the page or expanding accordion widgets.
+3. Whenever you use the scroll action, always scroll in half-page increments (num_pages = 0.5) or less. Scrolling a full page or more can accidentally obscure content.
+4. If you are prompted to accept cookies, you must do this before taking any other task. This pop-up may obscure other critical page elements.
+</critical_rules>
+
+<validation_strategy>
+Before taking any action, always:
+1. Use your screenshot to verify that the current state matches your intended action
+2. If selecting from a dropdown, confirm the selected value is visible in the screenshot
+3. State explicitly what you see vs what you intended.
+</validation_strategy>
+
+<popover_strategy>
+When interacting with dropdowns or date pickers, always follow the following steps:
+1. Review your screenshot of the current state
+2. Click to open the dropdown/picker
+3. Review your screenshot again to see available options
+4. Select the correct option
+5. Review your screenshot again to confirm the selection
+6. Only then proceed to the next field
+</popover_strategy>
+
+<goal_completion_verification>
+Before indicating that the goal is complete, you must:
+1. Take a final screenshot
+2. Identify 3 specific visual indicators that prove you've reached the target state
+3. List what you expected to see vs what you actually see
+4. Only mark complete if ALL indicators match expectations
+</goal_completion_verification>
+
+<recovery_strategy>
+If you find yourself stuck or unable to locate expected elements, try these options in order:
+1. Scroll on the page to find missing elements
+2. Refresh the page once
+3. If you are still stuck, use the "done" action with success=False.
+</recovery_strategy>
+
+<stage_playbooks>
+Your task names one of the stages below. Follow the playbook for that stage, using the values given in the task.
+
+## SEARCH FLIGHTS
+- You should be on the home page of an airline with a form to search for flights. If you do not see a form to search for flights, immediately exit by using the "done" action with success=False.
+- Search for flights matching the FLIGHT SEARCH CRITERIA in the task using the form. If done correctly, submitting the form will take you to a page that lists different possible departing flights by time, price, and other characteristics.
+- Common issues:
+    - Date pickers can be finnicky. Set the departure and return date with the set_date action, giving the date as YYYY-MM-DD. It verifies the displayed date and closes the picker in the same action. Only if set_date fails, use input_text with the date in the form "MMDD" and then select the desired date in the picker.
+    - Enter the departure and arrival airports with the select_airport action, giving the airport code. It types the code, picks the matching suggestion and verifies the field in one action. Only if select_airport fails, use clear_text, input_text and then pick the suggestion yourself.
+    - Some input fields may be pre-populated - ALWAYS use clear_text before using input_text to avoid issues.
+    - Depending on the airline, not every field will be applicable when searching for flights. If the search form doesn't accept one or more of the FLIGHT SEARCH CRITERIA, ignore it and proceed. For example, Southwest does not require Cabin Class or Routing Type to search for flights.
+    - Date pickers may default to today's date. Always verify that the correct departure and return dates (if applicable) are selected before proceeding.
+    - You will need to click a button to actually submit your search query. Common labels for this button are "Search Flights" or "Find Flights". Make sure that you are using the correct button, as some promotional buttons (e.g. "Book Now", "Learn More") will navigate you away from the search page.
+
+## SELECT FLIGHT
+- You should be on the page to select a departing flight from a list of available options. If you do not see a list of different options for flight times, prices, and cabin classes, immediately exit by using the "done" action with success=False.
+- Select fares with the select_flight action, giving the Cabin Class, Routing and Budget from the task. It reads every flight on the page and selects the cheapest fare that meets them. It may already have run as your first action for the departing flight: if it succeeded, confirm the selection in the screenshot and continue.
+    - If select_flight reports that the cheapest matching fare is above the budget, use the "done" action with success=False.
+    - If it finds no flight rows or fails for any other reason, select the fare yourself using the flight selection strategy below.
+- Continue with the booking process until you reach a page that explicitly requests Passenger or Traveler Information such as First Name, Last Name, and Date of Birth:
+    1. Select the **cheapest** departing flight that meets the Routing Type, Cabin Class and Budget in the task. Continue to the next page.
+        - For a round-trip, indicators of success are: the page title or page URL changes from the departure selection page, typically to one containing the word "Return", and a "departing flight" summary shows your previously selected departing flight.
+        - For a one-way trip, the page title or page URL changes from the departure selection page. Typically you will be on some kind of confirmation or add-ons page.
+    2. Round-trip only: select the **cheapest** returning flight that meets the same criteria, using select_flight again. Continue to the next page. The page title or page URL should change from the return selection page, typically to some kind of confirmation or add-ons page.
+    3. Navigate from the confirmation or add-ons page to the page that explicitly requests Passenger or Traveler information. You may need to scroll to find a "Continue" button.
+- Flight selection strategy:
+    1. Sort flights by price (lowest to highest) if the option is available
+    2. Look for the cheapest option that meets cabin and routing requirements
+    3. If multiple flights have the same price, you may pick any of them.
+
+## TRAVELER INFO
+- You should be on the page to provide traveler information to the airline. If you do not see a form requesting traveler information, immediately exit by using the "done" action with success=False.
+- Accurately populate and submit the form using the PASSENGER INFO in the task. ONLY fill fields that actually exist - ignore any passenger information that doesn't have a corresponding field.
+- Fill every visible passenger field with a single fill_form action, then check its per-field verification and fix any failed fields individually.
+- Once you have done so, continue the booking process until you reach a page that explicitly requests Billing or Payment Information.
+- Common issues:
+    - You may need to expand some page elements in order to access all form elements
+    - If there are form elements that are not visible in the viewport, use the scroll action.
+
+## PAYMENT INFO
+- You should be on the page to provide payment information and complete your booking. If you do not see a form requesting payment information, immediately exit by using the "done" action with success=False.
+- Populate all requested billing information using the BILLING INFO in the task. Fill every visible billing field with a single fill_form action, then check its per-field verification and fix any failed fields individually.
+- CRITICAL: DO NOT CLICK ANY BUTTONS THAT COMPLETE THE PURCHASE. Examples include "Complete Purchase", "Buy Now", "Confirm Booking", "Submit Payment" and "Book Flight".
+</stage_playbooks>
+</booking_rules>
+"""
+
+
+def get_system_prefix() -> str:
+    """Returns the static, versioned instructions shared by every stage. Pass it as the Agent's extend_system_message"""
+    return SYSTEM_PREFIX
+
+
 def get_tasks(
     flight_info: dict,
     user_info_ls: list[dict],
     user_billing_info: dict,
 ) -> tuple[str, str, str, str]:
     """
-    Injects user context into a series of prompt templates for tasks 1 - 4
+    Injects user context into short per-stage task suffixes for tasks 1 - 4.
+
+    All static instructions live in get_system_prefix(), so the tasks only name the stage
+    playbook to follow and carry the user-specific values.
 
     Returns
         a tuple of form (task1, task2, task3, task4)
@@ -64,17 +196,16 @@ def get_tasks(
             ret += f"- {key.replace('_', ' ').title()}: {value}\n"
         return ret
 
-    ### TASK 1
-    task1 = f"""
-# CONTEXT
-You are booking a {flight_type} flight from {flight_info["departure_airport"]} to {flight_info["arrival_airport"]}. 
-You are currently on the home page of an airline. There should be a form to search for flights.
-If you do not see a form to search for flights, immediately exit by using the "done" action with success=False. 
-    
-# GOAL
-Your goal is to search for **{flight_type}** flights from {flight_info["departure_airport"]} to {flight_info["arrival_airport"]} using the form.
-If done correctly, submitting the form will take you to a page that lists different possible departing flights by time, price, and other characteristics.
+    def stage_header(stage: str) -> str:
+        return (
+            f"# STAGE: {stage}\n"
+            f"Follow the {stage} playbook in <stage_playbooks>. "
+            f"You are booking a {flight_type} flight from {flight_info['departure_airport']} to {flight_info['arrival_airport']}.\n"
+        )
 
+    ### TASK 1
+    task1 = stage_header("SEARCH FLIGHTS")
+    task1 += f"""
 ## FLIGHT SEARCH CRITERIA
 - **Trip Type**: {flight_type}
 - **Departure Airport Code**: {flight_info["departure_airport"]}
@@ -86,195 +217,29 @@ If done correctly, submitting the form will take you to a page that lists differ
 - **Number of Passengers**: {flight_info["adult_passengers"]}
 - **Routing Type**: {routing_mapping[flight_info["routing"]]}
 - **Cabin Class**: {flight_info["cabin_class"]}
-
-## VALIDATION STRATEGY
-Before taking any action, always:
-1. Use your screenshot to verify that the current state matches your intended action
-2. If selecting from a dropdown, confirm the selected value is visible in the screenshot
-3. State explicitly what you see vs what you intended.
-
-## POPOVER STRATEGY
-When interacting with dropdowns or date pickers, always follow the following steps:
-1. Review your screenshot of the current state
-2. Click to open the dropdown/picker
-3. Review your screenshot again to see available options
-4. Select the correct option
-5. Review your screensot again to confirm the selection
-6. Only then proceed to the next field
-
-# GOAL COMPLETION VERIFICATION
-Before indicating that the goal is complete, you must:
-1. Take a final screenshot
-2. Identify 3 specific visual indicators that prove you've reached the target state
-3. List what you expected to see vs what you actually see
-4. Only mark complete if ALL indicators match expectations
-"""
-
-    task1 += """
-
-# COMMON ISSUES
-- Date pickers can be finnicky. When populating the departure and return date, use the input_text action first. Provide the date in the form "MMDD". Then, select the desired date in the picker.
-- Some input fields may be pre-populated - ALWAYS use clear_text before using input_text to avoid issues.
-- Depending on the airline, not every field will be applicable when searching for flights. If the search form doesn't accept one or more of the FLIGHT SEARCH CRITERIA, ignore it and proceed. For example, Southwest does not require Cabin Class or Routing Type to search for flights. 
-- Date pickers may default to today's date. Always verify that the correct departure and return dates (if applicable) are selected before proceeding.
-- You will need to click a button to actually submit your search query. Common labels for this button are "Search Flights" or "Find Flights". Make sure that you are using the correct button, as some promotional buttons (e.g. "Book Now", "Learn More") will navigate you away from the search page.
-
-# RECOVERY STRATEGY
-If you find yourself stuck or unable to locate expected elements, try these options in order:
-1. Scroll on the page to find missing elements
-2. Refresh the page once
-3. If you are still stuck, use the "done" action with success=False. 
 """
 
     ### TASK 2
-    if flight_info["round_trip"]:
-        task2 = f"""
-# CONTEXT
-You are in the process of booking a {flight_type} flight from {flight_info["departure_airport"]} to {flight_info["arrival_airport"]}. 
-You should currently be on the page to select a departing flight from a list of available options.
-If you do not see a list of different options for flight times, prices, and cabin classes, immediately exit by using the "done" action with success=False. 
-
-# GOAL
-Your overall goal is to continue with the booking process until you reach a page that explicitly requests Passenger or Traveler Information such as First Name, Last Name, and Date of Birth.
-There are 3 general steps for this:
-1. Review available flight options and select the **cheapest** departing flight. Continue to the returning flight selection page.
-    - The flight must meet the following criteria:
-        - Routing Type: {routing_mapping[flight_info["routing"]]}
-        - Cabin Class: {flight_info["cabin_class"]}
-    - Indicators of success:
-        1. Page title or page URL changes from the departure selection page. Typically they will contain the word "Return".
-        2. There is a "departing flight" summary visible showing your previously selected departing flight.
-2. Review available flight options and select the **cheapest** returning flight. Continue to the next page.
-    - The flight must meet the same criteria as above.
-    - Indicators of success:
-        1. The page title or page URL changes from the return selection page. Typically you will be on some kind of confirmation or add-ons page.
-2. Navigate from the confirmation or add-ons page to the page that explicitly requests Passenger or Traveler information. You may need to scroll to find a "Continue" button.
-
-## FLIGHT SELECTION STRATEGY
-When selecting a departing and returning flight, use the following strategy:
-1. Sort flights by price (lowest to highest) if the option is available
-2. Look for the cheapest option that meets cabin and routing requirements
-3. If multiple flights have the same price, you may pick any of them.
-
-# GOAL COMPLETION VERIFICATION
-Before indicating that the goal is complete, you must:
-1. Take a final screenshot
-2. Identify 3 specific visual indicators that prove you've reached the target state
-3. List what you expected to see vs what you actually see
-4. Only mark complete if ALL indicators match expectations
-
-# RECOVERY STRATEGY
-If you find yourself stuck or unable to locate expected elements, try these options in order:
-1. Scroll on the page to find missing elements
-2. Refresh the page once
-3. If you are still stuck, use the "done" action with success=False. 
-"""
-
-    else:
-        task2 = f"""
-# CONTEXT
-You are in the process of booking a {flight_type} flight from {flight_info["departure_airport"]} to {flight_info["arrival_airport"]}. 
-You should currently be on the page to select a departing flight from a list of available options.
-If you do not see a list of different options for flight times, prices, and cabin classes, immediately exit by using the "done" action with success=False. 
-
-# GOAL
-Your overall goal is to continue with the booking process until you reach a page that explicitly requests Passenger or Traveler Information such as First Name, Last Name, and Date of Birth.
-There are 2 general steps for this:
-1. Review available flight options and select the **cheapest** departing flight. Continue to the next page.
-    - The flight must meet the following criteria:
-        - Routing Type: {routing_mapping[flight_info["routing"]]}
-        - Cabin Class: {flight_info["cabin_class"]}
-    - Indicators of success:
-        1. Page title or page URL changes from the departure selection page. Typically you will be on some kind of confirmation or add-ons page.
-2. Navigate from the confirmation or add-ons page to the page that explicitly requests Passenger or Traveler information. You may need to scroll to find a "Continue" button.
-
-## FLIGHT SELECTION STRATEGY
-When selecting a departing flight, use the following strategy:
-1. Sort flights by price (lowest to highest) if the option is available
-2. Look for the cheapest option that meets cabin and routing requirements
-3. If multiple flights have the same price, you may pick any of them.
-
-# GOAL COMPLETION VERIFICATION
-Before indicating that the goal is complete, you must:
-1. Take a final screenshot
-2. Identify 3 specific visual indicators that prove you've reached the target state
-3. List what you expected to see vs what you actually see
-4. Only mark complete if ALL indicators match expectations
-
-# RECOVERY STRATEGY
-If you find yourself stuck or unable to locate expected elements, try these options in order:
-1. Scroll on the page to find missing elements
-2. Refresh the page once
-3. If you are still stuck, use the "done" action with success=False. 
-"""
-
-    task3 = f"""
-# CONTEXT
-You are in the process of booking a {flight_type} flight from {flight_info["departure_airport"]} to {flight_info["arrival_airport"]}. 
-You are currently on the page to provide traveler information to the airline.
-If you do not see a form requesting traveler information, immediately exit by using the "done" action with success=False. 
-
-# GOAL
-Your goal is to accurately populate and submit the form using the passenger information provided below. 
-ONLY fill fields that actually exist - ignore any passenger information that doesn't have a corresponding field.
-Once you have done so, continue the booking process until you reach a page that explicitly requests Billing or Payment Information.
-
-# GOAL COMPLETION VERIFICATION
-Before indicating that the goal is complete, you must:
-1. Take a final screenshot
-2. Identify 3 specific visual indicators that prove you've reached the target state
-3. List what you expected to see vs what you actually see
-4. Only mark complete if ALL indicators match expectations
-
-# COMMON ISSUES
-- You may need to expand some page elements in order to access all form elements
-- If there are form elements that are not visible in the viewport, use the scroll action.
-
-# RECOVERY STRATEGY
-If you find yourself stuck or unable to locate expected elements, try these options in order:
-1. Scroll on the page to find missing elements
-2. Refresh the page once
-3. If you are still stuck, use the "done" action with success=False
-
-# PASSENGER INFO
+    task2 = stage_header("SELECT FLIGHT")
+    task2 += f"""
+## FLIGHT CRITERIA
+- **Trip Type**: {flight_type}
+- **Routing Type**: {routing_mapping[flight_info["routing"]]} (routing={flight_info["routing"]})
+- **Cabin Class**: {flight_info["cabin_class"]}
 """
+    if flight_info.get("budget") is not None:
+        task2 += f"- **Budget**: at most ${flight_info['budget']:g} per fare\n"
 
+    ### TASK 3
+    task3 = stage_header("TRAVELER INFO")
+    task3 += "\n## PASSENGER INFO\n"
     for idx, user_info in enumerate(user_info_ls):
-        task3 += f"## Passenger #{idx + 1}**\n"
+        task3 += f"### Passenger #{idx + 1}\n"
         task3 += fmt_user_info(user_info)
 
-    task4 = f"""
-# CONTEXT
-You are in the process of booking a {flight_type} flight from {flight_info["departure_airport"]} to {flight_info["arrival_airport"]}. 
-You are currently on the page to provide payment information and complete your booking.
-If you do not see a form requesting payment information, immediately exit by using the "done" action with success=False. 
-
-# GOAL
-Your goal is to populate all requested billing information using the billing details provided below. 
-
-# CRITICAL
-DO NOT CLICK ANY BUTTONS THAT COMPLETE THE PURCHASE. 
-Examples include:
-- "Complete Purchase"
-- "Buy Now" 
-- "Confirm Booking"
-- "Submit Payment"
-- "Book Flight"
-
-# GOAL COMPLETION VERIFICATION
-Before indicating that the goal is complete, you must:
-1. Take a final screenshot
-2. Identify 3 specific visual indicators that prove you've reached the target state
-3. List what you expected to see vs what you actually see
-4. Only mark complete if ALL indicators match expectations
-
-# RECOVERY STRATEGY
-If you find yourself stuck or unable to locate expected elements, try these options in order:
-1. Scroll on the page to find missing elements
-2. Refresh the page once
-3. If you are still stuck, use the "done" action with success=False. 
-
-# BILLING INFO
-{fmt_user_billing_info(user_billing_info)}
-"""
+    ### TASK 4
+    task4 = stage_header("PAYMENT INFO")
+    task4 += f"""
+## BILLING INFO
+{fmt_user_billing_info(user_billing_info)}"""
     return task1, task2, task3, task4
@@ -0,0 +1,705 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Literal
+
+from pydantic import BaseModel
+
+from agent.artifacts import write_gif
+from agent.hooks import patch_method
+
+try:
+    import zstandard
+except ImportError:
+    # optional, without it runs are archived as gzip
+    zstandard = None
+
+if TYPE_CHECKING:
+    from browser_use import Agent
+
+    from agent.pipeline import PipelineResult
+    from agent.trajectory import TrajectoryReplayer
+
+DEFAULT_ARCHIVE_PATH = os.path.join("logs", "archive")
+INDEX_FILENAME = "index.sqlite"
+
+Codec = Literal["zstd", "gzip"]
+EXTENSIONS: dict[Codec, str] = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz"}
+# records are compressed fast while a run streams them, compaction recompresses them harder
+WRITE_LEVELS: dict[Codec, int] = {"zstd": 3, "gzip": 6}
+COMPACT_LEVELS: dict[Codec, int] = {"zstd": 19, "gzip": 9}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    site TEXT,
+    label TEXT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    failed_stage TEXT,
+    records INTEGER NOT NULL DEFAULT 0,
+    raw_bytes INTEGER NOT NULL DEFAULT 0,
+    stored_bytes INTEGER NOT NULL DEFAULT 0,
+    compacted_at TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_site ON runs (site, started_at);
+CREATE INDEX IF NOT EXISTS runs_by_status ON runs (status, started_at);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    steps INTEGER NOT NULL,
+    PRIMARY KEY (run_id, stage)
+);
+CREATE INDEX IF NOT EXISTS stages_by_outcome ON stages (stage, status);
+CREATE TABLE IF NOT EXISTS records (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    stage TEXT,
+    attempt INTEGER,
+    step INTEGER,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    raw_bytes INTEGER NOT NULL,
+    PRIMARY KEY (run_id, seq)
+);
+CREATE INDEX IF NOT EXISTS records_by_step ON records (run_id, stage, step);
+"""
+
+
+def compress_frame(data: bytes, codec: Codec, level: int) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def decompress_frame(frame: bytes, codec: Codec) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(frame)
+    return gzip.decompress(frame)
+
+
+def encode_record(record: dict, codec: Codec, level: int) -> tuple[bytes, int]:
+    """Returns the record as a compressed JSON line and the line's size"""
+    line = (
+        json.dumps(record, ensure_ascii=False, default=str, separators=(",", ":"))
+        + "\n"
+    ).encode("utf-8")
+    return compress_frame(line, codec, level), len(line)
+
+
+def strip_screenshots(record: dict) -> dict:
+    """Drops the screenshots of a step record, by far the largest part of a run"""
+    data = record.get("data")
+    if record.get("kind") == "step" and isinstance(data, dict):
+        if isinstance(data.get("state"), dict):
+            data["state"]["screenshot"] = None
+    return record
+
+
+class ArchivedRun(BaseModel):
+    run_id: str
+    path: str  # relative to the archive root
+    codec: Codec
+    site: str | None = None
+    label: str | None = None
+    started_at: str
+    finished_at: str | None = None
+    status: str  # running, succeeded or failed
+    failed_stage: str | None = None
+    records: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+    compacted_at: str | None = None
+
+
+class ArchivedRecord(BaseModel):
+    run_id: str
+    seq: int
+    kind: str  # step, replayed_step, shortcut_step, summary, trace, mock_checks, ...
+    stage: str | None = None
+    attempt: int | None = None
+    step: int | None = None
+    offset: int
+    length: int
+    raw_bytes: int
+
+
+class RetentionPolicy(BaseModel):
+    """What apply_retention keeps, None disables a rule.
+
+    Failed runs are kept longer than successful ones, they are the ones worth debugging.
+    Compaction keeps every record of a run but drops its screenshots. Runs still marked as
+    running after stale_running_days were never finished, e.g. their worker was killed, and
+    are marked as failed.
+    """
+
+    max_age_days: float | None = 30
+    failed_max_age_days: float | None = 90
+    stale_running_days: float | None = 1
+    compact_after_days: float | None = 7
+    max_total_mb: float | None = None  # the oldest runs are deleted beyond this
+
+
+class RetentionReport(BaseModel):
+    stale_runs: list[str] = []  # marked as failed
+    deleted_runs: list[str] = []
+    compacted_runs: list[str] = []
+    freed_bytes: int = 0
+
+
+class RunArchiveWriter:
+    """Appends the records of one run to its archive file.
+
+    Every record is its own compressed frame and is indexed with its offset as soon as it is
+    written, so a single step can be read back without decompressing the rest of the run, and
+    a run that crashes keeps everything written so far. The frames concatenate into plain
+    JSONL, so `zstdcat` or `zcat` also read a whole run.
+    """
+
+    def __init__(self, archive: "RunArchive", run: ArchivedRun):
+        self.archive = archive
+        self.run_id = run.run_id
+        self.codec = run.codec
+        self.seq = run.records
+        self._lock = threading.Lock()
+        self._file = open(archive.file_path(run), "ab")
+        self._conn = archive._connect(check_same_thread=False)
+
+    def append(
+        self,
+        kind: str,
+        data: Any,
+        stage: str | None = None,
+        attempt: int | None = None,
+        step: int | None = None,
+    ) -> int:
+        """Returns the record's sequence number in the run"""
+        record = {
+            "kind": kind,
+            "stage": stage,
+            "attempt": attempt,
+            "step": step,
+            "data": data,
+        }
+        frame, raw_bytes = encode_record(record, self.codec, WRITE_LEVELS[self.codec])
+        with self._lock:
+            seq = self.seq
+            offset = self._file.tell()
+            self._file.write(frame)
+            self._file.flush()
+            self._conn.execute(
+                "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.run_id,
+                    seq,
+                    kind,
+                    stage,
+                    attempt,
+                    step,
+                    offset,
+                    len(frame),
+                    raw_bytes,
+                ),
+            )
+            self._conn.execute(
+                "UPDATE runs SET records = records + 1, raw_bytes = raw_bytes + ?, stored_bytes = stored_bytes + ? WHERE run_id = ?",
+                (raw_bytes, len(frame), self.run_id),
+            )
+            self._conn.commit()
+            self.seq += 1
+        return seq
+
+    def finish(self, result: "PipelineResult | None"):
+        """Indexes the run's outcome and stages, then closes the writer. Without a result the run is recorded as failed."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, failed_stage = ?, finished_at = ? WHERE run_id = ?",
+                (
+                    "succeeded" if result is not None and result.success else "failed",
+                    result.failed_stage if result is not None else None,
+                    datetime.now().isoformat(timespec="seconds"),
+                    self.run_id,
+                ),
+            )
+            for outcome in result.outcomes if result is not None else []:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        self.run_id,
+                        outcome.stage,
+                        outcome.status,
+                        outcome.success,
+                        outcome.attempts,
+                        outcome.steps,
+                    ),
+                )
+            self._conn.commit()
+        self.close()
+
+    def close(self):
+        """Closes the writer without changing the run's status, e.g. after appending to a finished run"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                self._conn.close()
+
+
+class RunArchive:
+    """Compressed, append-only run archives with a central SQLite index.
+
+    Each run is a single file under <root>/<site>/<YYYY-MM>/ instead of a directory of
+    conversation dumps, histories and GIFs. The index at <root>/index.sqlite lists runs by
+    site, label, status, and each stage's outcome, plus where every record sits in its file.
+    Several processes can write and read the same archive.
+    """
+
+    def __init__(self, root: str = DEFAULT_ARCHIVE_PATH, codec: Codec | None = None):
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("zstd archives need the zstandard package")
+        self.root = root
+        self.codec: Codec = codec or ("zstd" if zstandard is not None else "gzip")
+        os.makedirs(root, exist_ok=True)
+        with self._index() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            os.path.join(self.root, INDEX_FILENAME),
+            timeout=30,
+            check_same_thread=check_same_thread,
+        )
+        conn.row_factory = sqlite3.Row
+        # readers don't block the runs writing to the archive
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _index(self) -> Iterator[sqlite3.Connection]:
+        with closing(self._connect()) as conn:
+            with conn:
+                yield conn
+
+    def file_path(self, run: ArchivedRun) -> str:
+        return os.path.join(self.root, run.path)
+
+    def open_run(
+        self,
+        run_id: str,
+        site: str | None = None,
+        label: str | None = None,
+        started_at: datetime | None = None,
+    ) -> RunArchiveWriter:
+        """Starts the archive of a run, or reopens it to append more records"""
+        run = self.get_run(run_id)
+        if run is None:
+            started_at = started_at or datetime.now()
+            run = ArchivedRun(
+                run_id=run_id,
+                path=os.path.join(
+                    site or "unknown",
+                    started_at.strftime("%Y-%m"),
+                    run_id + EXTENSIONS[self.codec],
+                ),
+                codec=self.codec,
+                site=site,
+                label=label,
+                started_at=started_at.isoformat(timespec="seconds"),
+                status="running",
+            )
+            os.makedirs(os.path.dirname(self.file_path(run)), exist_ok=True)
+            with self._index() as conn:
+                conn.execute(
+                    "INSERT INTO runs (run_id, path, codec, site, label, started_at, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run.run_id,
+                        run.path,
+                        run.codec,
+                        run.site,
+                        run.label,
+                        run.started_at,
+                        run.status,
+                    ),
+                )
+        return RunArchiveWriter(self, run)
+
+    def get_run(self, run_id: str) -> ArchivedRun | None:
+        with self._index() as conn:
+            row = conn.execute(
+                "SELECT * FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        return ArchivedRun(**row) if row is not None else None
+
+    def runs(
+        self,
+        site: str | None = None,
+        label: str | None = None,
+        status: str | None = None,
+        stage: str | None = None,
+        stage_status: str | None = None,
+        since: str | None = None,
+        limit: int | None = None,
+    ) -> list[ArchivedRun]:
+        """Runs matching all given filters, newest first.
+
+        Args
+            stage: only runs that reached this stage
+            stage_status: only runs where stage (or any stage) ended with this agent.pipeline.StageStatus
+            since: only runs started at or after this ISO date
+        """
+        query = "SELECT DISTINCT runs.* FROM runs"
+        conditions, params = [], []
+        if stage is not None or stage_status is not None:
+            query += " JOIN stages ON stages.run_id = runs.run_id"
+        for column, value in (
+            ("runs.site", site),
+            ("runs.label", label),
+            ("runs.status", status),
+            ("stages.stage", stage),
+            ("stages.status", stage_status),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("runs.started_at >= ?")
+            params.append(since)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY runs.started_at DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._index() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [ArchivedRun(**row) for row in rows]
+
+    def records(
+        self, run_id: str, kind: str | None = None, stage: str | None = None
+    ) -> list[ArchivedRecord]:
+        query = "SELECT * FROM records WHERE run_id = ?"
+        params = [run_id]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        if stage is not None:
+            query += " AND stage = ?"
+            params.append(stage)
+        with self._index() as conn:
+            rows = conn.execute(query + " ORDER BY seq", params).fetchall()
+        return [ArchivedRecord(**row) for row in rows]
+
+    def iter_records(
+        self, run_id: str, kind: str | None = None, stage: str | None = None
+    ) -> Iterator[dict]:
+        """Yields the run's records as dicts with kind, stage, attempt, step and data, in order"""
+        query = "SELECT runs.path, runs.codec, records.offset, records.length FROM records JOIN runs ON runs.run_id = records.run_id WHERE records.run_id = ?"
+        params = [run_id]
+        if kind is not None:
+            query += " AND records.kind = ?"
+            params.append(kind)
+        if stage is not None:
+            query += " AND records.stage = ?"
+            params.append(stage)
+        rows = self._query_frames(query + " ORDER BY records.seq", params)
+        if not rows and self.get_run(run_id) is None:
+            raise KeyError(f"Run {run_id} is not archived")
+        if not rows:
+            return
+        f, rows = self._open_frames(rows, query + " ORDER BY records.seq", params)
+        with f:
+            for row in rows:
+                f.seek(row["offset"])
+                yield json.loads(decompress_frame(f.read(row["length"]), row["codec"]))
+
+    def read_step(
+        self, run_id: str, stage: str, step: int, attempt: int | None = None
+    ) -> dict:
+        """Reads a single step's AgentHistory dump, from the last attempt unless attempt is given.
+
+        Only that step's frame is read and decompressed, however large the run.
+
+        Raises
+            KeyError if the run or the step isn't archived
+        """
+        query = "SELECT runs.path, runs.codec, records.offset, records.length FROM records JOIN runs ON runs.run_id = records.run_id WHERE records.run_id = ? AND records.kind = 'step' AND records.stage = ? AND records.step = ?"
+        params = [run_id, stage, step]
+        if attempt is not None:
+            query += " AND records.attempt = ?"
+            params.append(attempt)
+        query += " ORDER BY records.seq DESC LIMIT 1"
+        rows = self._query_frames(query, params)
+        if not rows:
+            raise KeyError(f"Step {step} of {stage} in run {run_id} is not archived")
+        f, (row,) = self._open_frames(rows, query, params)
+        with f:
+            f.seek(row["offset"])
+            frame = f.read(row["length"])
+        return json.loads(decompress_frame(frame, row["codec"]))["data"]
+
+    def _query_frames(self, query: str, params: list) -> list[sqlite3.Row]:
+        """Runs a query for the path, codec, offset and length of records. A single query
+        reads the path together with the offsets, so both are from before or after a compaction"""
+        with self._index() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def _open_frames(self, rows: list[sqlite3.Row], query: str, params: list):
+        """Opens the file the rows point into, querying them again if compaction replaced
+        the file in the meantime. Once open, the file stays readable even if it is deleted.
+
+        Returns
+            the open file and the rows to read from it
+        """
+        try:
+            return open(os.path.join(self.root, rows[0]["path"]), "rb"), rows
+        except FileNotFoundError:
+            rows = self._query_frames(query, params)
+            if not rows:
+                raise
+            return open(os.path.join(self.root, rows[0]["path"]), "rb"), rows
+
+    def export_gif(
+        self,
+        run_id: str,
+        stage: str,
+        path: str,
+        attempt: int | None = None,
+        sample_every: int = 1,
+    ) -> str | None:
+        """Rebuilds a stage's GIF from its archived screenshots, None if it has none (e.g. compacted)"""
+        steps = [
+            record
+            for record in self.iter_records(run_id, kind="step", stage=stage)
+            if attempt is None or record["attempt"] == attempt
+        ]
+        if attempt is None and steps:
+            last_attempt = steps[-1]["attempt"]
+            steps = [record for record in steps if record["attempt"] == last_attempt]
+        screenshots = [
+            record["data"]["state"]["screenshot"]
+            for record in steps
+            if record["data"]["state"].get("screenshot")
+        ]
+        return write_gif(path, screenshots, sample_every) if screenshots else None
+
+    def delete_run(self, run: ArchivedRun) -> int:
+        """Returns the bytes freed"""
+        try:
+            freed = os.path.getsize(self.file_path(run))
+            os.remove(self.file_path(run))
+        except FileNotFoundError:
+            freed = 0
+        try:
+            # drops the site and month directories once they are empty
+            os.removedirs(os.path.dirname(self.file_path(run)))
+        except OSError:
+            pass
+        with self._index() as conn:
+            for table in ("records", "stages", "runs"):
+                conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run.run_id,))
+        return freed
+
+    def mark_failed(self, run: ArchivedRun):
+        """Records a run that never finished, e.g. because its process was killed, as failed"""
+        with self._index() as conn:
+            conn.execute(
+                "UPDATE runs SET status = 'failed' WHERE run_id = ? AND status = 'running'",
+                (run.run_id,),
+            )
+
+    def compact_run(self, run: ArchivedRun) -> int:
+        """Rewrites a finished run without screenshots, at a higher compression level.
+
+        The compacted run is written to a new file and the index points to it in the same
+        transaction as the new offsets, so readers always see a path and offsets that belong
+        together. The old file is deleted afterwards, readers that already opened it can
+        still finish reading it.
+
+        Returns
+            the bytes freed
+        """
+        entries = self.records(run.run_id)
+        path = self.file_path(run)
+        new_run_path = os.path.join(
+            os.path.dirname(run.path),
+            f"{run.run_id}.compacted-{uuid.uuid4().hex[:8]}{EXTENSIONS[run.codec]}",
+        )
+        new_path = os.path.join(self.root, new_run_path)
+        rows = []
+        stored = 0
+        with open(path, "rb") as src, open(new_path, "wb") as dst:
+            for entry in entries:
+                src.seek(entry.offset)
+                record = json.loads(decompress_frame(src.read(entry.length), run.codec))
+                frame, raw_bytes = encode_record(
+                    strip_screenshots(record), run.codec, COMPACT_LEVELS[run.codec]
+                )
+                rows.append((dst.tell(), len(frame), raw_bytes, run.run_id, entry.seq))
+                dst.write(frame)
+                stored += len(frame)
+        freed = os.path.getsize(path) - stored
+        with self._index() as conn:
+            conn.executemany(
+                "UPDATE records SET offset = ?, length = ?, raw_bytes = ? WHERE run_id = ? AND seq = ?",
+                rows,
+            )
+            conn.execute(
+                "UPDATE runs SET path = ?, raw_bytes = ?, stored_bytes = ?, compacted_at = ? WHERE run_id = ?",
+                (
+                    new_run_path,
+                    sum(row[2] for row in rows),
+                    stored,
+                    datetime.now().isoformat(timespec="seconds"),
+                    run.run_id,
+                ),
+            )
+        run.path = new_run_path
+        try:
+            os.remove(path)
+        except OSError as e:
+            # e.g. still open by a reader on Windows
+            logging.warning(f"Could not delete {path} after compacting it: {e}")
+        return freed
+
+    def apply_retention(
+        self,
+        policy: RetentionPolicy,
+        now: datetime | None = None,
+        dry_run: bool = False,
+    ) -> RetentionReport:
+        """Marks stale running runs as failed, deletes expired runs, compacts older ones, then
+        deletes the oldest runs over the size budget.
+
+        Runs still being written are never touched.
+        """
+        now = now or datetime.now()
+        report = RetentionReport()
+
+        def older_than(run: ArchivedRun, days: float | None) -> bool:
+            return days is not None and datetime.fromisoformat(
+                run.started_at
+            ) < now - timedelta(days=days)
+
+        runs = []
+        for run in self.runs():
+            if run.status == "running":
+                if not older_than(run, policy.stale_running_days):
+                    continue
+                report.stale_runs.append(run.run_id)
+                run.status = "failed"
+                if not dry_run:
+                    self.mark_failed(run)
+            runs.append(run)
+        kept = []
+        for run in runs:
+            max_age = (
+                policy.max_age_days
+                if run.status == "succeeded"
+                else policy.failed_max_age_days
+            )
+            if older_than(run, max_age):
+                report.deleted_runs.append(run.run_id)
+                report.freed_bytes += (
+                    run.stored_bytes if dry_run else self.delete_run(run)
+                )
+            else:
+                kept.append(run)
+
+        for run in kept:
+            if run.compacted_at is None and older_than(run, policy.compact_after_days):
+                report.compacted_runs.append(run.run_id)
+                if not dry_run:
+                    freed = self.compact_run(run)
+                    report.freed_bytes += freed
+                    run.stored_bytes -= freed
+
+        if policy.max_total_mb is not None:
+            total = sum(run.stored_bytes for run in kept)
+            # runs() is newest first
+            for run in reversed(kept):
+                if total <= policy.max_total_mb * 2**20:
+                    break
+                report.deleted_runs.append(run.run_id)
+                total -= run.stored_bytes
+                report.freed_bytes += (
+                    run.stored_bytes if dry_run else self.delete_run(run)
+                )
+
+        logging.info(
+            f"Retention {'would delete' if dry_run else 'deleted'} {len(report.deleted_runs)} runs and compact {len(report.compacted_runs)}, freeing {report.freed_bytes / 2**20:.1f} MB"
+        )
+        return report
+
+
+def archive_agent_steps(
+    agent: "Agent", writer: RunArchiveWriter, stage: str, attempt: int = 1
+) -> Callable[[], None]:
+    """Appends each step of agent to the run's archive as soon as the step is finished.
+
+    Returns
+        a function that stops archiving the agent's steps
+    """
+
+    def make_wrapper(step):
+        async def archived_step(*args, **kwargs):
+            history = agent.state.history.history
+            known = len(history)
+            try:
+                return await step(*args, **kwargs)
+            finally:
+                for item in history[known:]:
+                    await asyncio.to_thread(
+                        writer.append,
+                        "step",
+                        item.model_dump(),
+                        stage=stage,
+                        attempt=attempt,
+                        step=item.metadata.step_number if item.metadata else None,
+                    )
+
+        return archived_step
+
+    return patch_method(agent, "step", make_wrapper)
+
+
+def archive_replayed_steps(
+    replayer: "TrajectoryReplayer", writer: RunArchiveWriter
+) -> Callable[[], None]:
+    """Appends the steps each stage replays from the trajectory cache to the run's archive.
+
+    Replayed steps have no AgentHistory, so they are archived as replayed_step records of
+    the cached TrajectoryStep, with placeholders instead of the values typed.
+
+    Returns
+        a function that stops archiving the replayer's steps
+    """
+
+    def make_wrapper(replay):
+        async def archived_replay(stage_name: str, *args, **kwargs):
+            result = await replay(stage_name, *args, **kwargs)
+            for idx, step in enumerate(result.steps if result is not None else []):
+                await asyncio.to_thread(
+                    writer.append,
+                    "replayed_step",
+                    step.model_dump(),
+                    stage=stage_name,
+                    step=idx + 1,
+                )
+            return result
+
+        return archived_replay
+
+    return patch_method(replayer, "replay", make_wrapper)
@@ -0,0 +1,251 @@
+import asyncio
+import base64
+import dataclasses
+import io
+import logging
+import math
+from typing import Literal
+
+from browser_use import Agent, BrowserSession
+from PIL import Image
+from pydantic import BaseModel
+
+from agent.hooks import patch_method
+
+# Finds the region the agent is most likely working in: an open popover or dialog, the popup
+# of an expanded combobox, or the form containing the focused element. Returns null when the
+# whole viewport matters.
+FOCUS_REGION_JS = r"""
+() => {
+  const visible = el => {
+    if (!el) return false;
+    const rect = el.getBoundingClientRect();
+    const style = window.getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== "hidden" && style.display !== "none";
+  };
+  const candidates = [
+    ...document.querySelectorAll('[role="dialog"], [aria-modal="true"], [role="listbox"], [role="grid"]'),
+    ...Array.from(document.querySelectorAll('[aria-expanded="true"][aria-controls]'))
+      .map(el => document.getElementById(el.getAttribute("aria-controls"))),
+    document.activeElement && document.activeElement !== document.body ? document.activeElement.closest("form") : null,
+  ].filter(visible);
+  if (!candidates.length) return null;
+  const rect = candidates[0].getBoundingClientRect();
+  return {x: rect.left, y: rect.top, width: rect.width, height: rect.height, scale: window.devicePixelRatio || 1};
+}
+"""
+
+
+class ScreenshotSettings(BaseModel):
+    """Controls how screenshots are processed before they are sent to the LLM.
+
+    dedupe: skip sending a screenshot whose perceptual hash is within hash_distance bits of the
+        last one sent. At most max_consecutive_skips screenshots are skipped in a row.
+    crop_to_focus: crop to the open popover/dialog or the active form (plus crop_margin pixels)
+        when it covers less than max_crop_fraction of the viewport.
+    max_width: downscale screenshots wider than this, keeping the aspect ratio.
+    format/quality: re-encode the image. quality is ignored for png.
+    """
+
+    dedupe: bool = True
+    hash_distance: int = 4
+    max_consecutive_skips: int = 3
+    crop_to_focus: bool = True
+    crop_margin: int = 48
+    max_crop_fraction: float = 0.8
+    max_width: int = 1280
+    format: Literal["png", "jpeg", "webp"] = "jpeg"
+    quality: int = 70
+
+
+class ScreenshotStats(BaseModel):
+    captured: int = 0
+    skipped: int = 0
+    cropped: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    estimated_image_tokens: int = 0
+
+    def summary(self) -> dict:
+        sent = self.captured - self.skipped
+        return {
+            **self.model_dump(),
+            "sent": sent,
+            "avg_kb_sent": round(self.bytes_after / sent / 1024, 1) if sent else 0,
+        }
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """Difference hash: 64 bits describing horizontal brightness gradients of a tiny thumbnail"""
+    small = image.convert("L").resize(
+        (hash_size + 1, hash_size), Image.Resampling.LANCZOS
+    )
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def estimate_gemini_image_tokens(width: int, height: int) -> int:
+    """Gemini bills 258 tokens for images up to 384px, otherwise 258 per 768x768 tile"""
+    if width <= 384 and height <= 384:
+        return 258
+    return math.ceil(width / 768) * math.ceil(height / 768) * 258
+
+
+class ScreenshotPipeline:
+    """Deduplicates, crops, downscales and re-encodes the screenshots browser-use sends to the LLM.
+
+    Screenshots are processed as they are taken, while the page still shows what they show,
+    but browser-use keeps the originals: history, GIFs and the run archive get every frame at
+    full size. Only the copy of the browser state that goes into an instrumented agent's
+    prompt carries the processed image, or None when a duplicate is skipped, which
+    browser-use treats as "no image this step". Decoding, hashing and encoding run in a thread
+    so they don't block the event loop.
+
+    Note that browser-use labels every screenshot as image/png in the request; Gemini detects
+    the actual encoding from the bytes.
+    """
+
+    def __init__(
+        self,
+        browser_session: BrowserSession,
+        settings: ScreenshotSettings | None = None,
+    ):
+        self.browser_session = browser_session
+        self.settings = settings or ScreenshotSettings()
+        self.stats = ScreenshotStats()
+        self._last_hash: int | None = None
+        self._consecutive_skips = 0
+        # the last screenshot taken and what the LLM gets instead
+        self._last: tuple[str, str | None] | None = None
+        self.restore = patch_method(
+            browser_session, "take_screenshot", self._make_wrapper
+        )
+
+    def _make_wrapper(self, take_screenshot):
+        async def processed_take_screenshot(*args, **kwargs):
+            screenshot = await take_screenshot(*args, **kwargs)
+            if not screenshot:
+                return screenshot
+            try:
+                self._last = (screenshot, await self.process(screenshot))
+            except Exception as e:
+                logging.warning(f"Screenshot processing failed, sending original: {e}")
+                self._last = None
+            return screenshot
+
+        return processed_take_screenshot
+
+    def instrument_agent(self, agent: Agent):
+        """Sends the processed screenshots to agent's LLM instead of the originals"""
+
+        def make_wrapper(add_state_message):
+            def add_processed_state_message(browser_state_summary, *args, **kwargs):
+                if (
+                    self._last is not None
+                    and browser_state_summary.screenshot is not None
+                ):
+                    original, processed = self._last
+                    if browser_state_summary.screenshot == original:
+                        browser_state_summary = dataclasses.replace(
+                            browser_state_summary, screenshot=processed
+                        )
+                return add_state_message(browser_state_summary, *args, **kwargs)
+
+            return add_processed_state_message
+
+        patch_method(agent._message_manager, "add_state_message", make_wrapper)
+
+    async def process(self, screenshot_b64: str) -> str | None:
+        """The screenshot as the LLM should see it, None to send no image"""
+        settings = self.settings
+        image, size, image_hash = await asyncio.to_thread(
+            _decode, screenshot_b64, settings.dedupe
+        )
+        self.stats.captured += 1
+        self.stats.bytes_before += size
+
+        if settings.dedupe:
+            unchanged = (
+                self._last_hash is not None
+                and bin(image_hash ^ self._last_hash).count("1")
+                <= settings.hash_distance
+            )
+            if unchanged and self._consecutive_skips < settings.max_consecutive_skips:
+                self._consecutive_skips += 1
+                self.stats.skipped += 1
+                return None
+            self._last_hash = image_hash
+            self._consecutive_skips = 0
+
+        box = None
+        if settings.crop_to_focus:
+            box = await self._focus_box(image.width, image.height)
+            self.stats.cropped += box is not None
+
+        encoded, width, height = await asyncio.to_thread(_encode, image, box, settings)
+        self.stats.bytes_after += len(encoded)
+        self.stats.estimated_image_tokens += estimate_gemini_image_tokens(width, height)
+        return base64.b64encode(encoded).decode("utf-8")
+
+    async def _focus_box(
+        self, width: int, height: int
+    ) -> tuple[int, int, int, int] | None:
+        """The crop box of the focused region, None to keep the whole viewport"""
+        page = await self.browser_session.get_current_page()
+        region = await page.evaluate(FOCUS_REGION_JS)
+        if not region:
+            return None
+
+        scale = region["scale"]
+        margin = self.settings.crop_margin
+        left = max(0, int((region["x"] - margin) * scale))
+        top = max(0, int((region["y"] - margin) * scale))
+        right = min(width, int((region["x"] + region["width"] + margin) * scale))
+        bottom = min(height, int((region["y"] + region["height"] + margin) * scale))
+        if right <= left or bottom <= top:
+            return None
+
+        fraction = (right - left) * (bottom - top) / (width * height)
+        if fraction > self.settings.max_crop_fraction:
+            return None
+        return left, top, right, bottom
+
+    def reset_stats(self) -> ScreenshotStats:
+        stats, self.stats = self.stats, ScreenshotStats()
+        return stats
+
+
+def _decode(
+    screenshot_b64: str, with_hash: bool
+) -> tuple[Image.Image, int, int | None]:
+    raw = base64.b64decode(screenshot_b64)
+    image = Image.open(io.BytesIO(raw))
+    image.load()
+    return image, len(raw), dhash(image) if with_hash else None
+
+
+def _encode(
+    image: Image.Image,
+    box: tuple[int, int, int, int] | None,
+    settings: ScreenshotSettings,
+) -> tuple[bytes, int, int]:
+    if box is not None:
+        image = image.crop(box)
+    if image.width > settings.max_width:
+        height = round(image.height * settings.max_width / image.width)
+        image = image.resize((settings.max_width, height), Image.Resampling.LANCZOS)
+
+    out = io.BytesIO()
+    if settings.format == "png":
+        image.save(out, format="PNG", optimize=True)
+    else:
+        image.convert("RGB").save(
+            out, format=settings.format.upper(), quality=settings.quality
+        )
+    return out.getvalue(), image.width, image.height
@@ -53,7 +53,8 @@ def create_fresh_browser_session():
         headless=False,
         # viewport_expansion=0,  # websites have anti-automation blockers
         keep_alive=True,
-        minimum_wait_page_load_time=0.5,
+        # PageStability's wait for the page to settle takes care of this, so only keep a floor
+        minimum_wait_page_load_time=0.1,
         storage_state=None,  # No stored cookies/localStorage
         window_size=window_size,
     )
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import time
+
+from browser_use import BrowserSession
+from playwright.async_api import BrowserContext, Page, Request
+from pydantic import BaseModel
+
+from agent.hooks import patch_method
+
+# The rules used to ask for a 1 second wait action after closing every popover. Used to
+# estimate the time saved, like the network idle time browser-use waits for on page loads
+POPOVER_FIXED_SECONDS = 1.0
+
+# long-lived connections never finish, so they don't count against network idle
+IGNORED_RESOURCE_TYPES = {"websocket", "eventsource", "media"}
+# analytics beacons and long polls can stay open for a long time, so requests older than
+# this are treated as background traffic
+STALE_REQUEST_SECONDS = 3.0
+
+# Waits until nothing in the document has changed for quietMs and no finite animation
+# (transitions, slide-ins) is running, or until timeoutMs. The MutationObserver is installed
+# once per document, so a page that settled before the call returns right away.
+WAIT_FOR_QUIET_DOM_JS = r"""
+({ quietMs, timeoutMs }) => new Promise(resolve => {
+  if (!window.__pageStability) {
+    const state = window.__pageStability = { lastMutation: performance.now() };
+    new MutationObserver(() => { state.lastMutation = performance.now(); })
+      .observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+  }
+  const state = window.__pageStability;
+  const start = performance.now();
+  // infinite animations (spinners, pulsing badges) would never finish, so only finite ones count
+  const runningAnimations = () => typeof document.getAnimations !== "function" ? 0 : document.getAnimations()
+    .filter(a => a.playState === "running" && Number.isFinite(a.effect?.getComputedTiming().endTime ?? Infinity)).length;
+  const check = () => {
+    const now = performance.now();
+    const animations = runningAnimations();
+    const quiet = now - state.lastMutation >= quietMs;
+    if ((quiet && animations === 0) || now - start >= timeoutMs) {
+      resolve({ settled: quiet && animations === 0, animations });
+    } else {
+      setTimeout(check, 50);
+    }
+  };
+  check();
+})
+"""
+
+
+class NetworkTracker:
+    """Counts in-flight requests of a browser context from Playwright's request events"""
+
+    def __init__(self):
+        self.context: BrowserContext | None = None
+        self.in_flight: dict[Request, float] = {}
+        self.last_activity = time.perf_counter()
+
+    def attach(self, context: BrowserContext):
+        if context is self.context:
+            return
+        self.context = context
+        self.in_flight.clear()
+        context.on("request", self._on_request)
+        context.on("requestfinished", self._on_done)
+        context.on("requestfailed", self._on_done)
+
+    def _on_request(self, request: Request):
+        if request.resource_type in IGNORED_RESOURCE_TYPES:
+            return
+        self.in_flight[request] = self.last_activity = time.perf_counter()
+
+    def _on_done(self, request: Request):
+        if self.in_flight.pop(request, None) is not None:
+            self.last_activity = time.perf_counter()
+
+    def pending(self) -> int:
+        now = time.perf_counter()
+        return sum(
+            1
+            for started in self.in_flight.values()
+            if now - started < STALE_REQUEST_SECONDS
+        )
+
+    def idle_for(self, seconds: float) -> bool:
+        return (
+            self.pending() == 0 and time.perf_counter() - self.last_activity >= seconds
+        )
+
+
+class StabilityResult(BaseModel):
+    settled: bool
+    seconds: float
+    waiting_on: str | None = None
+
+
+async def wait_for_stable(
+    page: Page,
+    network: NetworkTracker | None = None,
+    quiet: float = 0.25,
+    timeout: float = 5.0,
+) -> StabilityResult:
+    """Waits until the page is idle: no network requests, no DOM mutations and no running animations for quiet seconds.
+
+    Args
+        network: tracker for the page's browser context. Without one, only the DOM and
+            animations are checked
+        timeout: upper bound in seconds. The wait ends as soon as the page settles
+
+    Returns
+        whether the page settled, how long the wait took and, on timeout, what was still busy
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    waiting_on = None
+    while (remaining := deadline - time.perf_counter()) > 0:
+        try:
+            dom = await page.evaluate(
+                WAIT_FOR_QUIET_DOM_JS,
+                {"quietMs": quiet * 1000, "timeoutMs": remaining * 1000},
+            )
+        except Exception as e:
+            # a navigation destroys the execution context mid-wait
+            logging.debug(f"Stability check interrupted: {e}")
+            waiting_on = "navigation"
+            await asyncio.sleep(0.05)
+            continue
+        if not dom["settled"]:
+            waiting_on = "animations" if dom["animations"] else "dom"
+            break
+        if network is None or network.idle_for(quiet):
+            return StabilityResult(
+                settled=True, seconds=round(time.perf_counter() - start, 3)
+            )
+        waiting_on = "network"
+        await asyncio.sleep(0.05)
+    return StabilityResult(
+        settled=False,
+        seconds=round(time.perf_counter() - start, 3),
+        waiting_on=waiting_on,
+    )
+
+
+class StabilityStats(BaseModel):
+    """fixed_seconds sums the fixed delays the waits replaced, so saved_seconds is a lower
+    bound: the replaced waits took at least that long, longer on busy pages"""
+
+    waits: int = 0
+    timed_out: int = 0
+    waited_seconds: float = 0
+    fixed_seconds: float = 0
+
+    def summary(self) -> dict:
+        return {
+            **self.model_dump(),
+            "waited_seconds": round(self.waited_seconds, 3),
+            # negative when pages needed longer than the fixed delays allowed
+            "saved_seconds": round(self.fixed_seconds - self.waited_seconds, 3),
+            "avg_wait_seconds": round(self.waited_seconds / self.waits, 3)
+            if self.waits
+            else 0,
+        }
+
+
+class PageStability:
+    """Replaces browser-use's network idle wait on page loads with wait_for_stable.
+
+    browser-use waited for wait_for_network_idle_page_load_time (0.5s by default) without
+    a request every time it read the page. Now it waits only until the network, DOM and
+    animations have settled. The rest of its page-load wait, i.e. the new tab shortcut, the
+    allowed-URL check and the minimum_wait_page_load_time (or timeout_overwrite) floor, still
+    runs as before. Controller actions use wait() too, so all waits of a run are counted in
+    the same stats.
+    """
+
+    def __init__(
+        self, browser_session: BrowserSession, quiet: float = 0.25, timeout: float = 5.0
+    ):
+        self.browser_session = browser_session
+        self.quiet = quiet
+        self.timeout = timeout
+        self.network = NetworkTracker()
+        self.stats = StabilityStats()
+        self.restore = patch_method(
+            browser_session, "_wait_for_stable_network", self._make_wrapper
+        )
+
+    def _make_wrapper(self, wait_for_stable_network):
+        async def stable_wait_for_stable_network():
+            profile = self.browser_session.browser_profile
+            await self.wait(fixed_seconds=profile.wait_for_network_idle_page_load_time)
+
+        return stable_wait_for_stable_network
+
+    async def wait(
+        self,
+        page: Page | None = None,
+        fixed_seconds: float = 0,
+        timeout: float | None = None,
+    ) -> StabilityResult:
+        """Waits for the page to settle and records the wait against the fixed delay it replaces"""
+        if self.browser_session.browser_context is not None:
+            self.network.attach(self.browser_session.browser_context)
+        page = page or await self.browser_session.get_current_page()
+        result = await wait_for_stable(
+            page, self.network, quiet=self.quiet, timeout=timeout or self.timeout
+        )
+        self.stats.waits += 1
+        self.stats.timed_out += not result.settled
+        self.stats.waited_seconds += result.seconds
+        self.stats.fixed_seconds += fixed_seconds
+        if not result.settled:
+            logging.info(
+                f"Page still busy ({result.waiting_on}) after {result.seconds}s, continuing"
+            )
+        return result
+
+    def reset_stats(self) -> StabilityStats:
+        stats, self.stats = self.stats, StabilityStats()
+        return stats
@@ -0,0 +1,398 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from string import Template
+from urllib.parse import urlparse
+
+from browser_use import ActionResult, BrowserSession, Controller
+from browser_use.agent.views import AgentHistoryList
+from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
+from browser_use.dom.history_tree_processor.view import DOMHistoryElement
+from pydantic import BaseModel
+
+# actions that only make sense as an LLM decision, or that talk to a human
+NON_REPLAYABLE_ACTIONS = {
+    "done",
+    "request_assistance",
+    "extract_structured_data",
+    "write_file",
+    "replace_file_str",
+    "read_file",
+}
+# stages that type passenger and card data. Their trajectories are only recorded and replayed
+# when every typed value is a placeholder, so one passenger's data (or a reformatted card
+# number, an MM/YY expiry) is never written to disk or typed into another passenger's booking
+SENSITIVE_STAGES = {"traveler_info", "payment_info"}
+# string params that name the field to fill, not the value typed into it
+FIELD_NAME_PARAMS = {"target"}
+
+_PLACEHOLDER = re.compile(r"\$\{\w+\}")
+
+
+class TrajectoryStep(BaseModel):
+    """A single recorded action. String params may contain $placeholders for flight/passenger values."""
+
+    action: str
+    params: dict
+    element: dict | None = (
+        None  # DOMHistoryElement.to_dict() of the element the action targeted
+    )
+    url: str | None = None  # url of the page when the action was taken
+
+
+class Trajectory(BaseModel):
+    site: str
+    variant: str
+    stage: str
+    steps: list[TrajectoryStep]
+    end_url: str | None = None
+
+
+class ReplayResult(BaseModel):
+    """Outcome of replaying a cached trajectory.
+
+    completed is only True if every step replayed and the page ended up where the
+    recorded run ended. Otherwise diverged_reason describes where replay stopped.
+    """
+
+    steps: list[TrajectoryStep] = []
+    completed: bool = False
+    diverged_reason: str | None = None
+
+    @property
+    def replayed_steps(self) -> int:
+        return len(self.steps)
+
+
+def trajectory_params(
+    flight_info: dict, user_info_ls: list[dict], user_billing_info: dict
+) -> dict[str, str]:
+    """Flattens booking inputs into the placeholder values used to parameterize trajectories"""
+    params = {}
+
+    def add(prefix: str, info: dict):
+        for key, value in info.items():
+            # skip booleans and tiny values like passenger counts which would match too much
+            if value is None or isinstance(value, bool) or len(str(value)) < 2:
+                continue
+            params[f"{prefix}_{key}"] = str(value)
+
+    add("flight", flight_info)
+    for idx, user_info in enumerate(user_info_ls, 1):
+        add(f"passenger{idx}", user_info)
+    add("billing", user_billing_info)
+
+    # the search prompt asks for dates to be typed as MMDD
+    for key in ("departure_date", "return_date"):
+        if flight_info.get(key):
+            _, month, day = flight_info[key].split("-")
+            params[f"flight_{key}_mmdd"] = f"{month}{day}"
+
+    return params
+
+
+def templatize(value, params: dict[str, str]):
+    """Replaces string values that exactly match a booking input with a $placeholder"""
+    if isinstance(value, dict):
+        return {k: templatize(v, params) for k, v in value.items()}
+    if isinstance(value, list):
+        return [templatize(v, params) for v in value]
+    if not isinstance(value, str):
+        return value
+    for key, param_value in params.items():
+        if value == param_value:
+            return f"${{{key}}}"
+    return value.replace("$", "$$")
+
+
+def render(value, params: dict[str, str]):
+    """Inverse of templatize. Raises KeyError if a placeholder has no value for this run."""
+    if isinstance(value, dict):
+        return {k: render(v, params) for k, v in value.items()}
+    if isinstance(value, list):
+        return [render(v, params) for v in value]
+    if not isinstance(value, str):
+        return value
+    return Template(value).substitute(params)
+
+
+def literal_values(value) -> list[str]:
+    """String values of templatized params that are not a single $placeholder, i.e. would be
+    stored and replayed as typed"""
+    if isinstance(value, dict):
+        return [
+            literal
+            for k, v in value.items()
+            if k not in FIELD_NAME_PARAMS
+            for literal in literal_values(v)
+        ]
+    if isinstance(value, list):
+        return [literal for v in value for literal in literal_values(v)]
+    if isinstance(value, str) and not _PLACEHOLDER.fullmatch(value):
+        return [value]
+    return []
+
+
+def has_literal_values(steps: list[TrajectoryStep]) -> bool:
+    return any(literal_values(step.params) for step in steps)
+
+
+def index_targets(params: dict) -> list[str]:
+    """Element indices targeted inside params, e.g. fill_form's fields[].target. Only the
+    element of a top-level index is recorded, so these can't be remapped on replay"""
+    return [
+        field["target"]
+        for field in params.get("fields") or []
+        if isinstance(field, dict) and str(field.get("target", "")).strip().isdigit()
+    ]
+
+
+def steps_from_history(
+    history: AgentHistoryList, params: dict[str, str]
+) -> list[TrajectoryStep]:
+    """Extracts the actions that executed without error from an agent run"""
+    steps = []
+    for item in history.history:
+        if not item.model_output:
+            continue
+        for idx, action in enumerate(item.model_output.action):
+            # multi_act stops early on errors and page changes, so results can be shorter
+            if idx >= len(item.result) or item.result[idx].error:
+                break
+            action_dump = action.model_dump(exclude_none=True)
+            if not action_dump:
+                continue
+            name, action_params = next(iter(action_dump.items()))
+            if name in NON_REPLAYABLE_ACTIONS:
+                continue
+            element = None
+            if idx < len(item.state.interacted_element):
+                interacted = item.state.interacted_element[idx]
+                element = interacted.to_dict() if interacted else None
+            steps.append(
+                TrajectoryStep(
+                    action=name,
+                    params=templatize(action_params or {}, params),
+                    element=element,
+                    url=item.state.url,
+                )
+            )
+    return steps
+
+
+class TrajectoryCache:
+    """Stores successful action sequences on disk, keyed by site, variant (e.g. round_trip) and stage"""
+
+    def __init__(self, cache_dir: str = "trajectory_cache"):
+        self.cache_dir = cache_dir
+
+    def _path(self, site: str, variant: str, stage: str) -> str:
+        return os.path.join(self.cache_dir, site, variant, f"{stage}.json")
+
+    def load(self, site: str, variant: str, stage: str) -> Trajectory | None:
+        path = self._path(site, variant, stage)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return Trajectory.model_validate(json.load(f))
+
+    def save(self, trajectory: Trajectory):
+        path = self._path(trajectory.site, trajectory.variant, trajectory.stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trajectory.model_dump(), f, indent=2, ensure_ascii=False)
+        logging.info(f"Saved {len(trajectory.steps)} step trajectory to {path}")
+
+
+def _history_element(element: dict) -> DOMHistoryElement:
+    return DOMHistoryElement(
+        tag_name=element["tag_name"],
+        xpath=element["xpath"],
+        highlight_index=element.get("highlight_index"),
+        entire_parent_branch_path=element["entire_parent_branch_path"],
+        attributes=element["attributes"],
+        shadow_root=element.get("shadow_root", False),
+        css_selector=element.get("css_selector"),
+    )
+
+
+def _same_page(url_a: str | None, url_b: str | None) -> bool:
+    if not url_a or not url_b:
+        return False
+    a, b = urlparse(url_a), urlparse(url_b)
+    return a.netloc == b.netloc and a.path.rstrip("/") == b.path.rstrip("/")
+
+
+async def replay_trajectory(
+    trajectory: Trajectory,
+    controller: Controller,
+    browser_session: BrowserSession,
+    params: dict[str, str],
+    initial_actions: list[dict] | None = None,
+    delay: float = 0.5,
+) -> ReplayResult:
+    """Replays a cached trajectory directly through the controller, without calling the LLM.
+
+    Before every step two cheap DOM assertions are checked: the page url path must match the
+    recorded one, and the recorded target element must be found in the current DOM. The step's
+    element index is remapped to wherever that element is now. Replay stops at the first
+    assertion or action that fails.
+    """
+    result = ReplayResult()
+
+    for action in initial_actions or []:
+        name, action_params = next(iter(action.items()))
+        await controller.registry.execute_action(
+            name, action_params, browser_session=browser_session
+        )
+
+    for idx, step in enumerate(trajectory.steps):
+        state = await browser_session.get_browser_state_with_recovery(
+            cache_clickable_elements_hashes=False, include_screenshot=False
+        )
+        if step.url and not _same_page(state.url, step.url):
+            result.diverged_reason = (
+                f"step {idx}: expected page {step.url}, found {state.url}"
+            )
+            return result
+
+        try:
+            action_params = render(step.params, params)
+        except KeyError as e:
+            result.diverged_reason = f"step {idx}: no value for placeholder {e}"
+            return result
+
+        if index_targets(action_params):
+            result.diverged_reason = f"step {idx}: {step.action} targets element indices that can't be remapped"
+            return result
+        if step.element is None and "index" in action_params:
+            result.diverged_reason = (
+                f"step {idx}: no recorded element for {step.action}"
+            )
+            return result
+        if step.element is not None:
+            current = HistoryTreeProcessor.find_history_element_in_tree(
+                _history_element(step.element), state.element_tree
+            )
+            if current is None or current.highlight_index is None:
+                result.diverged_reason = f"step {idx}: element <{step.element['tag_name']}> for {step.action} not found"
+                return result
+            if "index" in action_params:
+                action_params["index"] = current.highlight_index
+
+        try:
+            action_result = await controller.registry.execute_action(
+                step.action, action_params, browser_session=browser_session
+            )
+        except Exception as e:
+            result.diverged_reason = f"step {idx}: {step.action} raised {e}"
+            return result
+        if isinstance(action_result, ActionResult) and action_result.error:
+            result.diverged_reason = (
+                f"step {idx}: {step.action} failed with {action_result.error}"
+            )
+            return result
+
+        result.steps.append(step)
+        await asyncio.sleep(delay)
+
+    page = await browser_session.get_current_page()
+    if _same_page(page.url, trajectory.end_url):
+        result.completed = True
+    else:
+        result.diverged_reason = (
+            f"replay ended on {page.url} instead of {trajectory.end_url}"
+        )
+    return result
+
+
+class TrajectoryReplayer:
+    """Binds a TrajectoryCache to a single booking run so the pipeline can replay and record stages"""
+
+    def __init__(
+        self,
+        cache: TrajectoryCache,
+        site: str,
+        variant: str,
+        params: dict[str, str],
+        controller: Controller,
+        browser_session: BrowserSession,
+        sensitive_stages: set[str] = SENSITIVE_STAGES,
+    ):
+        self.cache = cache
+        self.site = site
+        self.variant = variant
+        self.params = params
+        self.controller = controller
+        self.browser_session = browser_session
+        self.sensitive_stages = sensitive_stages
+
+    async def replay(self, stage_name: str, initial_actions: list[dict] | None):
+        """Returns None if there is no cached trajectory for this stage"""
+        trajectory = self.cache.load(self.site, self.variant, stage_name)
+        if trajectory is None:
+            return None
+        if stage_name in self.sensitive_stages and has_literal_values(trajectory.steps):
+            # e.g. recorded before values had to be placeholders
+            logging.warning(
+                f"Not replaying {self.site}/{stage_name}, its trajectory types literal values"
+            )
+            return None
+        logging.info(
+            f"Replaying {len(trajectory.steps)} cached steps for {self.site}/{stage_name}"
+        )
+        try:
+            result = await replay_trajectory(
+                trajectory,
+                controller=self.controller,
+                browser_session=self.browser_session,
+                params=self.params,
+                initial_actions=initial_actions,
+            )
+        except Exception as e:
+            # most likely an initial action failed, so let the agent run the whole stage
+            logging.warning(f"Replay of {self.site}/{stage_name} failed: {e}")
+            return None
+        if not result.completed:
+            logging.info(
+                f"Replay of {self.site}/{stage_name} diverged after {result.replayed_steps} steps: {result.diverged_reason}"
+            )
+        return result
+
+    async def record(
+        self,
+        stage_name: str,
+        replayed_steps: list[TrajectoryStep],
+        history: AgentHistoryList,
+    ):
+        """Saves the stage's replayed and agent steps, unless a sensitive stage typed a value
+        that is not a booking input, which would leak into other bookings, or a step targets
+        element indices that replay couldn't remap"""
+        steps = replayed_steps + steps_from_history(history, self.params)
+        unanchored = [step.action for step in steps if index_targets(step.params)]
+        if unanchored:
+            logging.info(
+                f"Not recording {self.site}/{stage_name}: {', '.join(unanchored)} target element "
+                f"indices, which change when the page layout does"
+            )
+            return
+        if stage_name in self.sensitive_stages and has_literal_values(steps):
+            # the values themselves are not logged, they may be card or passenger data
+            literal_steps = sum(1 for step in steps if literal_values(step.params))
+            logging.warning(
+                f"Not recording {self.site}/{stage_name}: {literal_steps} steps type values "
+                f"that are not booking inputs"
+            )
+            return
+        page = await self.browser_session.get_current_page()
+        self.cache.save(
+            Trajectory(
+                site=self.site,
+                variant=self.variant,
+                stage=stage_name,
+                steps=steps,
+                end_url=page.url,
+            )
+        )
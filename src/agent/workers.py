@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable, Literal
+
+import psutil
+from pydantic import BaseModel
+
+from agent.assistance import AssistanceBroker, AssistanceRequest, console_broker
+from agent.pipeline import PipelineResult, StageCallback, StageOutcome
+
+# set in every worker and inherited by the processes it starts (playwright's driver, chromium),
+# so they can be found and killed even after being orphaned
+WORKER_ID_ENV = "BOOKING_WORKER_ID"
+# how long terminated processes get to exit before they are killed
+TERMINATE_GRACE_SECONDS = 3.0
+
+WorkerStatus = Literal[
+    "succeeded", "failed", "error", "timeout", "memory_limit", "cpu_limit", "crashed"
+]
+
+
+class WorkerLimits(BaseModel):
+    """Limits on a booking worker and everything it starts, None for no limit.
+
+    RSS is summed over the worker's processes, so pages shared between chromium processes
+    count more than once. Leave headroom over a typical run's peak.
+    """
+
+    max_rss_mb: float | None = 4096
+    max_cpu_seconds: float | None = None
+    timeout_seconds: float | None = 30 * 60
+    poll_seconds: float = 0.5
+
+
+class ResourceUsage(BaseModel):
+    peak_rss_mb: float = 0.0
+    cpu_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    peak_processes: int = 0
+    # processes still running once the worker exited, e.g. orphaned chromium
+    reaped_processes: int = 0
+
+    def summary(self) -> dict:
+        return {
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "avg_cpu_percent": round(100 * self.cpu_seconds / self.wall_seconds, 1)
+            if self.wall_seconds
+            else None,
+            "peak_processes": self.peak_processes,
+            "reaped_processes": self.reaped_processes,
+        }
+
+
+class WorkerResult(BaseModel):
+    worker_id: str
+    status: WorkerStatus
+    result: PipelineResult | None = None
+    error: str | None = None
+    exit_code: int | None = None
+    usage: ResourceUsage
+
+
+class ProcessTree:
+    """Samples the memory and CPU time of a worker process and all its descendants.
+
+    Every process seen is remembered, so CPU time of processes that already exited still
+    counts and descendants that were reparented after their parent died can still be reaped.
+    """
+
+    def __init__(self, pid: int, worker_id: str):
+        self.root = psutil.Process(pid)
+        self.worker_id = worker_id
+        self.seen: dict[tuple[int, float], psutil.Process] = {}
+        self.cpu_seconds: dict[tuple[int, float], float] = {}
+
+    def _track(self, proc: psutil.Process):
+        try:
+            key = (proc.pid, proc.create_time())
+        except psutil.Error:
+            return
+        self.seen.setdefault(key, proc)
+
+    def sample(self) -> tuple[int, int]:
+        """Returns the summed RSS in bytes and the number of live processes"""
+        try:
+            self._track(self.root)
+            for child in self.root.children(recursive=True):
+                self._track(child)
+        except psutil.Error:
+            pass
+        rss = live = 0
+        for key, proc in list(self.seen.items()):
+            try:
+                with proc.oneshot():
+                    rss += proc.memory_info().rss
+                    times = proc.cpu_times()
+            except psutil.Error:
+                del self.seen[key]
+                continue
+            self.cpu_seconds[key] = times.user + times.system
+            live += 1
+        return rss, live
+
+    def total_cpu_seconds(self) -> float:
+        return sum(self.cpu_seconds.values())
+
+    def _marked(self) -> list[psutil.Process]:
+        marked = []
+        for proc in psutil.process_iter():
+            try:
+                if proc.environ().get(WORKER_ID_ENV) == self.worker_id:
+                    marked.append(proc)
+            except psutil.Error:
+                continue
+        return marked
+
+    def reap(self) -> int:
+        """Terminates, then kills, every process of the worker still running.
+
+        Returns
+            the number of processes that had to be stopped
+        """
+        self.sample()
+        procs = {proc.pid: proc for proc in self.seen.values()}
+        for proc in self._marked():
+            procs.setdefault(proc.pid, proc)
+        procs = [proc for proc in procs.values() if proc.is_running()]
+        for proc in procs:
+            try:
+                proc.terminate()
+            except psutil.Error:
+                pass
+        _, alive = psutil.wait_procs(procs, timeout=TERMINATE_GRACE_SECONDS)
+        for proc in alive:
+            try:
+                proc.kill()
+            except psutil.Error:
+                pass
+        psutil.wait_procs(alive, timeout=TERMINATE_GRACE_SECONDS)
+        if procs:
+            logging.info(f"Reaped {len(procs)} processes of worker {self.worker_id}")
+        return len(procs)
+
+
+class _ForwardingBroker:
+    """Stands in for the supervisor's AssistanceBroker inside a worker process"""
+
+    def __init__(self, events: multiprocessing.Queue, answers: multiprocessing.Queue):
+        self.events = events
+        self.answers = answers
+        self._futures: dict[str, asyncio.Future] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        threading.Thread(
+            target=self._read_answers, name="assistance-answers", daemon=True
+        ).start()
+
+    def _read_answers(self):
+        while True:
+            request_id, request = self.answers.get()
+            future = self._futures.pop(request_id, None)
+            if future is not None:
+                self._loop.call_soon_threadsafe(future.set_result, request)
+
+    async def request(self, message: str, booking_id: str | None = None, **kwargs):
+        request_id = uuid.uuid4().hex[:8]
+        future = self._loop.create_future()
+        self._futures[request_id] = future
+        self.events.put(("assistance", request_id, message, booking_id, kwargs))
+        return AssistanceRequest.model_validate(await future)
+
+
+def _worker_main(
+    worker_id: str,
+    booking_fn: Callable[..., Awaitable[PipelineResult]] | None,
+    booking_kwargs: dict,
+    events: multiprocessing.Queue,
+    answers: multiprocessing.Queue,
+    log_level: int,
+):
+    os.environ[WORKER_ID_ENV] = worker_id
+    logging.basicConfig(
+        level=log_level, format=f"%(asctime)s [worker {worker_id}] %(message)s"
+    )
+
+    async def run():
+        nonlocal booking_fn
+        if booking_fn is None:
+            # imported here, main.py is the entry point of the whole agent
+            from main import do_flight_booking as booking_fn
+
+        broker = _ForwardingBroker(events, answers)
+        broker.start()
+
+        async def on_stage_end(outcome: StageOutcome):
+            events.put(("stage", outcome.model_dump()))
+
+        return await booking_fn(
+            **booking_kwargs, assistance_broker=broker, on_stage_end=on_stage_end
+        )
+
+    try:
+        result = asyncio.run(run())
+    except BaseException as e:
+        events.put(("error", f"{type(e).__name__}: {e}", traceback.format_exc()))
+    else:
+        events.put(("result", result.model_dump()))
+
+
+async def run_booking_worker(
+    booking_kwargs: dict[str, Any],
+    limits: WorkerLimits | None = None,
+    on_stage_end: StageCallback | None = None,
+    assistance_broker: AssistanceBroker | None = None,
+    booking_fn: Callable[..., Awaitable[PipelineResult]] | None = None,
+) -> WorkerResult:
+    """Runs do_flight_booking(**booking_kwargs) in a supervised subprocess.
+
+    The worker is killed once it, with chromium and everything else it started, goes over
+    limits, and whatever it leaves running is reaped when it exits. A hung browser or a
+    memory-hungry run therefore only ever takes down its own booking.
+
+    Args
+        booking_kwargs: do_flight_booking arguments, they must be picklable
+        limits (optional): defaults to WorkerLimits()
+        on_stage_end (optional): awaited with each StageOutcome as the worker reports it
+        assistance_broker (optional): answers the worker's requests for user assistance,
+            defaults to the console
+        booking_fn (optional): runs the booking instead of main.do_flight_booking, it must be
+            a module-level function so the worker can import it
+
+    Returns
+        how the worker ended, with the booking's PipelineResult if it finished, and its peak
+        memory and CPU time
+    """
+    limits = limits or WorkerLimits()
+    broker = assistance_broker or console_broker()
+    worker_id = uuid.uuid4().hex[:12]
+    # spawned, not forked: a fork would copy the supervisor's threads, locks and event loop
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    answers = context.Queue()
+    # not a daemon: daemonic processes can't have children, and the booking starts its own
+    # (the artifact writer's pool, playwright, chromium). The tree is reaped below instead
+    process = context.Process(
+        target=_worker_main,
+        args=(
+            worker_id,
+            booking_fn,
+            booking_kwargs,
+            events,
+            answers,
+            logging.getLogger().level,
+        ),
+        name=f"booking-worker-{worker_id}",
+    )
+    started = time.perf_counter()
+    process.start()
+    logging.info(f"Started booking worker {worker_id} (pid {process.pid})")
+    tree = ProcessTree(process.pid, worker_id)
+    usage = ResourceUsage()
+    outcome: dict[str, Any] = {}
+    pending_assistance: set[asyncio.Task] = set()
+
+    async def answer_assistance(request_id, message, booking_id, kwargs):
+        request = await broker.request(message, booking_id=booking_id, **kwargs)
+        answers.put((request_id, request.model_dump()))
+
+    async def handle_events():
+        while True:
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                return
+            kind = event[0]
+            if kind == "stage" and on_stage_end is not None:
+                await on_stage_end(StageOutcome.model_validate(event[1]))
+            elif kind == "assistance":
+                task = asyncio.create_task(answer_assistance(*event[1:]))
+                pending_assistance.add(task)
+                task.add_done_callback(pending_assistance.discard)
+            elif kind == "result":
+                outcome["result"] = PipelineResult.model_validate(event[1])
+            elif kind == "error":
+                outcome["error"] = event[1]
+                logging.warning(f"Booking worker {worker_id} raised:\n{event[2]}")
+
+    status: WorkerStatus | None = None
+    error = None
+    try:
+        while process.is_alive():
+            await handle_events()
+            rss, live = tree.sample()
+            usage.peak_rss_mb = max(usage.peak_rss_mb, rss / 2**20)
+            usage.peak_processes = max(usage.peak_processes, live)
+            usage.cpu_seconds = tree.total_cpu_seconds()
+            usage.wall_seconds = time.perf_counter() - started
+            if limits.max_rss_mb is not None and usage.peak_rss_mb > limits.max_rss_mb:
+                status = "memory_limit"
+                error = f"Used {usage.peak_rss_mb:.0f} MB, over the {limits.max_rss_mb:g} MB limit"
+            elif (
+                limits.max_cpu_seconds is not None
+                and usage.cpu_seconds > limits.max_cpu_seconds
+            ):
+                status = "cpu_limit"
+                error = f"Used {usage.cpu_seconds:.0f}s of CPU, over the {limits.max_cpu_seconds:g}s limit"
+            elif (
+                limits.timeout_seconds is not None
+                and usage.wall_seconds > limits.timeout_seconds
+            ):
+                status = "timeout"
+                error = f"Still running after {limits.timeout_seconds:g}s"
+            if status is not None:
+                logging.warning(f"Killing booking worker {worker_id}: {error}")
+                process.kill()
+                break
+            await asyncio.sleep(limits.poll_seconds)
+        await asyncio.to_thread(process.join, TERMINATE_GRACE_SECONDS)
+        # the result can still be in the queue after the worker exited
+        await handle_events()
+    finally:
+        for task in pending_assistance:
+            task.cancel()
+        usage.reaped_processes = await asyncio.to_thread(tree.reap)
+        usage.cpu_seconds = tree.total_cpu_seconds()
+        usage.wall_seconds = time.perf_counter() - started
+        events.close()
+        answers.close()
+
+    result = outcome.get("result")
+    if status is None:
+        if result is not None:
+            status = "succeeded" if result.success else "failed"
+        elif "error" in outcome:
+            status, error = "error", outcome["error"]
+        else:
+            status = "crashed"
+            error = f"Worker exited with code {process.exitcode} without a result"
+    logging.info(
+        f"Booking worker {worker_id} {status}: {usage.summary()}"
+        + (f", {error}" if error else "")
+    )
+    return WorkerResult(
+        worker_id=worker_id,
+        status=status,
+        result=result,
+        error=error,
+        exit_code=process.exitcode,
+        usage=usage,
+    )
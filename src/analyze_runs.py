@@ -0,0 +1,264 @@
+"""Summarizes the run ledger written by do_flight_booking.
+
+Usage:
+    python src/analyze_runs.py
+    python src/analyze_runs.py --group-by site,model --since 2025-08-01
+    python src/analyze_runs.py --group-by site,blocking_mode --metrics bytes_transferred,page_load_seconds
+    python src/analyze_runs.py --group-by stage,shortcut --metrics steps,wall_seconds
+    python src/analyze_runs.py --ledger logs/ledger.jsonl --label input_sample_0 --json
+    python src/analyze_runs.py --traces "logs/*/*/trace.json"
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import typing
+from collections import defaultdict
+
+from agent.ledger import DEFAULT_LEDGER_PATH, RunRecord, read_ledger
+
+GROUP_FIELDS = (
+    "site",
+    "stage",
+    "model",
+    "label",
+    "status",
+    "prompt_version",
+    "blocking_mode",
+    "shortcut",
+)
+METRICS = (
+    "steps",
+    "total_tokens",
+    "cached_prompt_tokens",
+    "cost_usd",
+    "wall_seconds",
+    "llm_seconds",
+    "browser_seconds",
+    "bytes_transferred",
+    "page_load_seconds",
+)
+PERCENTILES = (50, 90, 99)
+# RunRecord fields percentiles can be computed for
+NUMERIC_FIELDS = {
+    name
+    for name, field in RunRecord.model_fields.items()
+    if {field.annotation, *typing.get_args(field.annotation)} & {int, float}
+}
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Linear interpolation between closest ranks, like numpy's default"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (
+        rank - low
+    )
+
+
+def summarize(records, group_by: list[str], metrics: list[str]) -> dict[tuple, dict]:
+    """Aggregates ledger records into counts, success rates and metric percentiles per group.
+
+    Skipped stages never ran, so they count towards neither the success rate nor the metrics.
+    Values that aren't numbers, e.g. from a hand-edited ledger, are left out of the metrics
+    and counted in <metric>_invalid.
+    """
+    groups = defaultdict(
+        lambda: {
+            "runs": 0,
+            "successes": 0,
+            "skipped": 0,
+            "values": defaultdict(list),
+            "invalid": defaultdict(int),
+        }
+    )
+    for record in records:
+        group = groups[tuple(record.get(field) for field in group_by)]
+        if record["status"] == "skipped":
+            group["skipped"] += 1
+            continue
+        group["runs"] += 1
+        group["successes"] += record["success"]
+        for metric in metrics:
+            value = record.get(metric)
+            if is_number(value):
+                group["values"][metric].append(value)
+            elif value is not None:
+                group["invalid"][metric] += 1
+
+    summary = {}
+    for key, group in sorted(
+        groups.items(), key=lambda item: [str(k) for k in item[0]]
+    ):
+        row = {
+            "runs": group["runs"],
+            "skipped": group["skipped"],
+            "success_rate": round(group["successes"] / group["runs"], 3)
+            if group["runs"]
+            else None,
+        }
+        for metric in metrics:
+            values = sorted(group["values"][metric])
+            for pct in PERCENTILES:
+                row[f"{metric}_p{pct}"] = (
+                    round(percentile(values, pct), 4) if values else None
+                )
+            row[f"{metric}_total"] = round(sum(values), 4) if values else None
+            if group["invalid"][metric]:
+                row[f"{metric}_invalid"] = group["invalid"][metric]
+        summary[key] = row
+    return summary
+
+
+def summarize_traces(paths: list[str]) -> dict[str, dict]:
+    """Time per step category across runs profiled with do_flight_booking(profile=True).
+
+    Returns
+        per category: its share of all profiled time, seconds per agent step, and percentiles
+        of seconds per run
+    """
+    # imported here, the ledger summary doesn't need browser-use
+    from agent.profiler import CATEGORIES, summarize_events
+
+    runs = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            runs.append(summarize_events(json.load(f).get("traceEvents", [])))
+    total = sum(run["profiled_seconds"] for run in runs)
+    steps = sum(run["steps"] for run in runs)
+    table = {}
+    for category in CATEGORIES:
+        values = sorted(run[category]["seconds"] for run in runs)
+        row = {
+            "runs": len(values),
+            "seconds": round(sum(values), 3),
+            "share": round(sum(values) / total, 3) if total else None,
+            "per_step_seconds": round(sum(values) / steps, 3) if steps else None,
+        }
+        for pct in PERCENTILES:
+            row[f"per_run_p{pct}"] = (
+                round(percentile(values, pct), 3) if values else None
+            )
+        table[category] = row
+    return table
+
+
+def print_table(summary: dict[tuple, dict], group_by: list[str], metrics: list[str]):
+    for key, row in summary.items():
+        title = ", ".join(f"{field}={value}" for field, value in zip(group_by, key))
+        success_rate = (
+            "n/a" if row["success_rate"] is None else f"{row['success_rate']:.1%}"
+        )
+        print(
+            f"{title}\n  runs={row['runs']} skipped={row['skipped']} success={success_rate}"
+        )
+        for metric in metrics:
+            cells = "  ".join(
+                f"p{pct}={_format(row[f'{metric}_p{pct}'])}" for pct in PERCENTILES
+            )
+            invalid = row.get(f"{metric}_invalid")
+            print(
+                f"  {metric:<16} {cells}  total={_format(row[f'{metric}_total'])}"
+                + (f"  ({invalid} non-numeric values skipped)" if invalid else "")
+            )
+
+
+def _format(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float) and not value.is_integer():
+        return f"{value:.3f}"
+    return str(int(value))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize agent cost and latency from the run ledger"
+    )
+    parser.add_argument(
+        "--ledger", default=DEFAULT_LEDGER_PATH, help="path to the ledger JSONL file"
+    )
+    parser.add_argument(
+        "--group-by",
+        default="site,stage,model",
+        help=f"comma-separated fields to group by, from {', '.join(GROUP_FIELDS)}",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=",".join(METRICS),
+        help=f"comma-separated metrics to report, from {', '.join(METRICS)}",
+    )
+    parser.add_argument(
+        "--since", help="only include runs started on or after this ISO date"
+    )
+    parser.add_argument(
+        "--label", help="only include runs with this label, e.g. input_sample_0"
+    )
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument(
+        "--traces",
+        help="glob of profiler trace files; prints time per step category across them instead",
+    )
+    args = parser.parse_args()
+
+    if args.traces:
+        paths = sorted(glob.glob(args.traces, recursive=True))
+        if not paths:
+            parser.error(f"No trace files match {args.traces}")
+        table = summarize_traces(paths)
+        if args.json:
+            print(json.dumps(table, indent=2))
+            return
+        print(f"{len(paths)} profiled runs")
+        for category, row in table.items():
+            share = "-" if row["share"] is None else f"{row['share']:.1%}"
+            cells = "  ".join(
+                f"p{pct}={_format(row[f'per_run_p{pct}'])}" for pct in PERCENTILES
+            )
+            print(
+                f"  {category:<12} share={share:<7} per_step={_format(row['per_step_seconds'])}s  per_run {cells}"
+            )
+        return
+
+    group_by = [field for field in args.group_by.split(",") if field]
+    metrics = [metric for metric in args.metrics.split(",") if metric]
+    unknown = set(group_by) - set(GROUP_FIELDS) | set(metrics) - set(
+        RunRecord.model_fields
+    )
+    if unknown:
+        parser.error(f"Unknown fields: {', '.join(sorted(unknown))}")
+    not_numeric = set(metrics) - NUMERIC_FIELDS
+    if not_numeric:
+        parser.error(
+            f"Not numeric, so they can't be metrics: {', '.join(sorted(not_numeric))}. Group by them instead"
+        )
+    if not os.path.isfile(args.ledger):
+        parser.error(
+            f"No ledger at {args.ledger}, runs of do_flight_booking write one there, or pass --ledger"
+        )
+
+    records = read_ledger(args.ledger)
+    if args.since:
+        records = (r for r in records if r["started_at"] >= args.since)
+    if args.label:
+        records = (r for r in records if r.get("label") == args.label)
+
+    summary = summarize(records, group_by, metrics)
+    if args.json:
+        rows = [dict(zip(group_by, key), **row) for key, row in summary.items()]
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(summary, group_by, metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Lists, reads and prunes the run archive written by main.py --archive.
+
+Usage:
+    python src/archive_runs.py list --site mock --stage select_flight --stage-status failed
+    python src/archive_runs.py step 20250801-120000-000000 select_flight 3 --screenshot step3.png
+    python src/archive_runs.py records 20250801-120000-000000 --kind summary
+    python src/archive_runs.py gif 20250801-120000-000000 select_flight select_flight.gif
+    python src/archive_runs.py retention --max-age-days 30 --compact-after-days 7 --dry-run
+"""
+
+import argparse
+import base64
+import json
+
+from agent.run_archive import DEFAULT_ARCHIVE_PATH, RetentionPolicy, RunArchive
+
+
+def print_runs(archive: RunArchive, args: argparse.Namespace):
+    runs = archive.runs(
+        site=args.site,
+        label=args.label,
+        status=args.status,
+        stage=args.stage,
+        stage_status=args.stage_status,
+        since=args.since,
+        limit=args.limit,
+    )
+    for run in runs:
+        print(
+            f"{run.run_id}  {run.started_at}  {run.site or '-':<10} {run.label or '-':<16} {run.status:<9} "
+            f"{run.failed_stage or '-':<15} {run.records:>4} records  {run.stored_bytes / 2**20:7.2f} MB"
+            + ("  compacted" if run.compacted_at else "")
+        )
+    print(
+        f"{len(runs)} runs, {sum(run.stored_bytes for run in runs) / 2**20:.1f} MB stored"
+    )
+
+
+def print_step(archive: RunArchive, args: argparse.Namespace):
+    step = archive.read_step(args.run_id, args.stage, args.step, attempt=args.attempt)
+    screenshot = step["state"].get("screenshot")
+    if screenshot and args.screenshot:
+        with open(args.screenshot, "wb") as f:
+            f.write(base64.b64decode(screenshot))
+    if screenshot:
+        step["state"]["screenshot"] = f"<{len(screenshot)} base64 characters>"
+    print(json.dumps(step, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list archived runs, newest first")
+    list_parser.add_argument("--site")
+    list_parser.add_argument("--label")
+    list_parser.add_argument("--status", choices=["running", "succeeded", "failed"])
+    list_parser.add_argument("--stage", help="only runs that reached this stage")
+    list_parser.add_argument(
+        "--stage-status", help="only runs where --stage (or any stage) ended like this"
+    )
+    list_parser.add_argument("--since", help="ISO date, e.g. 2025-08-01")
+    list_parser.add_argument("--limit", type=int)
+
+    step_parser = commands.add_parser("step", help="print a single step of a run")
+    step_parser.add_argument("run_id")
+    step_parser.add_argument("stage")
+    step_parser.add_argument("step", type=int)
+    step_parser.add_argument("--attempt", type=int, help="defaults to the last attempt")
+    step_parser.add_argument(
+        "--screenshot", help="also save the step's screenshot here"
+    )
+
+    records_parser = commands.add_parser(
+        "records", help="print a run's records as JSON lines"
+    )
+    records_parser.add_argument("run_id")
+    records_parser.add_argument(
+        "--kind",
+        help="e.g. step, replayed_step, shortcut_step, summary, trace, mock_checks",
+    )
+    records_parser.add_argument("--stage")
+
+    gif_parser = commands.add_parser(
+        "gif", help="rebuild a stage's GIF from its screenshots"
+    )
+    gif_parser.add_argument("run_id")
+    gif_parser.add_argument("stage")
+    gif_parser.add_argument("path")
+    gif_parser.add_argument("--attempt", type=int, help="defaults to the last attempt")
+    gif_parser.add_argument("--sample-every", type=int, default=1)
+
+    retention_parser = commands.add_parser(
+        "retention", help="delete expired runs and compact older ones"
+    )
+    defaults = RetentionPolicy()
+    for field in RetentionPolicy.model_fields:
+        retention_parser.add_argument(
+            f"--{field.replace('_', '-')}",
+            type=float,
+            default=getattr(defaults, field),
+            help=f"default {getattr(defaults, field)}, 0 or less disables the rule",
+        )
+    retention_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    archive = RunArchive(args.archive)
+    if args.command == "list":
+        print_runs(archive, args)
+    elif args.command == "step":
+        print_step(archive, args)
+    elif args.command == "records":
+        for record in archive.iter_records(
+            args.run_id, kind=args.kind, stage=args.stage
+        ):
+            print(json.dumps(record, ensure_ascii=False))
+    elif args.command == "gif":
+        path = archive.export_gif(
+            args.run_id,
+            args.stage,
+            args.path,
+            attempt=args.attempt,
+            sample_every=args.sample_every,
+        )
+        print(path or f"No screenshots archived for {args.stage} of {args.run_id}")
+    elif args.command == "retention":
+        values = {field: getattr(args, field) for field in RetentionPolicy.model_fields}
+        policy = RetentionPolicy(
+            **{
+                field: value if value and value > 0 else None
+                for field, value in values.items()
+            }
+        )
+        report = archive.apply_retention(policy, dry_run=args.dry_run)
+        print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
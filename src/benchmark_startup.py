@@ -0,0 +1,152 @@
+"""Measures how long the agent's and the API's entry points take to import.
+
+Every module is imported in fresh interpreters with python -X importtime, so nothing is
+shared between runs except the OS file cache. Reports the median import time of each entry
+point and the packages that take the most of it. Times include the interpreter's own startup
+imports (encodings, site), so compare them against each other rather than against zero.
+
+Usage:
+    python src/benchmark_startup.py
+    python src/benchmark_startup.py --runs 10 --top 5
+    python src/benchmark_startup.py --modules main,agent.workers --json
+    python src/benchmark_startup.py --output logs/startup.jsonl
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(SRC_DIR), "input_handling_extraction")
+# entry points and the directory each is imported from
+ENTRY_MODULES = {
+    "main": SRC_DIR,
+    "analyze_runs": SRC_DIR,
+    "archive_runs": SRC_DIR,
+    "parse_v2": SRC_DIR,
+    "agent.pipeline": SRC_DIR,
+    "agent.workers": SRC_DIR,
+    "fastapi_app.main": API_DIR,
+}
+
+
+def parse_importtime(stderr: str) -> tuple[dict[str, float], float]:
+    """Self time per imported module and the total, in ms, from -X importtime output"""
+    self_ms = {}
+    total_ms = 0.0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # the header line
+            continue
+        # top-level imports are the least indented, their cumulative times add up to the total
+        if not name[1:].startswith("  "):
+            total_ms += int(cumulative_us) / 1000
+        self_ms[name.strip()] = int(self_us) / 1000
+    return self_ms, total_ms
+
+
+def time_import(module: str, cwd: str) -> tuple[dict[str, float], float]:
+    """Imports module once in a fresh interpreter
+
+    Raises
+        ImportError: if the import failed, e.g. because a dependency is not installed
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([cwd, SRC_DIR]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        error = [line for line in proc.stderr.splitlines() if "Error" in line]
+        raise ImportError(error[-1] if error else f"exit code {proc.returncode}")
+    return parse_importtime(proc.stderr)
+
+
+def benchmark(module: str, cwd: str, runs: int, top: int) -> dict:
+    """Median import time of module over runs, and the packages taking the most of it"""
+    totals = []
+    package_ms = defaultdict(list)
+    for _ in range(runs):
+        try:
+            self_ms, total_ms = time_import(module, cwd)
+        except ImportError as e:
+            return {"module": module, "error": str(e)}
+        totals.append(total_ms)
+        per_package = defaultdict(float)
+        for name, ms in self_ms.items():
+            per_package[name.split(".")[0]] += ms
+        for package, ms in per_package.items():
+            package_ms[package].append(ms)
+    packages = {
+        package: statistics.median(values + [0.0] * (runs - len(values)))
+        for package, values in package_ms.items()
+    }
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "runs": runs,
+        "median_ms": round(statistics.median(totals), 1),
+        "min_ms": round(min(totals), 1),
+        "max_ms": round(max(totals), 1),
+        "modules_imported": len(self_ms),
+        "heaviest_packages": {package: round(ms, 1) for package, ms in heaviest},
+    }
+
+
+def print_results(results: list[dict]):
+    for result in results:
+        if "error" in result:
+            print(f"{result['module']:<20} failed: {result['error']}")
+            continue
+        print(
+            f"{result['module']:<20} {result['median_ms']:8.1f} ms median "
+            f"({result['min_ms']:.1f}-{result['max_ms']:.1f}), "
+            f"{result['modules_imported']} modules"
+        )
+        for package, ms in result["heaviest_packages"].items():
+            print(f"    {package:<24} {ms:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--modules",
+        default=",".join(ENTRY_MODULES),
+        help=f"comma-separated, default {','.join(ENTRY_MODULES)}",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest packages shown")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--output", help="also append the results to this JSONL file")
+    args = parser.parse_args()
+
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    results = [
+        benchmark(module, ENTRY_MODULES.get(module, SRC_DIR), args.runs, args.top)
+        for module in args.modules.split(",")
+    ]
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "a", encoding="utf-8") as f:
+            for result in results:
+                record = {"timestamp": timestamp, "python": sys.version.split()[0]}
+                f.write(json.dumps(record | result) + "\n")
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+from evaluation.mock_airline.server import (
+    DEFAULT_PORT,
+    MockAirlineServer,
+    check_booking,
+    generate_flights,
+)
+
+__all__ = ["DEFAULT_PORT", "MockAirlineServer", "check_booking", "generate_flights"]
@@ -0,0 +1,358 @@
+"""Local mock airline used for hermetic agent benchmarks.
+
+Serves a small booking site (search, fare selection, trip summary, traveler info and payment)
+from the static/ directory, plus a JSON API the pages call. No network access is needed.
+
+Usage:
+    python src/evaluation/mock_airline/server.py --port 8765
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+from datetime import date, datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_PORT = 8765
+# the site's notion of "today". Fixed so that date pickers, relative dates and fares are
+# reproducible across benchmark runs, and early enough that the evaluation samples are bookable
+DEFAULT_TODAY = "2025-07-15"
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+AIRPORTS = {
+    "ATL": "Atlanta, GA",
+    "AUS": "Austin, TX",
+    "BNA": "Nashville, TN",
+    "BOS": "Boston Logan, MA",
+    "BWI": "Baltimore/Washington, MD",
+    "DAL": "Dallas (Love Field), TX",
+    "DEN": "Denver, CO",
+    "DFW": "Dallas/Fort Worth, TX",
+    "FLL": "Fort Lauderdale, FL",
+    "HOU": "Houston (Hobby), TX",
+    "IAH": "Houston (Intercontinental), TX",
+    "LAS": "Las Vegas, NV",
+    "LAX": "Los Angeles, CA",
+    "LGB": "Long Beach, CA",
+    "MCI": "Kansas City, MO",
+    "MCO": "Orlando, FL",
+    "MDW": "Chicago (Midway), IL",
+    "MSY": "New Orleans, LA",
+    "OAK": "Oakland, CA",
+    "ORD": "Chicago (O'Hare), IL",
+    "PHL": "Philadelphia, PA",
+    "PHX": "Phoenix, AZ",
+    "PIT": "Pittsburgh, PA",
+    "SAN": "San Diego, CA",
+    "SEA": "Seattle/Tacoma, WA",
+    "SFO": "San Francisco, CA",
+    "SJC": "San Jose, CA",
+    "SLC": "Salt Lake City, UT",
+    "SMF": "Sacramento, CA",
+    "STL": "St. Louis, MO",
+    "TPA": "Tampa, FL",
+}
+
+# fare products in increasing price order, named like the evaluation samples' cabin classes
+FARE_CLASSES = ("Basic", "Wanna Get Away Plus", "Anytime", "Business Select")
+CONNECTIONS = ("DEN", "MDW", "BNA", "PHX", "BWI", "HOU")
+
+
+def generate_flights(
+    origin: str, destination: str, departure_date: str, count: int = 10
+) -> list[dict]:
+    """Deterministically generates the flights shown for a search. Same inputs, same flights"""
+    seed = hashlib.sha256(
+        f"{origin}-{destination}-{departure_date}".encode()
+    ).hexdigest()
+    rng = random.Random(seed)
+    connections = [c for c in CONNECTIONS if c not in (origin, destination)]
+
+    flights = []
+    for idx in range(count):
+        depart_minutes = 5 * 60 + rng.randrange(0, 16 * 60, 5)
+        stops = rng.choices((0, 1, 2), weights=(5, 4, 1))[0]
+        duration = (
+            60 + rng.randrange(0, 180, 5) + stops * (75 + rng.randrange(0, 90, 5))
+        )
+        arrive_minutes = depart_minutes + duration
+        base = 49 + rng.randrange(0, 250) + (0 if stops else 40)
+        fares = {}
+        for fare_idx, fare_class in enumerate(FARE_CLASSES):
+            sold_out = fare_idx < 2 and rng.random() < 0.15
+            fares[fare_class] = (
+                None if sold_out else base + fare_idx * (35 + rng.randrange(0, 60))
+            )
+        flights.append(
+            (
+                depart_minutes,
+                {
+                    "id": f"{origin}{destination}{departure_date.replace('-', '')}{idx:02d}",
+                    "flight_numbers": [
+                        str(rng.randrange(100, 4999)) for _ in range(stops + 1)
+                    ],
+                    "origin": origin,
+                    "destination": destination,
+                    "departure_date": departure_date,
+                    "depart_time": _clock(depart_minutes),
+                    "arrive_time": _clock(arrive_minutes),
+                    "next_day": arrive_minutes >= 24 * 60,
+                    "duration_minutes": duration,
+                    "stops": stops,
+                    "connections": rng.sample(connections, stops),
+                    "fares": fares,
+                },
+            )
+        )
+    return [flight for _, flight in sorted(flights, key=lambda item: item[0])]
+
+
+ROUTING_MAX_STOPS = {"direct": 0, "one_stop": 1, "any": 2}
+
+
+def cheapest_fare(
+    flights: list[dict], fare_class: str, routing: str = "any"
+) -> int | None:
+    """Lowest available price for fare_class among flights allowed by routing"""
+    prices = [
+        flight["fares"].get(fare_class)
+        for flight in flights
+        if flight["stops"] <= ROUTING_MAX_STOPS.get(routing, 2)
+    ]
+    prices = [price for price in prices if price is not None]
+    return min(prices) if prices else None
+
+
+def _clock(minutes: int) -> str:
+    minutes %= 24 * 60
+    hour, minute = divmod(minutes, 60)
+    suffix = "AM" if hour < 12 else "PM"
+    return f"{(hour - 1) % 12 + 1}:{minute:02d} {suffix}"
+
+
+class MockAirlineHandler(SimpleHTTPRequestHandler):
+    server: "MockAirlineHTTPServer"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=STATIC_DIR, **kwargs)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == "/config.js":
+            config = {"today": self.server.today}
+            body = f"window.MOCK_AIRLINE = {json.dumps(config)};"
+            return self._send(body.encode(), "application/javascript")
+        if url.path == "/api/airports":
+            text = query.get("q", "").strip().lower()
+            airports = [
+                {"code": code, "city": city}
+                for code, city in AIRPORTS.items()
+                if not text or text in code.lower() or text in city.lower()
+            ]
+            return self._send_json(airports)
+        if url.path == "/api/search":
+            return self._search(query)
+        if url.path == "/api/events":
+            return self._send_json(self.server.events)
+        if url.path == "/":
+            self.path = "/index.html"
+        return super().do_GET()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/api/events":
+            return self.send_error(404)
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            event = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self.send_error(400, "Invalid JSON")
+        event["received_at"] = datetime.now().isoformat(timespec="seconds")
+        with self.server.lock:
+            self.server.events.append(event)
+        self._send_json({"ok": True})
+
+    def _search(self, query: dict):
+        origin = query.get("origin", "").upper()
+        destination = query.get("destination", "").upper()
+        departure_date = query.get("date", "")
+        errors = []
+        if origin not in AIRPORTS:
+            errors.append(f"Unknown origin airport {origin!r}")
+        if destination not in AIRPORTS:
+            errors.append(f"Unknown destination airport {destination!r}")
+        if origin == destination:
+            errors.append("Origin and destination must be different")
+        try:
+            if date.fromisoformat(departure_date) < date.fromisoformat(
+                self.server.today
+            ):
+                errors.append("Departure date is in the past")
+        except ValueError:
+            errors.append(f"Invalid date {departure_date!r}")
+        if errors:
+            return self._send_json({"errors": errors}, status=400)
+        flights = generate_flights(origin, destination, departure_date)
+        self._send_json(
+            {"origin": origin, "destination": destination, "flights": flights}
+        )
+
+    def _send_json(self, data, status: int = 200):
+        self._send(json.dumps(data).encode(), "application/json", status)
+
+    def _send(self, body: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"mock airline: {format % args}")
+
+
+class MockAirlineHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, today: str):
+        super().__init__(address, MockAirlineHandler)
+        self.today = today
+        self.events: list[dict] = []
+        self.lock = threading.Lock()
+
+
+class MockAirlineServer:
+    """Runs the mock airline in a background thread.
+
+    Pages post an event to /api/events whenever a form is submitted (search, fare selection,
+    traveler info, payment, purchase), so a benchmark can check what the agent actually did.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        today: str = DEFAULT_TODAY,
+    ):
+        self._server = MockAirlineHTTPServer((host, port), today)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def events(self) -> list[dict]:
+        with self._server.lock:
+            return list(self._server.events)
+
+    def reset_events(self):
+        with self._server.lock:
+            self._server.events.clear()
+
+    def start(self) -> "MockAirlineServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="mock-airline", daemon=True
+        )
+        self._thread.start()
+        logging.info(f"Mock airline serving at {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockAirlineServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def check_booking(events: list[dict], flight_info: dict) -> dict:
+    """Compares the events the site recorded during a run against the requested booking.
+
+    Returns
+        a dict of named boolean checks. "purchased" should always be False, since the agent
+        must never complete the purchase
+    """
+    searches = [e["data"] for e in events if e.get("type") == "search"]
+    search = searches[-1] if searches else {}
+    # the last selection for each leg is the one that was booked
+    selections = {
+        e["data"]["leg"]: e["data"] for e in events if e.get("type") == "select_fare"
+    }
+    legs = {
+        "depart": (
+            flight_info["departure_airport"],
+            flight_info["arrival_airport"],
+            flight_info["departure_date"],
+        )
+    }
+    if flight_info["round_trip"]:
+        legs["return"] = (
+            flight_info["arrival_airport"],
+            flight_info["departure_airport"],
+            flight_info.get("return_date"),
+        )
+
+    cheapest_selected = set(selections) == set(legs)
+    for leg, (origin, destination, leg_date) in legs.items():
+        if leg not in selections:
+            continue
+        cheapest = cheapest_fare(
+            generate_flights(origin, destination, leg_date),
+            flight_info["cabin_class"],
+            flight_info["routing"],
+        )
+        cheapest_selected = cheapest_selected and selections[leg]["price"] == cheapest
+
+    search_matches = (
+        search.get("origin") == flight_info["departure_airport"]
+        and search.get("destination") == flight_info["arrival_airport"]
+        and search.get("departure_date") == flight_info["departure_date"]
+        and search.get("trip_type")
+        == ("roundtrip" if flight_info["round_trip"] else "oneway")
+        and search.get("adults") == flight_info["adult_passengers"]
+    )
+    if flight_info["round_trip"]:
+        search_matches = search_matches and search.get(
+            "return_date"
+        ) == flight_info.get("return_date")
+
+    return {
+        "search_matches": search_matches,
+        "fares_selected": set(selections) == set(legs),
+        "cabin_matches": bool(selections)
+        and all(
+            s["fare_class"] == flight_info["cabin_class"] for s in selections.values()
+        ),
+        "cheapest_selected": cheapest_selected,
+        "traveler_submitted": any(e.get("type") == "traveler" for e in events),
+        "payment_filled": any(e.get("type") == "payment_filled" for e in events),
+        "purchased": any(e.get("type") == "purchase" for e in events),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the mock airline site")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--today", default=DEFAULT_TODAY, help="the site's current date, YYYY-MM-DD"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockAirlineHTTPServer((args.host, args.port), args.today)
+    logging.info(f"Mock airline serving at http://{args.host}:{args.port}")
+    server.serve_forever()
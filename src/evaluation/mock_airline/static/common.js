@@ -0,0 +1,113 @@
+// Shared behaviour for every page of the mock airline: config, cookie banner, event
+// reporting, trip state and popover handling.
+const CONFIG = window.MOCK_AIRLINE || { today: new Date().toISOString().slice(0, 10) };
+const MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"];
+const WEEKDAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"];
+
+function parseISODate(value) {
+  const [year, month, day] = value.split("-").map(Number);
+  return new Date(year, month - 1, day);
+}
+
+function toISODate(date) {
+  const pad = n => String(n).padStart(2, "0");
+  return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+}
+
+function today() {
+  return parseISODate(CONFIG.today);
+}
+
+function reportEvent(type, data) {
+  return fetch("/api/events", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ type, page: location.pathname, data: data || {} }),
+  }).catch(() => {});
+}
+
+// trip state survives page navigation for the lifetime of the tab
+function loadTrip() {
+  return JSON.parse(sessionStorage.getItem("trip") || "{}");
+}
+
+function saveTrip(trip) {
+  sessionStorage.setItem("trip", JSON.stringify(trip));
+}
+
+function formatPrice(price) {
+  return `$${price}`;
+}
+
+// Popovers register a close function here. Escape or a click outside closes them, like
+// the comboboxes and date pickers on real airline sites.
+const openPopovers = new Set();
+
+function registerPopover(container, close) {
+  const entry = { container, close };
+  openPopovers.add(entry);
+  return () => openPopovers.delete(entry);
+}
+
+document.addEventListener("keydown", event => {
+  if (event.key === "Escape") {
+    openPopovers.forEach(entry => entry.close());
+  }
+});
+
+document.addEventListener("mousedown", event => {
+  openPopovers.forEach(entry => {
+    if (!entry.container.contains(event.target)) entry.close();
+  });
+});
+
+function showCookieBanner() {
+  if (document.cookie.includes("mock_cookie_consent=")) return;
+  const overlay = document.createElement("div");
+  overlay.className = "overlay";
+  overlay.innerHTML = `
+    <div class="cookie-banner" role="dialog" aria-modal="true" aria-label="Cookie consent">
+      <p><strong>We value your privacy.</strong> We use cookies and similar technologies to personalize
+      content, measure performance and remember your preferences. By selecting "Accept all cookies" you
+      agree to our use of cookies. You can change your choice at any time in Cookie Settings.</p>
+      <button class="btn secondary" id="cookie-reject">Reject optional cookies</button>
+      <button class="btn" id="cookie-accept">Accept all cookies</button>
+    </div>`;
+  const dismiss = choice => {
+    document.cookie = `mock_cookie_consent=${choice}; path=/; max-age=31536000`;
+    overlay.remove();
+  };
+  overlay.querySelector("#cookie-accept").addEventListener("click", () => dismiss("all"));
+  overlay.querySelector("#cookie-reject").addEventListener("click", () => dismiss("essential"));
+  // the banner shows up a moment after load, like consent managers that load asynchronously
+  setTimeout(() => document.body.appendChild(overlay), 600);
+}
+
+function renderHeader() {
+  const header = document.createElement("header");
+  header.innerHTML = `
+    <div class="logo">MOCK AIR</div>
+    <nav><a href="/">Book</a><a href="#">Check in</a><a href="#">Flight status</a><a href="#">Deals</a></nav>`;
+  document.body.prepend(header);
+}
+
+function requireFields(form) {
+  const missing = [];
+  form.querySelectorAll("[required]").forEach(el => {
+    const invalid = !el.value.trim() || (el.pattern && !new RegExp(`^(?:${el.pattern})$`).test(el.value.trim()));
+    el.setAttribute("aria-invalid", invalid ? "true" : "false");
+    if (invalid) missing.push(el.labels?.[0]?.innerText || el.name);
+  });
+  return missing;
+}
+
+function showError(container, messages) {
+  container.innerHTML = messages.length
+    ? `<div class="error" role="alert">${messages.map(m => `<div>${m}</div>`).join("")}</div>`
+    : "";
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  renderHeader();
+  showCookieBanner();
+});
@@ -0,0 +1,126 @@
+// Fare selection for the departing and returning legs. Search parameters come from the URL,
+// so results can be opened directly with a deep link.
+const FARE_CLASSES = ["Basic", "Wanna Get Away Plus", "Anytime", "Business Select"];
+
+function searchFromParams() {
+  const params = new URLSearchParams(location.search);
+  return {
+    origin: params.get("originationAirportCode"),
+    destination: params.get("destinationAirportCode"),
+    departure_date: params.get("departureDate"),
+    return_date: params.get("returnDate"),
+    trip_type: params.get("tripType") || (params.get("returnDate") ? "roundtrip" : "oneway"),
+    adults: Number(params.get("adultPassengersCount") || 1),
+  };
+}
+
+function describeStops(flight) {
+  if (!flight.stops) return "Nonstop";
+  return `${flight.stops} stop${flight.stops > 1 ? "s" : ""} (${flight.connections.join(", ")})`;
+}
+
+function describeDuration(minutes) {
+  return `${Math.floor(minutes / 60)}h ${minutes % 60}m`;
+}
+
+document.addEventListener("DOMContentLoaded", async () => {
+  const leg = document.body.dataset.leg;
+  const trip = loadTrip();
+  const fromUrl = searchFromParams();
+  const search = fromUrl.origin ? fromUrl : trip.search;
+  if (JSON.stringify(search) !== JSON.stringify(trip.search)) {
+    // opened with a different search, e.g. from a deep link, so earlier selections don't apply
+    trip.search = search;
+    trip.selections = {};
+    reportEvent("search", search);
+  }
+  saveTrip(trip);
+
+  const [origin, destination, date] = leg === "depart"
+    ? [search.origin, search.destination, search.departure_date]
+    : [search.destination, search.origin, search.return_date];
+
+  const when = parseISODate(date);
+  document.getElementById("trip-summary").innerHTML = `
+    <strong>${origin} &rarr; ${destination}</strong>
+    &middot; ${WEEKDAYS[when.getDay()]}, ${MONTHS[when.getMonth()]} ${when.getDate()}, ${when.getFullYear()}
+    &middot; ${search.adults} Adult${search.adults > 1 ? "s" : ""}
+    ${leg === "return" && trip.selections.depart ? `<div class="meta">Departing flight: ${trip.selections.depart.summary}</div>` : ""}`;
+  document.getElementById("fare-header").innerHTML = FARE_CLASSES.map(f => `<div>${f}</div>`).join("");
+
+  const list = document.getElementById("fare-list");
+  const continueButton = document.getElementById("continue");
+  const response = await fetch(`/api/search?${new URLSearchParams({ origin, destination, date })}`);
+  const body = await response.json();
+  if (!response.ok) {
+    list.innerHTML = "";
+    showError(document.getElementById("results-errors"), body.errors || ["Search failed."]);
+    return;
+  }
+  const flights = body.flights;
+
+  const render = () => {
+    const sort = document.getElementById("sort").value;
+    const nonstopOnly = document.getElementById("nonstop-only").checked;
+    const lowest = flight => Math.min(...Object.values(flight.fares).filter(p => p !== null));
+    const shown = flights.filter(f => !nonstopOnly || f.stops === 0);
+    if (sort === "price") shown.sort((a, b) => lowest(a) - lowest(b));
+    if (sort === "duration") shown.sort((a, b) => a.duration_minutes - b.duration_minutes);
+    const selection = trip.selections[leg];
+
+    list.innerHTML = "";
+    shown.forEach(flight => {
+      const row = document.createElement("li");
+      row.className = "fare-row";
+      row.dataset.flightId = flight.id;
+      const fares = FARE_CLASSES.map(fareClass => {
+        const price = flight.fares[fareClass];
+        if (price === null) return `<div class="fare"><span class="sold-out">Unavailable</span></div>`;
+        const isSelected = selection && selection.flight_id === flight.id && selection.fare_class === fareClass;
+        return `<div class="fare"><button type="button" class="${isSelected ? "selected" : ""}"
+          data-fare-class="${fareClass}" aria-pressed="${isSelected}"
+          aria-label="${fareClass} fare ${formatPrice(price)}, departs ${flight.depart_time}">${formatPrice(price)}</button></div>`;
+      }).join("");
+      row.innerHTML = `
+        <div class="flight">
+          <div class="times">${flight.depart_time} &rarr; ${flight.arrive_time}${flight.next_day ? " +1" : ""}</div>
+          <div class="meta">Flight # ${flight.flight_numbers.join(" / ")} &middot; ${describeStops(flight)} &middot; ${describeDuration(flight.duration_minutes)}</div>
+        </div>${fares}`;
+      row.addEventListener("click", event => {
+        const button = event.target.closest("button[data-fare-class]");
+        if (!button) return;
+        const fareClass = button.dataset.fareClass;
+        trip.selections[leg] = {
+          leg,
+          flight_id: flight.id,
+          fare_class: fareClass,
+          price: flight.fares[fareClass],
+          stops: flight.stops,
+          summary: `${flight.depart_time} ${origin} to ${destination}, ${fareClass} ${formatPrice(flight.fares[fareClass])}`,
+        };
+        saveTrip(trip);
+        reportEvent("select_fare", trip.selections[leg]);
+        continueButton.disabled = false;
+        render();
+      });
+      list.appendChild(row);
+    });
+    list.setAttribute("aria-busy", "false");
+    if (!shown.length) list.innerHTML = "<li>No flights match your filters.</li>";
+  };
+
+  document.getElementById("sort").addEventListener("change", render);
+  document.getElementById("nonstop-only").addEventListener("change", render);
+  // results render after a short delay, like sites that stream fares in
+  setTimeout(render, 700);
+  continueButton.disabled = !trip.selections[leg];
+
+  continueButton.addEventListener("click", () => {
+    if (!trip.selections[leg]) return;
+    if (leg === "depart" && search.trip_type === "roundtrip") {
+      location.href = `/select-return.html${location.search}`;
+    } else {
+      location.href = "/price.html";
+    }
+  });
+});
@@ -0,0 +1,303 @@
+// Flight search form: airport autocomplete, date pickers and the passenger stepper.
+const selectedAirports = { origin: null, destination: null };
+let adults = 1;
+
+function airportLabel(airport) {
+  return `${airport.city} - ${airport.code}`;
+}
+
+function setupAirportCombobox(name) {
+  const input = document.getElementById(name);
+  const field = document.getElementById(`${name}-field`);
+  let listbox = null;
+  let unregister = null;
+  let debounce = null;
+
+  const close = () => {
+    if (!listbox) return;
+    listbox.remove();
+    listbox = null;
+    input.setAttribute("aria-expanded", "false");
+    input.removeAttribute("aria-activedescendant");
+    if (unregister) unregister();
+  };
+
+  const choose = airport => {
+    selectedAirports[name] = airport.code;
+    input.value = airportLabel(airport);
+    close();
+  };
+
+  const render = airports => {
+    close();
+    if (!airports.length) return;
+    listbox = document.createElement("ul");
+    listbox.id = `${name}-listbox`;
+    listbox.className = "popover";
+    listbox.setAttribute("role", "listbox");
+    airports.slice(0, 8).forEach((airport, idx) => {
+      const option = document.createElement("li");
+      option.id = `${name}-option-${airport.code}`;
+      option.setAttribute("role", "option");
+      option.setAttribute("aria-selected", idx === 0 ? "true" : "false");
+      option.dataset.code = airport.code;
+      option.textContent = airportLabel(airport);
+      option.addEventListener("mousedown", event => {
+        event.preventDefault();
+        choose(airport);
+      });
+      listbox.appendChild(option);
+    });
+    field.appendChild(listbox);
+    input.setAttribute("aria-expanded", "true");
+    input.setAttribute("aria-activedescendant", listbox.firstChild.id);
+    unregister = registerPopover(field, close);
+  };
+
+  input.addEventListener("input", () => {
+    // typing invalidates the previous selection until an option is picked again
+    selectedAirports[name] = null;
+    clearTimeout(debounce);
+    const query = input.value.trim();
+    if (!query) return close();
+    // suggestions arrive after a short delay, like a real autocomplete backend
+    debounce = setTimeout(async () => {
+      const response = await fetch(`/api/airports?q=${encodeURIComponent(query)}`);
+      const airports = await response.json();
+      // exact code matches first
+      airports.sort((a, b) => (b.code === query.toUpperCase()) - (a.code === query.toUpperCase()));
+      render(airports);
+    }, 250);
+  });
+
+  input.addEventListener("keydown", event => {
+    if (!listbox) return;
+    const options = Array.from(listbox.querySelectorAll('[role="option"]'));
+    let active = options.findIndex(o => o.getAttribute("aria-selected") === "true");
+    if (event.key === "ArrowDown" || event.key === "ArrowUp") {
+      event.preventDefault();
+      active = (active + (event.key === "ArrowDown" ? 1 : options.length - 1)) % options.length;
+      options.forEach((o, idx) => o.setAttribute("aria-selected", idx === active ? "true" : "false"));
+      input.setAttribute("aria-activedescendant", options[active].id);
+    } else if (event.key === "Enter") {
+      event.preventDefault();
+      const option = options[active];
+      choose({ code: option.dataset.code, city: option.textContent.split(" - ")[0] });
+    }
+  });
+
+  return { choose };
+}
+
+function setupDatePicker(name) {
+  const input = document.getElementById(name);
+  const field = document.getElementById(`${name}-field`);
+  let dialog = null;
+  let unregister = null;
+  let shownMonth = null;
+
+  const selected = () => parseDateInput(input.value);
+
+  const close = () => {
+    if (!dialog) return;
+    dialog.remove();
+    dialog = null;
+    if (unregister) unregister();
+  };
+
+  const render = () => {
+    const month = shownMonth;
+    const first = new Date(month.getFullYear(), month.getMonth(), 1);
+    const daysInMonth = new Date(month.getFullYear(), month.getMonth() + 1, 0).getDate();
+    const current = selected();
+    let cells = "<tr>" + "<td></td>".repeat(first.getDay());
+    for (let day = 1; day <= daysInMonth; day++) {
+      const date = new Date(month.getFullYear(), month.getMonth(), day);
+      const isSelected = current && toISODate(current) === toISODate(date);
+      const label = `${WEEKDAYS[date.getDay()]}, ${MONTHS[date.getMonth()]} ${day}, ${date.getFullYear()}`;
+      cells += `<td><button type="button" data-date="${toISODate(date)}" aria-label="${label}"
+        class="${isSelected ? "selected" : ""}" ${date < today() ? "disabled" : ""}>${day}</button></td>`;
+      if (date.getDay() === 6) cells += "</tr><tr>";
+    }
+    cells += "</tr>";
+    dialog.innerHTML = `
+      <div class="cal-head">
+        <button type="button" class="btn link" data-nav="-1" aria-label="Previous month">&lt;</button>
+        <span>${MONTHS[month.getMonth()]} ${month.getFullYear()}</span>
+        <button type="button" class="btn link" data-nav="1" aria-label="Next month">&gt;</button>
+      </div>
+      <table><thead><tr>${WEEKDAYS.map(d => `<th>${d.slice(0, 2)}</th>`).join("")}</tr></thead><tbody>${cells}</tbody></table>
+      <div class="cal-foot"><button type="button" class="btn link" data-close>Close</button></div>`;
+  };
+
+  const open = () => {
+    if (dialog) return;
+    const current = selected() || today();
+    shownMonth = new Date(current.getFullYear(), current.getMonth(), 1);
+    dialog = document.createElement("div");
+    dialog.className = "popover calendar";
+    dialog.setAttribute("role", "dialog");
+    dialog.setAttribute("aria-label", `${input.labels[0].innerText} calendar`);
+    dialog.addEventListener("mousedown", event => event.preventDefault());
+    dialog.addEventListener("click", event => {
+      const button = event.target.closest("button");
+      if (!button) return;
+      if (button.dataset.nav) {
+        shownMonth = new Date(shownMonth.getFullYear(), shownMonth.getMonth() + Number(button.dataset.nav), 1);
+        render();
+      } else if (button.dataset.date) {
+        // picking a day updates the input but leaves the calendar open, covering the fields below
+        input.value = formatDateInput(parseISODate(button.dataset.date));
+        render();
+      } else if (button.hasAttribute("data-close")) {
+        close();
+      }
+    });
+    render();
+    field.appendChild(dialog);
+    unregister = registerPopover(field, close);
+  };
+
+  input.addEventListener("focus", open);
+  input.addEventListener("click", open);
+  input.addEventListener("input", () => {
+    // "0801" is reformatted to "08/01" as the user types
+    const digits = input.value.replace(/\D/g, "").slice(0, 4);
+    if (digits.length === 4 && !input.value.includes("/")) {
+      input.value = `${digits.slice(0, 2)}/${digits.slice(2)}`;
+    }
+    const date = selected();
+    if (date && dialog) {
+      shownMonth = new Date(date.getFullYear(), date.getMonth(), 1);
+      render();
+    }
+  });
+
+  // prefilled with today's date, which is rarely what the traveler wants
+  input.value = formatDateInput(today());
+}
+
+function formatDateInput(date) {
+  return `${String(date.getMonth() + 1).padStart(2, "0")}/${String(date.getDate()).padStart(2, "0")}`;
+}
+
+// MM/DD refers to the next occurrence of that date on or after today
+function parseDateInput(value) {
+  const match = value.trim().match(/^(\d{1,2})\/(\d{1,2})$/);
+  if (!match) return null;
+  const month = Number(match[1]) - 1;
+  const day = Number(match[2]);
+  const now = today();
+  let date = new Date(now.getFullYear(), month, day);
+  if (date.getMonth() !== month) return null;
+  if (date < now) date = new Date(now.getFullYear() + 1, month, day);
+  return date;
+}
+
+function setupPassengers() {
+  const button = document.getElementById("passengers");
+  const field = document.getElementById("passengers-field");
+  let dialog = null;
+  let unregister = null;
+
+  const label = () => `${adults} Adult${adults > 1 ? "s" : ""}`;
+  const close = () => {
+    if (!dialog) return;
+    dialog.remove();
+    dialog = null;
+    button.setAttribute("aria-expanded", "false");
+    if (unregister) unregister();
+  };
+
+  button.addEventListener("click", () => {
+    if (dialog) return close();
+    dialog = document.createElement("div");
+    dialog.className = "popover passenger-popover";
+    dialog.setAttribute("role", "dialog");
+    dialog.setAttribute("aria-label", "Passengers");
+    const render = () => {
+      dialog.innerHTML = `
+        <div class="stepper">
+          <span style="flex: 1">Adults (age 18+)</span>
+          <button type="button" aria-label="Remove adult" data-step="-1" ${adults <= 1 ? "disabled" : ""}>-</button>
+          <span aria-live="polite">${adults}</span>
+          <button type="button" aria-label="Add adult" data-step="1" ${adults >= 8 ? "disabled" : ""}>+</button>
+        </div>
+        <div class="cal-foot"><button type="button" class="btn link" data-close>Done</button></div>`;
+    };
+    dialog.addEventListener("click", event => {
+      const target = event.target.closest("button");
+      if (!target) return;
+      if (target.dataset.step) {
+        adults = Math.min(8, Math.max(1, adults + Number(target.dataset.step)));
+        button.textContent = label();
+        render();
+      } else if (target.hasAttribute("data-close")) {
+        close();
+      }
+    });
+    render();
+    field.appendChild(dialog);
+    button.setAttribute("aria-expanded", "true");
+    unregister = registerPopover(field, close);
+  });
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  const origin = setupAirportCombobox("origin");
+  setupAirportCombobox("destination");
+  setupDatePicker("departureDate");
+  setupDatePicker("returnDate");
+  setupPassengers();
+
+  // the site remembers the last departure airport, so "Depart" starts pre-filled
+  origin.choose({ code: "DAL", city: "Dallas (Love Field), TX" });
+
+  const returnField = document.getElementById("returnDate-field");
+  document.querySelectorAll('input[name="tripType"]').forEach(radio =>
+    radio.addEventListener("change", () => {
+      returnField.style.display = radio.value === "oneway" && radio.checked ? "none" : "";
+    })
+  );
+
+  const form = document.getElementById("search-form");
+  form.addEventListener("submit", async event => {
+    event.preventDefault();
+    const tripType = form.querySelector('input[name="tripType"]:checked').value;
+    const departure = parseDateInput(document.getElementById("departureDate").value);
+    const ret = parseDateInput(document.getElementById("returnDate").value);
+    const errors = [];
+    if (!selectedAirports.origin) errors.push("Select a departure airport from the list.");
+    if (!selectedAirports.destination) errors.push("Select an arrival airport from the list.");
+    if (selectedAirports.origin && selectedAirports.origin === selectedAirports.destination) {
+      errors.push("Departure and arrival airports must be different.");
+    }
+    if (!departure) errors.push("Enter a valid depart date (MM/DD).");
+    if (tripType === "roundtrip" && (!ret || (departure && ret < departure))) {
+      errors.push("Enter a valid return date on or after the depart date (MM/DD).");
+    }
+    showError(document.getElementById("search-errors"), errors);
+    if (errors.length) return;
+
+    const search = {
+      origin: selectedAirports.origin,
+      destination: selectedAirports.destination,
+      departure_date: toISODate(departure),
+      return_date: tripType === "roundtrip" ? toISODate(ret) : null,
+      trip_type: tripType,
+      adults,
+    };
+    saveTrip({ search, selections: {} });
+    await reportEvent("search", search);
+
+    const params = new URLSearchParams({
+      originationAirportCode: search.origin,
+      destinationAirportCode: search.destination,
+      departureDate: search.departure_date,
+      tripType: search.trip_type,
+      adultPassengersCount: String(adults),
+    });
+    if (search.return_date) params.set("returnDate", search.return_date);
+    location.href = `/select-depart.html?${params}`;
+  });
+});
@@ -1,21 +1,40 @@
+import argparse
 import asyncio
 import json
 import logging
 import os
 import time
 from datetime import datetime
+from typing import TYPE_CHECKING
+
+from agent.artifacts import ArtifactWriter
+from agent.assistance import AssistanceBroker
+from agent.config import load_config
+from agent.ledger import LLMTimer, RunLedger
+from agent.pipeline import (
+    PipelineResult,
+    RetryPolicy,
+    Stage,
+    StageCallback,
+    StageOutcome,
+    run_pipeline,
+)
+from agent.run_archive import (
+    DEFAULT_ARCHIVE_PATH,
+    RunArchive,
+    archive_agent_steps,
+    archive_replayed_steps,
+)
+from models.chat import FlightInfo, UserBillingInfo, UserInfo
 
-from browser_use import Agent
-from browser_use.llm import ChatGoogle
-from dotenv import load_dotenv
-from tqdm import tqdm
-
-from agent.controller import create_custom_controller
-from agent.prompting import get_initial_actions, get_tasks
-from agent.session import create_fresh_browser_session
+if TYPE_CHECKING:
+    from browser_use.agent.views import AgentHistoryList
 
-# from agent.parse_v2 import filter_booking_controls, filter_interactive_fields
-from models.chat import FlightInfo, UserBillingInfo, UserInfo
+    from agent.asset_cache import SharedAssetCache
+    from agent.cassette import CassetteMode
+    from agent.network import BlockingMode
+    from agent.screenshots import ScreenshotSettings
+    from agent.trajectory import TrajectoryCache
 
 
 async def do_flight_booking(
@@ -25,16 +44,38 @@ async def do_flight_booking(
     logs_path: str = "logs",
     keep_alive: bool = True,
     max_steps_per_task=30,
-):
+    retry_policy: RetryPolicy | None = None,
+    site: str = "southwest",
+    trajectory_cache: "TrajectoryCache | None" = None,
+    prune_dom: bool = False,
+    screenshot_settings: "ScreenshotSettings | None" = None,
+    artifact_writer: ArtifactWriter | None = None,
+    save_conversation: bool = False,
+    ledger: RunLedger | None = None,
+    cassette_path: str | None = None,
+    cassette_mode: "CassetteMode" = "auto",
+    request_blocking: "BlockingMode" = "off",
+    asset_cache: "SharedAssetCache | None" = None,
+    assistance_broker: AssistanceBroker | None = None,
+    on_stage_end: StageCallback | None = None,
+    capture_fares: bool = True,
+    use_deep_links: bool = True,
+    profile: bool = False,
+    run_archive: RunArchive | None = None,
+) -> PipelineResult:
     """Kick off agentic flight booking process.
 
-    There are 4 "tasks" currently defined:
+    There are 4 "tasks" currently defined, which are run as stages of a pipeline:
         1. Search for a flight on the home page
-        2. Select a flight
-            TODO: implement use of the budget parameter instead of just searching for the cheapest flight
+        2. Select a flight - the cheapest fare matching the cabin class, routing and budget is picked
+            deterministically by the select_flight action, the agent only takes over if no flights could be read
         3. Populate traveler information
         4. Populate billing information - currently requests confirmation from the user once for review once info has been populated
 
+    If a stage does not finish successfully (the agent calls done with success=False, hits
+    max_steps_per_task, or raises), it is retried according to retry_policy. If it still fails,
+    the remaining stages are skipped instead of spending more LLM steps on a broken run.
+
     Args
         flight_info: a FlightInfo object representing the parameters to use when searching
             and selecting a flight to book
@@ -44,38 +85,105 @@ async def do_flight_booking(
         user_preferences (optional): a UserPreferences object representing booking-specific preferences to apply, e.g. seat preference
         logs_path (optional): filepath to save all of the logs associated with this run. Runs are tagged by the
             timestamp this function was called
-
+        retry_policy (optional): a RetryPolicy controlling whether failed stages are re-attempted. Defaults to no retries.
+        site (optional): airline to book on, see get_initial_actions
+        trajectory_cache (optional): if provided, stages are first replayed from previously recorded successful
+            runs on the same site, and only handed to the LLM agent when the page diverges from the recording.
+            Successful stages are recorded back into the cache.
+        prune_dom (optional): if True, the DOM sent to the agent on every step is pruned down to the elements
+            relevant to the current stage (search controls, fare rows, traveler or payment fields). Serialized DOM
+            size before and after pruning is recorded in each stage's metrics.
+        screenshot_settings (optional): if provided, screenshots sent to the LLM are deduplicated against the
+            previous step, cropped to the active popover or form, downscaled and re-encoded as configured.
+            Per-step image tokens and step latency are recorded in each stage's outcome.
+        artifact_writer (optional): background writer for GIFs, the run summary and agent history dumps. Share one
+            writer across runs and shut it down at exit. If not provided, a writer is created for this run and
+            left to finish in the background.
+        save_conversation (optional): if True, browser-use also saves the full LLM conversation of every step.
+            This is written from the event loop, so it is off by default.
+        ledger (optional): run ledger that receives one record per stage with model, steps, tokens, cost, wall time,
+            LLM time, browser time and status. Defaults to logs/ledger.jsonl. See analyze_runs.py to summarize it.
+        cassette_path (optional): if provided, LLM calls are recorded to or replayed from this cassette file, see
+            CassetteLLM. Replayed runs make no LLM requests, so their wall time is pure browser, DOM and controller time.
+        cassette_mode (optional): record, replay or auto. Only used with cassette_path.
+        request_blocking (optional): off, lean or strict, see RequestBlocker. Defaults to off, because the
+            block lists are only checked against the sites the evaluation runs use, opt in per caller. Requests,
+            bytes transferred and page load times are recorded in each stage's metrics for every mode, including off.
+        asset_cache (optional): shared cache for static scripts, stylesheets, fonts and images. The browser
+            profile is still fresh for every run, so cookies and storage never carry over, but repeat runs
+            don't download the airline's bundles again. Hits and bytes served are recorded in each stage's metrics.
+        assistance_broker (optional): where the agent's requests for user assistance are published and answered,
+            tagged with the run id. Defaults to answering from stdin without blocking the event loop.
+        on_stage_end (optional): awaited with each StageOutcome as soon as the stage finishes, e.g. to report
+            progress of a booking job
+        capture_fares (optional): if True and the site's search API is known (see agent.fare_capture), flight
+            search responses are parsed as they arrive and select_flight chooses from them instead of the
+            rendered page. Captured responses and flights are recorded in each stage's metrics.
+        use_deep_links (optional): if True and the site accepts search deep links (see agent.deeplinks), the
+            search stage first opens the flight results directly. Only if the site rejects the link does the
+            agent fill in the search form.
+        profile (optional): if True, every step is timed by category (LLM, DOM, screenshot, page waits, actions)
+            and the timeline is saved as trace.json in the run's logs, see agent.profiler. Each stage's metrics
+            record its time per category.
+        run_archive (optional): if provided, each step, the run summary and the trace are streamed into the run's
+            compressed archive and indexed there (see agent.run_archive), instead of being written as separate
+            history, GIF and JSON files. RunArchive.export_gif rebuilds a stage's GIF. Steps replayed from the
+            trajectory cache and shortcut actions are archived as replayed_step and shortcut_step records.
+
+    Returns
+        a PipelineResult recording the outcome, steps and tokens of each stage, and which stage failed (if any)
     """
-    # load environment variables
-    load_dotenv()
+    # imported here: browser-use and playwright take seconds to import, and every process
+    # spawned from this module (artifact writers, booking workers) runs its top level again
+    from browser_use import ActionResult, Agent
+    from browser_use.llm import ChatGoogle
+
+    from agent.cassette import CassetteLLM
+    from agent.controller import create_custom_controller
+    from agent.deeplinks import build_search_url, check_search_results
+    from agent.dom_filter import DomPruner
+    from agent.fare_capture import FareCapture
+    from agent.network import RequestBlocker
+    from agent.profiler import StepProfiler
+    from agent.prompting import (
+        PROMPT_VERSION,
+        get_initial_actions,
+        get_select_flight_actions,
+        get_system_prefix,
+        get_tasks,
+    )
+    from agent.screenshots import ScreenshotPipeline
+    from agent.session import create_fresh_browser_session
+    from agent.stability import PageStability
+    from agent.trajectory import TrajectoryReplayer, trajectory_params
+
+    # environment variables, e.g. the LLM provider's API key
+    load_config()
 
     # define paths for logs
     # browser-use already creates its own uid for logs but we need a way to organize
     # multiple sets of logs in the same run
-    run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    started_at = datetime.now()
+    run_id = started_at.strftime("%Y%m%d-%H%M%S-%f")
 
     run_logs_path = os.path.join(logs_path, run_id)
-    task1_logs_path = os.path.join(run_logs_path, "task1")
-    task2_logs_path = os.path.join(run_logs_path, "task2")
-    task3_logs_path = os.path.join(run_logs_path, "task3")
-    task4_logs_path = os.path.join(run_logs_path, "task4")
-
-    task1_gif_path = os.path.join(run_logs_path, "task1.gif")
-    task2_gif_path = os.path.join(run_logs_path, "task2.gif")
-    task3_gif_path = os.path.join(run_logs_path, "task3.gif")
-    task4_gif_path = os.path.join(run_logs_path, "task4.gif")
-
-    task1_usage_path = os.path.join(run_logs_path, "task1.json")
-    task2_usage_path = os.path.join(run_logs_path, "task2.json")
-    task3_usage_path = os.path.join(run_logs_path, "task3.json")
-    task4_usage_path = os.path.join(run_logs_path, "task4.json")
-    logging.info(f"Logs will be saved to {run_logs_path}")
+    summary_path = os.path.join(run_logs_path, "summary.json")
+    label = os.path.basename(os.path.normpath(logs_path))
+
+    ledger = ledger or RunLedger()
+    owns_artifact_writer = artifact_writer is None
+    if owns_artifact_writer:
+        artifact_writer = ArtifactWriter()
 
     # define model to use
     model = "gemini-2.0-flash"
     # model = "gpt-4.1-mini"
     llm = ChatGoogle(model=model, temperature=0)
     # llm = ChatOpenAI(model=model, temperature=0)
+    cassette = None
+    if cassette_path is not None:
+        llm = cassette = CassetteLLM(llm, cassette_path, mode=cassette_mode)
+    llm_timer = LLMTimer(llm)
     logging.info(f"Initialized LLM with model {model}")
 
     # generate user tasks for agent
@@ -90,119 +198,296 @@ async def do_flight_booking(
     logging.info(f"TASK #3: FILL IN PASSENGER INFO\n{task3}")
     logging.info(f"TASK #4: FILL IN PAYMENT INFO\n{task4}")
 
+    search_url = build_search_url(site, flight_info) if use_deep_links else None
+    stages = [
+        Stage(
+            name="search_flights",
+            task=task1,
+            initial_actions=get_initial_actions(site=site),
+            max_actions_per_step=2,
+            dom_filter="search",
+            shortcut=get_initial_actions(site=site, flight_info=flight_info)
+            if search_url
+            else None,
+        ),
+        Stage(
+            name="select_flight",
+            task=task2,
+            initial_actions=get_select_flight_actions(flight_info),
+            max_actions_per_step=2,
+            dom_filter="fares",
+        ),
+        Stage(name="traveler_info", task=task3, dom_filter="traveler"),
+        Stage(
+            name="payment_info",
+            task=task4,
+            allow_request_assistance=True,
+            dom_filter="payment",
+        ),
+    ]
+    # logs for each stage keep the taskN naming used by earlier runs
+    stage_log_names = {stage.name: f"task{idx}" for idx, stage in enumerate(stages, 1)}
+
     # initialize and kick off chromium browser session
     browser_session = create_fresh_browser_session()
     logging.info("Created fresh browser session")
-    await browser_session.start()
-    logging.info("Browser session initialized")
-
-    # do agentic booking!
-    extended_system_message = """
-    <critical_rules>
-    You will be interacting with very dense, dynamic pages. Be conservative when using any actions that will alter your view of the page.
-    Below is a list of CRITICAL rules that must always be followed. Failure to adhere to them will lead to unstable page interactions that may make accomplishing your goal impossible.
-    1. After interacting with any date picker, dropdown, or other popover, you MUST IMMEDIATELY use the close_selected_popover action before taking any other action. Use the wait action for 1 second after closing to verify the popover is gone. Do not proceed until you confirm the page is in a clean state.
-    2. Never click or input text into an element on the page that is obscured or partly obscured. Use the provided screenshot of the page in order to confirm that the target element is fully visible before taking action. If it's obscured, take action to reveal it such as scrolling the page or expanding accordion widgets.
-    3. Whenever you use the scroll action, always scroll in half-page increments (num_pages = 0.5) or less. Scrolling a full page or more can accidentally obscure content. 
-    4. If you are prompted to accept cookies, you must do this before taking any other task. This pop-up may obscure other critical page elements.
-    </critical_rules>
-    """
-
-    # step 1 - Search for flights
-    agent = Agent(
-        controller=create_custom_controller(allow_request_assistance=False),
-        task=task1,
-        llm=llm,
-        initial_actions=get_initial_actions(site="southwest"),
-        browser_session=browser_session,
-        save_conversation_path=task1_logs_path,
-        use_vision=True,
-        extended_system_message=extended_system_message,
-        max_actions_per_step=2,
-        generate_gif=task1_gif_path,
-    )
-    await agent.run(max_steps=max_steps_per_task)
-
-    print("========================")
-    usage = agent.token_cost_service.get_usage_tokens_for_model(model)
-    data = usage.model_dump()
-    # Write to JSON file
-    with open(task1_usage_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    print(usage)
-    print("========================")
-
-    # step 2
-    agent = Agent(
-        controller=create_custom_controller(allow_request_assistance=False),
-        task=task2,
-        llm=llm,
-        # initial_actions = [{"filter_booking_controls": {}}],
-        browser_session=browser_session,
-        save_conversation_path=task2_logs_path,
-        use_vision=True,
-        extend_system_message=extended_system_message,
-        max_actions_per_step=2,
-        generate_gif=task2_gif_path,
-    )
-    await agent.run(max_steps=max_steps_per_task)
-
-    print("========================")
-    usage = agent.token_cost_service.get_usage_tokens_for_model(model)
-    data = usage.model_dump()
-    # Write to JSON file
-    with open(task2_usage_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    print(usage)
-    print("========================")
-
-    # step 3
-    agent = Agent(
-        controller=create_custom_controller(allow_request_assistance=False),
-        task=task3,
-        llm=llm,
-        # initial_actions = [{"filter_interactive_fields": {}}],
-        browser_session=browser_session,
-        save_conversation_path=task3_logs_path,
-        use_vision=True,
-        extend_system_message=extended_system_message,
-        generate_gif=task3_gif_path,
-    )
-    await agent.run(max_steps=max_steps_per_task)
-
-    print("========================")
-    usage = agent.token_cost_service.get_usage_tokens_for_model(model)
-    data = usage.model_dump()
-    # Write to JSON file
-    with open(task3_usage_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    print(usage)
-    print("========================")
-
-    # step 4
-    agent = Agent(
-        controller=create_custom_controller(allow_request_assistance=True),
-        task=task4,
-        llm=llm,
-        # initial_actions = [{"filter_interactive_fields": {}}],
-        browser_session=browser_session,
-        save_conversation_path=task4_logs_path,
-        use_vision=True,
-        extend_system_message=extended_system_message,
-        generate_gif=task4_gif_path,
-    )
-    await agent.run(max_steps=max_steps_per_task)
-
-    print("========================")
-    usage = agent.token_cost_service.get_usage_tokens_for_model(model)
-    data = usage.model_dump()
-    # Write to JSON file
-    with open(task4_usage_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    print(usage)
-    print("========================")
+    result = None
+    archive_writer = None
+    # chromium must be killed even if the run raises, or its processes leak
+    try:
+        # opened here, so a run that raises anywhere after is finished as failed
+        if run_archive is not None:
+            archive_writer = await asyncio.to_thread(
+                run_archive.open_run,
+                run_id,
+                site=site,
+                label=label,
+                started_at=started_at,
+            )
+            logging.info(f"Run {run_id} will be archived in {run_archive.root}")
+        if archive_writer is None or save_conversation:
+            os.makedirs(run_logs_path, exist_ok=True)
+            logging.info(f"Logs will be saved to {run_logs_path}")
+        await browser_session.start()
+        logging.info("Browser session initialized")
+        if asset_cache is not None:
+            # attached first, so blocked requests never reach the cache
+            await asset_cache.attach(browser_session.browser_context)
+        request_blocker = RequestBlocker(site, request_blocking)
+        await request_blocker.attach(browser_session.browser_context)
+        fare_capture = None
+        if capture_fares and FareCapture.supports(site):
+            fare_capture = FareCapture(site)
+            await fare_capture.attach(browser_session.browser_context)
+        dom_pruner = DomPruner(browser_session)
+        page_stability = PageStability(browser_session)
+        screenshot_pipeline = None
+        if screenshot_settings is not None:
+            screenshot_pipeline = ScreenshotPipeline(
+                browser_session, screenshot_settings
+            )
+        # created last, so its spans wrap the methods as the patches above left them
+        profiler = StepProfiler(run_id, browser_session, llm) if profile else None
+
+        # do agentic booking!
+        # the static rules are the same for every stage and run, so providers can cache them as a prompt prefix
+        extended_system_message = get_system_prefix()
+        stage_attempts: dict[str, int] = {}
+
+        def make_agent(stage: Stage) -> Agent:
+            log_name = stage_log_names[stage.name]
+            dom_pruner.kind = stage.dom_filter if prune_dom else None
+            agent_kwargs = {}
+            if stage.max_actions_per_step is not None:
+                agent_kwargs["max_actions_per_step"] = stage.max_actions_per_step
+            agent = Agent(
+                controller=create_custom_controller(
+                    allow_request_assistance=stage.allow_request_assistance,
+                    page_stability=page_stability,
+                    assistance_broker=assistance_broker,
+                    booking_id=run_id,
+                    fare_capture=fare_capture,
+                ),
+                task=stage.task,
+                llm=llm,
+                initial_actions=stage.initial_actions,
+                browser_session=browser_session,
+                save_conversation_path=os.path.join(run_logs_path, log_name)
+                if save_conversation
+                else None,
+                use_vision=True,
+                extend_system_message=extended_system_message,
+                # GIFs are encoded by the artifact writer in on_attempt_end instead
+                generate_gif=False,
+                **agent_kwargs,
+            )
+            if screenshot_pipeline is not None:
+                screenshot_pipeline.instrument_agent(agent)
+            if profiler is not None:
+                profiler.stage = stage.name
+                profiler.instrument_agent(agent)
+            stage_attempts[stage.name] = stage_attempts.get(stage.name, 0) + 1
+            if archive_writer is not None:
+                archive_agent_steps(
+                    agent, archive_writer, stage.name, stage_attempts[stage.name]
+                )
+            return agent
+
+        async def on_attempt_end(
+            stage: Stage, attempt: int, history: "AgentHistoryList | None"
+        ):
+            # archived runs already have every step, screenshots included
+            if history is None or archive_writer is not None:
+                return
+            log_name = stage_log_names[stage.name]
+            if attempt > 1:
+                log_name += f"_attempt{attempt}"
+            await artifact_writer.submit_gif(
+                os.path.join(run_logs_path, f"{log_name}.gif"),
+                history.screenshots(return_none_if_not_screenshot=False),
+            )
+            await artifact_writer.submit_json(
+                os.path.join(run_logs_path, f"{log_name}_history.json"),
+                history.model_dump(),
+            )
 
-    await browser_session.kill()
+        async def record_stage_end(outcome: StageOutcome):
+            print("========================")
+            outcome.llm_seconds = llm_timer.reset()
+            outcome.metrics["dom_pruning"] = dom_pruner.reset_stats().summary()
+            outcome.metrics["stability"] = page_stability.reset_stats().summary()
+            outcome.metrics["network"] = request_blocker.reset_stats().summary()
+            if asset_cache is not None:
+                outcome.metrics["asset_cache"] = asset_cache.reset_stats().summary()
+            if fare_capture is not None:
+                outcome.metrics["fare_capture"] = fare_capture.reset_stats().summary()
+            if cassette is not None:
+                outcome.metrics["cassette"] = cassette.reset_stats().summary()
+            if profiler is not None:
+                outcome.metrics["profile"] = profiler.stage_summary(outcome.stage)
+            # replaying cached trajectories needs the full DOM, so only prune while an agent runs
+            dom_pruner.kind = None
+            if screenshot_pipeline is not None:
+                outcome.metrics["screenshots"] = (
+                    screenshot_pipeline.reset_stats().summary()
+                )
+            outcome.metrics["prompt_cache"] = {
+                "prompt_version": PROMPT_VERSION,
+                "cached_tokens": outcome.cached_prompt_tokens,
+                "uncached_tokens": outcome.prompt_tokens - outcome.cached_prompt_tokens,
+                "hit_rate": round(
+                    outcome.cached_prompt_tokens / outcome.prompt_tokens, 3
+                )
+                if outcome.prompt_tokens
+                else None,
+            }
+            for step, (prompt, cached) in enumerate(
+                zip(outcome.step_input_tokens, outcome.step_cached_tokens), 1
+            ):
+                logging.info(
+                    f"Stage {outcome.stage} LLM call {step}: {cached} cached / {prompt - cached} uncached input tokens"
+                )
+            print(outcome)
+            print("========================")
+            if on_stage_end is not None:
+                await on_stage_end(outcome)
+
+        replayer = None
+        if trajectory_cache is not None:
+            replayer = TrajectoryReplayer(
+                cache=trajectory_cache,
+                site=site,
+                variant="round_trip" if flight_info["round_trip"] else "one_way",
+                params=trajectory_params(flight_info, user_info_ls, user_billing_info),
+                controller=create_custom_controller(
+                    allow_request_assistance=False,
+                    page_stability=page_stability,
+                    fare_capture=fare_capture,
+                ),
+                browser_session=browser_session,
+            )
+            if archive_writer is not None:
+                archive_replayed_steps(replayer, archive_writer)
+
+        shortcut_controller = create_custom_controller(
+            allow_request_assistance=False, page_stability=page_stability
+        )
+
+        if profiler is not None:
+            profiler.instrument_controller(shortcut_controller)
+            if replayer is not None:
+                profiler.instrument_replayer(replayer)
+
+        async def run_shortcut(stage: Stage) -> bool:
+            if profiler is not None:
+                profiler.stage = stage.name
+            for idx, action in enumerate(stage.shortcut):
+                name, params = next(iter(action.items()))
+                action_result = await shortcut_controller.registry.execute_action(
+                    name, params, browser_session=browser_session
+                )
+                if archive_writer is not None:
+                    await asyncio.to_thread(
+                        archive_writer.append,
+                        "shortcut_step",
+                        {
+                            "action": name,
+                            "params": params,
+                            "result": action_result.model_dump()
+                            if isinstance(action_result, ActionResult)
+                            else action_result,
+                        },
+                        stage=stage.name,
+                        step=idx + 1,
+                    )
+                if isinstance(action_result, ActionResult) and action_result.error:
+                    logging.info(f"Shortcut {name} failed: {action_result.error}")
+                    return False
+            check = await check_search_results(browser_session, search_url, flight_info)
+            if not check.accepted:
+                logging.info(
+                    f"{site} rejected the search deep link ({check.reason}), searching with the form instead"
+                )
+            return check.accepted
+
+        result = await run_pipeline(
+            run_id=run_id,
+            stages=stages,
+            make_agent=make_agent,
+            model=model,
+            max_steps_per_stage=max_steps_per_task,
+            retry_policy=retry_policy,
+            on_stage_end=record_stage_end,
+            replayer=replayer,
+            on_attempt_end=on_attempt_end,
+            run_shortcut=run_shortcut,
+        )
+
+        if archive_writer is not None:
+            await asyncio.to_thread(
+                archive_writer.append, "summary", result.model_dump()
+            )
+        else:
+            await artifact_writer.submit_json(summary_path, result.model_dump())
+        await ledger.record_run(
+            result,
+            started_at=started_at,
+            site=site,
+            model=model,
+            label=label,
+            prompt_version=PROMPT_VERSION,
+        )
+        if result.failed_stage is not None:
+            logging.warning(f"Run {run_id} stopped at stage {result.failed_stage}")
+        logging.info(
+            f"Run {run_id}: {result.total_replayed_steps} steps replayed from cache, {result.total_steps} steps decided by the LLM"
+        )
+
+        if cassette is not None:
+            logging.info(f"Run {run_id} LLM cassette: {cassette.stats()}")
+
+        if profiler is not None:
+            profiler.restore()
+            if archive_writer is not None:
+                await asyncio.to_thread(
+                    archive_writer.append, "trace", profiler.trace()
+                )
+            else:
+                await artifact_writer.submit_json(
+                    os.path.join(run_logs_path, "trace.json"), profiler.trace()
+                )
+    finally:
+        if archive_writer is not None:
+            # a run that raised is indexed as failed
+            await asyncio.to_thread(archive_writer.finish, result)
+        try:
+            await browser_session.kill()
+        except Exception as e:
+            logging.warning(f"Could not close the browser of run {run_id}: {e}")
+        if owns_artifact_writer:
+            # queued artifacts keep being written in the background
+            artifact_writer.shutdown(wait=False)
+    return result
 
 
 # define demo UserInfo
@@ -238,32 +523,170 @@ user_billing_info = {
 }
 
 
-async def main():
-    for eval_idx in range(0, 5):
+async def main(
+    site: str = "mock",
+    num_samples: int = 5,
+    runs_per_sample: int = 2,
+    cassette_mode: "CassetteMode | None" = None,
+    request_blocking: "BlockingMode" = "lean",
+    use_asset_cache: bool = True,
+    use_deep_links: bool = True,
+    profile: bool = False,
+    archive_path: str | None = None,
+):
+    """Runs the first num_samples evaluation samples runs_per_sample times each against site.
+
+    site="mock" serves the bundled mock airline on localhost, so runs need no network and
+    are reproducible. Every run is also checked against what the mock site recorded.
+
+    With cassette_mode set, each run records or replays its LLM calls from
+    cassettes/<site>/input_sample_<i>_run<j>.jsonl. The trajectory cache is disabled in that
+    case, because whether a stage is replayed from it changes which LLM calls are made.
+
+    Runs block non-essential requests in lean mode unless request_blocking says otherwise,
+    compare the modes with analyze_runs.py --group-by site,blocking_mode.
+
+    With use_asset_cache, all runs share one static asset cache in asset_cache/.
+
+    With use_deep_links, searches open the results page directly on sites that allow it.
+
+    With profile, each run saves a step timeline to trace.json, summarized across runs by
+    analyze_runs.py --traces.
+
+    With archive_path, runs are written to a compressed run archive there instead of a
+    directory of files each, see archive_runs.py.
+    """
+    from tqdm import tqdm
+
+    from agent.asset_cache import SharedAssetCache
+    from agent.trajectory import TrajectoryCache
+    from evaluation.mock_airline import DEFAULT_PORT, MockAirlineServer, check_booking
+
+    trajectory_cache = None
+    if cassette_mode is None:
+        trajectory_cache = TrajectoryCache("trajectory_cache")
+    artifact_writer = ArtifactWriter(gif_sample_every=2)
+    ledger = RunLedger()
+    asset_cache = SharedAssetCache() if use_asset_cache else None
+    run_archive = RunArchive(archive_path) if archive_path is not None else None
+    mock_airline = None
+    if site == "mock":
+        mock_airline = MockAirlineServer(port=DEFAULT_PORT).start()
+
+    with open("src/evaluation/input_samples.jsonl", "r", encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()][:num_samples]
+
+    for eval_idx, flight_info in enumerate(samples):
         print("===========================================")
         print(f"BEGINNING EVALUATION INPUT #{eval_idx}")
         print("===========================================")
-        with open("src/evaluation/input_samples.jsonl", "r", encoding="utf-8") as f:
-            for idx, line in enumerate(f, 0):
-                if idx == eval_idx:
-                    line = line.strip()
-                    flight_info = json.loads(line)
 
-        for run_idx in tqdm(range(2)):
+        for run_idx in tqdm(range(runs_per_sample)):
             logs_path = f"logs/input_sample_{eval_idx}"
+            if mock_airline is not None:
+                mock_airline.reset_events()
 
-            await do_flight_booking(
+            result = await do_flight_booking(
                 flight_info=flight_info,
                 user_info_ls=user_info_ls,
                 user_billing_info=user_billing_info,
                 logs_path=logs_path,
                 keep_alive=False,
+                site=site,
+                trajectory_cache=trajectory_cache,
+                artifact_writer=artifact_writer,
+                ledger=ledger,
+                cassette_path=os.path.join(
+                    "cassettes", site, f"input_sample_{eval_idx}_run{run_idx}.jsonl"
+                )
+                if cassette_mode is not None
+                else None,
+                cassette_mode=cassette_mode or "auto",
+                request_blocking=request_blocking,
+                asset_cache=asset_cache,
+                use_deep_links=use_deep_links,
+                profile=profile,
+                run_archive=run_archive,
             )
-            print("===========================================")
-            print("DONE WITH ONE ITERATION. SLEEPING FOR 30 SECONDS.")
-            print("===========================================")
-            time.sleep(30)
+
+            if mock_airline is not None:
+                checks = check_booking(mock_airline.events, flight_info)
+                logging.info(f"Mock airline checks for run {result.run_id}: {checks}")
+                if run_archive is not None:
+                    archive_writer = run_archive.open_run(result.run_id)
+                    archive_writer.append("mock_checks", checks)
+                    archive_writer.close()
+                else:
+                    await artifact_writer.submit_json(
+                        os.path.join(logs_path, result.run_id, "mock_checks.json"),
+                        checks,
+                    )
+            else:
+                # live airline sites rate limit repeated searches
+                print("===========================================")
+                print("DONE WITH ONE ITERATION. SLEEPING FOR 30 SECONDS.")
+                print("===========================================")
+                time.sleep(30)
+
+    if mock_airline is not None:
+        mock_airline.stop()
+    artifact_writer.shutdown(wait=True)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(
+        description="Run the booking agent on the evaluation samples"
+    )
+    parser.add_argument(
+        "--site",
+        default="mock",
+        help="mock (local mock airline, no network), southwest, united, delta or a URL",
+    )
+    parser.add_argument("--num-samples", type=int, default=5)
+    parser.add_argument("--runs-per-sample", type=int, default=2)
+    parser.add_argument(
+        "--cassette",
+        choices=["record", "replay", "auto"],
+        help="record LLM calls to, or replay them from, a cassette per run",
+    )
+    parser.add_argument(
+        "--block-resources",
+        choices=["off", "lean", "strict"],
+        default="lean",
+        help="block trackers, media and other non-essential requests, see RequestBlocker",
+    )
+    parser.add_argument(
+        "--no-asset-cache",
+        action="store_true",
+        help="download static assets in every run instead of sharing them through asset_cache/",
+    )
+    parser.add_argument(
+        "--no-deep-links",
+        action="store_true",
+        help="always search with the form instead of opening the results page directly",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="save a Chrome trace of each run's steps, open it in https://ui.perfetto.dev",
+    )
+    parser.add_argument(
+        "--archive",
+        nargs="?",
+        const=DEFAULT_ARCHIVE_PATH,
+        help=f"write runs to a compressed, indexed run archive (default {DEFAULT_ARCHIVE_PATH}) instead of log files",
+    )
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            site=args.site,
+            num_samples=args.num_samples,
+            runs_per_sample=args.runs_per_sample,
+            cassette_mode=args.cassette,
+            request_blocking=args.block_resources,
+            use_asset_cache=not args.no_asset_cache,
+            use_deep_links=not args.no_deep_links,
+            profile=args.profile,
+            archive_path=args.archive,
+        )
+    )
@@ -6,6 +6,8 @@ from pydantic import BaseModel, Field
 class FlightInfo(BaseModel):
     departure_city: str
     arrival_city: str
+    departure_airport: Optional[str] = None
+    arrival_airport: Optional[str] = None
     departure_date: str
     return_date: Optional[str] = None
     adult_passengers: int = 1
@@ -1,33 +1,11 @@
 import asyncio
-import sys
-
-sys.stdout.reconfigure(encoding="utf-8")
-import os
 import re
+import sys
 
-# Set up browser-use config directory before importing
-config_dir = os.path.expanduser("~/Desktop/aitinerary/browser_config")
-os.makedirs(config_dir, exist_ok=True)
-os.environ["BROWSER_USE_CONFIG_DIR"] = config_dir
-
-# Now safely import browser-use
-try:
-    from browser_use import ActionResult, Agent, BrowserSession, Controller
-
-    print("Successfully imported browser-use")
-except Exception as e:
-    print(f"Still having import issues: {e}")
-    sys.exit(1)
-
-from dotenv import load_dotenv
-
-BrowserSession.capture_element_screenshots = False
-from browser_use.llm import ChatGoogle
-
-load_dotenv()
-BrowserSession.clear_context_on_start = True
+from agent.config import configure_browser_use, load_config
 
-llm = ChatGoogle(model="gemini-2.5-flash-lite-preview-06-17")
+# same DOM extractors as the agent/ copy of this script
+from agent.parse_v2 import build_controller
 
 message_context = """
 When URL contains '/traveler/choose-travelers' (or any of the specified segments), do NOT click, go back, or perform any further actions. Immediately output:
@@ -78,65 +56,20 @@ Once on a URL containing '/traveler/choose-travelers' or '/booking/passenger':
 - Do not click previous pages or rethink flight selection.
 """
 
-# customer functions for DOM filtering
-
-controller = Controller()
-
-
-@controller.action("Return flight booking controls")
-async def filter_booking_controls() -> ActionResult:
-    js = r"""
-    const needed = ["one-way", "round-trip", "depart", "return", "find flights", "select", "continue", "next"];
-    return Array.from(document.querySelectorAll('button, select, input[type="text"], input[type="date"]'))
-      .filter(el => {
-        const text = (el.innerText || el.value || el.getAttribute('aria-label') || "").toLowerCase();
-        return needed.some(k => text.includes(k));
-      })
-      .map(el => ({
-        tag: el.tagName,
-        selector: el.tagName.toLowerCase()
-                  + (el.id ? `#${el.id}` : el.name ? `[name="${el.name}"]` : ""),
-        text: (el.innerText || el.value || el.getAttribute('aria-label') || "").trim()
-      }));
-    """
-    return ActionResult(js=js)
-
-
-@controller.action("Return named, focused, and relevant DOM fields")
-async def filter_interactive_fields() -> ActionResult:
-    js = r"""
-    function getName(el) {
-      if (el.ariaLabel) return el.ariaLabel;
-      const abz = el.getAttribute('aria-labelledby');
-      if (abz) return abz.split(' ').map(id => document.getElementById(id)?.innerText).join(' ');
-      if (el.labels?.length) return Array.from(el.labels).map(l => l.innerText).join(' ');
-      if (el.placeholder) return el.placeholder;
-      if (el.title) return el.title;
-      return el.innerText?.trim() || null;
-    }
-    return Array.from(document.querySelectorAll(
-      'input:not([type=hidden]):not([disabled]), select:not([disabled]), textarea:not([disabled])'
-    )).filter(el => {
-      const name = getName(el);
-      return name && /First name|Last name|Middle|Birth|Gender|Suffix|Frequent flyer/i.test(name);
-    }).map(el => {
-      const rect = el.getBoundingClientRect();
-      return {
-        tag: el.tagName,
-        type: el.type || null,
-        selector: el.tagName.toLowerCase() +
-          (el.name ? `[name="${el.name}"]` : el.id ? `#${el.id}` : ''),
-        name: getName(el),
-        value: el.value || null,
-        required: el.required || el.getAttribute('aria-required') === 'true',
-        visible: rect.width > 0 && rect.height > 0
-      };
-    });
-    """
-    return ActionResult(js=js)
-
 
 async def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+    # browser-use reads its config dir when first imported
+    configure_browser_use()
+    load_config()
+    from browser_use import Agent, BrowserSession
+    from browser_use.llm import ChatGoogle
+
+    BrowserSession.capture_element_screenshots = False
+    BrowserSession.clear_context_on_start = True
+    llm = ChatGoogle(model="gemini-2.5-flash-lite-preview-06-17")
+    controller = build_controller()
+
     # pre-agent: setup a valid session (e.g., login/search) to get to booking page
     setup_agent = Agent(
         task=task_setup,
@@ -6,6 +6,7 @@ from browser_use import Agent
 from browser_use.llm import ChatGoogle
 from tqdm import tqdm
 
+from agent.cassette import CassetteLLM
 from agent.session import create_fresh_browser_session
 
 run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
@@ -13,6 +14,8 @@ logs_path = "logs_test"
 run_logs_path = os.path.join(logs_path, run_id)
 task1_logs_path = os.path.join(run_logs_path, "task1")
 task1_gif_path = os.path.join(run_logs_path, "task1.gif")
+# the first run records LLM responses, later runs replay them so only browser time is measured
+cassette_path = os.path.join("cassettes", "test_looping.jsonl")
 
 model = "gemini-2.0-flash"
 # model = "gpt-4.1-mini"
@@ -24,7 +27,7 @@ async def run_agent():
     await browser_session.start()
 
     agent = Agent(
-        llm=llm,
+        llm=CassetteLLM(llm, cassette_path, mode="auto"),
         browser_session=browser_session,
         save_conversation_path=task1_logs_path,
         use_vision=True,
@@ -0,0 +1,96 @@
+import sys
+
+import pytest
+
+import analyze_runs
+from agent.ledger import RunRecord, read_ledger
+from agent.pipeline import StageOutcome
+from analyze_runs import percentile, summarize
+
+
+def _record(**fields) -> dict:
+    return {"site": "mock", "status": "success", "success": True} | fields
+
+
+@pytest.mark.parametrize(
+    "pct, expected", [(0, 1), (50, 2.5), (90, 3.7), (99, 3.97), (100, 4)]
+)
+def test_percentile_interpolates_between_ranks(pct, expected):
+    assert percentile([1, 2, 3, 4], pct) == pytest.approx(expected)
+
+
+def test_percentile_of_a_single_value():
+    assert percentile([7.5], 99) == 7.5
+
+
+def test_summary_per_group():
+    records = [
+        _record(stage="search", steps=steps, wall_seconds=steps * 1.5)
+        for steps in (2, 4, 6, 8)
+    ] + [
+        _record(stage="search", status="error", success=False, steps=10),
+        _record(stage="payment", status="skipped", success=False, steps=0),
+    ]
+    summary = summarize(records, ["stage"], ["steps", "wall_seconds"])
+
+    assert list(summary) == [("payment",), ("search",)]
+    skipped = summary[("payment",)]
+    assert (skipped["runs"], skipped["skipped"], skipped["success_rate"]) == (
+        0,
+        1,
+        None,
+    )
+    assert skipped["steps_p50"] is None and skipped["steps_total"] is None
+
+    row = summary[("search",)]
+    assert (row["runs"], row["skipped"], row["success_rate"]) == (5, 0, 0.8)
+    assert (row["steps_p50"], row["steps_p90"], row["steps_total"]) == (6, 9.2, 30)
+    # the error record has no wall_seconds
+    assert (row["wall_seconds_p50"], row["wall_seconds_total"]) == (7.5, 30)
+
+
+def test_read_ledger_skips_truncated_lines(tmp_path):
+    path = tmp_path / "ledger.jsonl"
+    path.write_text('{"steps": 1}\n{"steps": 2}\n{"ste')
+    assert list(read_ledger(str(path))) == [{"steps": 1}, {"steps": 2}]
+
+
+@pytest.mark.parametrize(
+    "cassette, expected",
+    [
+        (None, None),
+        ({"hits": 3, "misses": 2, "sequential_hits": 0, "recorded": 0}, 2),
+        ({"hits": 3, "misses": 0, "sequential_hits": 1, "recorded": 0}, 1),
+    ],
+)
+def test_ledger_counts_strict_and_sequential_cassette_misses(cassette, expected):
+    outcome = StageOutcome(stage="search", status="error")
+    if cassette is not None:
+        outcome.metrics["cassette"] = cassette
+    record = RunRecord.from_outcome(
+        outcome, "run-1", "2025-01-01T00:00:00", "mock", "m"
+    )
+    assert record.cassette_misses == expected
+
+
+def test_non_numeric_values_are_counted_not_summarized():
+    records = [_record(steps=4), _record(steps="3"), _record(steps=None)]
+    (row,) = summarize(records, ["site"], ["steps"]).values()
+    assert row["runs"] == 3
+    assert row["steps_total"] == 4
+    assert row["steps_invalid"] == 1
+
+
+@pytest.mark.parametrize(
+    "args, message",
+    [
+        (["--ledger", "missing.jsonl"], "No ledger at missing.jsonl"),
+        (["--metrics", "steps,site"], "Not numeric, so they can't be metrics: site"),
+    ],
+)
+def test_cli_errors(tmp_path, monkeypatch, capsys, args, message):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["analyze_runs.py", *args])
+    with pytest.raises(SystemExit):
+        analyze_runs.main()
+    assert message in capsys.readouterr().err
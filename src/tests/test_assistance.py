@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from agent.assistance import AssistanceBroker
+
+
+def test_only_the_last_finished_requests_are_kept():
+    broker = AssistanceBroker(max_finished=2)
+
+    async def run():
+        waiting = asyncio.create_task(broker.request("Solve the captcha", timeout=5))
+        finished = [
+            await broker.request(f"request {idx}", timeout=0.01) for idx in range(3)
+        ]
+        await asyncio.sleep(0)
+        (pending,) = broker.pending()
+        answered = broker.answer(pending.request_id, "DONE")
+        return finished, answered, await waiting
+
+    finished, answered, waited = asyncio.run(run())
+    assert [request.status for request in finished] == ["timed_out"] * 3
+    assert waited.status == "answered" and waited.answer == "DONE"
+    # the two requests that finished last are kept
+    broker.get(answered.request_id)
+    broker.get(finished[2].request_id)
+    for request in finished[:2]:
+        with pytest.raises(KeyError):
+            broker.get(request.request_id)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+
+import pytest
+
+pytest.importorskip("browser_use")
+
+from browser_use.llm.messages import SystemMessage, UserMessage  # noqa: E402
+from browser_use.llm.views import ChatInvokeCompletion  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+from agent.cassette import CassetteLLM, CassetteMissError, fingerprint_request  # noqa: E402
+
+
+class Decision(BaseModel):
+    action: str
+
+
+class _LLM:
+    model = "stub-model"
+    provider = "stub"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages, output_format=None):
+        self.calls += 1
+        return ChatInvokeCompletion(
+            completion=Decision(action=f"click {self.calls}"), usage=None
+        )
+
+
+def _messages(page: str, now: str = "2025-08-01 12:00") -> list:
+    return [
+        SystemMessage(content="You book flights."),
+        UserMessage(
+            content=f"Current date and time: {now}\nagent 0687f1c2-aaaa-bbbb-cccc-0123456789ab\n{page}"
+        ),
+    ]
+
+
+def test_fingerprint_ignores_time_ids_and_whitespace():
+    a = fingerprint_request(_messages("[1]<button>Search</button>"), Decision)
+    b = fingerprint_request(
+        _messages("[1]<button>Search</button>", now="2026-01-02 08:30"), Decision
+    )
+    assert a == b
+    assert a != fingerprint_request(_messages("[1]<button>Book</button>"), Decision)
+    assert a != fingerprint_request(_messages("[1]<button>Search</button>"))
+
+
+def _record(path) -> _LLM:
+    llm = _LLM()
+    cassette = CassetteLLM(llm, str(path), mode="record")
+
+    async def run():
+        for page in ("search page", "results page"):
+            await cassette.ainvoke(_messages(page), Decision)
+
+    asyncio.run(run())
+    return llm
+
+
+def test_replay_returns_recorded_completions_without_the_llm(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    _record(path)
+    cassette = CassetteLLM(None, str(path), mode="replay")
+
+    async def run():
+        return [
+            (await cassette.ainvoke(_messages(page), Decision)).completion
+            for page in ("search page", "results page")
+        ]
+
+    assert asyncio.run(run()) == [
+        Decision(action="click 1"),
+        Decision(action="click 2"),
+    ]
+    assert cassette.model == "stub-model"
+    assert cassette.stats()["hits"] == 2
+
+
+def test_replay_miss_raises_by_default(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    _record(path)
+    cassette = CassetteLLM(None, str(path), mode="replay")
+    with pytest.raises(CassetteMissError):
+        asyncio.run(cassette.ainvoke(_messages("a page that changed"), Decision))
+    assert cassette.reset_stats().misses == 1
+    assert cassette.stats()["misses"] == 1
+
+
+def test_non_strict_replay_warns_and_counts_misses(tmp_path, caplog):
+    path = tmp_path / "cassette.jsonl"
+    _record(path)
+    cassette = CassetteLLM(None, str(path), mode="replay", strict=False)
+
+    with caplog.at_level(logging.WARNING):
+        result = asyncio.run(
+            cassette.ainvoke(_messages("a page that changed"), Decision)
+        )
+    assert result.completion == Decision(action="click 1")
+    assert "no recording for request" in caplog.text
+    assert cassette.reset_stats().sequential_hits == 1
+    assert cassette.reset_stats().sequential_hits == 0
+    assert cassette.stats()["sequential_hits"] == 1
+
+
+def test_auto_mode_records_only_misses(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    _record(path)
+    llm = _LLM()
+    cassette = CassetteLLM(llm, str(path), mode="auto")
+
+    async def run():
+        await cassette.ainvoke(_messages("search page"), Decision)
+        await cassette.ainvoke(_messages("a new page"), Decision)
+
+    asyncio.run(run())
+    assert llm.calls == 1
+    assert cassette.stats() == {
+        "mode": "auto",
+        "hits": 1,
+        "misses": 0,
+        "sequential_hits": 0,
+        "recorded": 1,
+    }
+    assert len(path.read_text().splitlines()) == 3
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("browser_use")
+
+from agent.deeplinks import search_mismatch  # noqa: E402
+
+FLIGHT = {
+    "departure_airport": "DAL",
+    "arrival_airport": "HOU",
+    "departure_date": "2025-08-01",
+}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "DAL → HOU · Fri, Aug 1, 2025 · 1 Adult",
+        "Dallas (DAL) to Houston (HOU)\nFRIDAY, AUGUST 01",
+        "DAL - HOU 8/1/2025",
+        "DAL HOU 1 Aug 2025",
+        "DAL HOU departing 2025-08-01",
+    ],
+)
+def test_results_for_the_search_match(text):
+    assert search_mismatch(text, FLIGHT) is None
+
+
+@pytest.mark.parametrize(
+    "text, reason",
+    [
+        ("DAL → AUS · Fri, Aug 1, 2025", "HOU not shown"),
+        ("DALLAS → HOU · Fri, Aug 1, 2025", "DAL not shown"),
+        ("DAL → HOU · Sun, Aug 10, 2025", "departure date 2025-08-01"),
+        ("DAL → HOU · 8/11/2025", "departure date 2025-08-01"),
+    ],
+)
+def test_results_for_another_search_are_rejected(text, reason):
+    assert reason in search_mismatch(text, FLIGHT)
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("browser_use")
+pytest.importorskip("playwright")
+
+from agent.fare_capture import FareCapture, parse_mock_search  # noqa: E402
+from agent.fares import choose_fare  # noqa: E402
+from evaluation.mock_airline.server import (  # noqa: E402
+    FARE_CLASSES,
+    cheapest_fare,
+    generate_flights,
+)
+
+SEARCH_RESPONSE = {
+    "flights": [
+        {
+            "depart_time": "6:00 AM",
+            "arrive_time": "7:05 AM",
+            "stops": 0,
+            "flight_numbers": ["101"],
+            "fares": {"Basic": 89, "Anytime": None},
+        }
+    ]
+}
+
+
+class _Request:
+    resource_type = "fetch"
+
+    def __init__(self, page_url: str):
+        self.url = "http://127.0.0.1:8765/api/search?origin=DAL"
+        self.frame = SimpleNamespace(page=SimpleNamespace(url=page_url))
+
+
+class _Response:
+    def __init__(self, request: _Request):
+        self.request = request
+        self.url = request.url
+
+    async def json(self):
+        return SEARCH_RESPONSE
+
+
+def test_response_is_kept_for_the_page_that_sent_the_search():
+    capture = FareCapture("mock")
+    results_url = "http://127.0.0.1:8765/select-depart.html"
+    request = _Request(results_url)
+
+    async def run():
+        capture._on_request(request)
+        # the agent moved on before the response arrived
+        request.frame.page.url = "http://127.0.0.1:8765/select-return.html"
+        await capture._on_response(_Response(request))
+        return await capture.rows_for(results_url, timeout=0.1)
+
+    rows = asyncio.run(run())
+    assert [fare.price for fare in rows[0].fares] == [89]
+    assert capture.searches.keys() == {results_url}
+    assert capture._pending == {}
+
+
+def test_failed_search_releases_the_page_that_sent_it():
+    capture = FareCapture("mock")
+    results_url = "http://127.0.0.1:8765/select-depart.html"
+    request = _Request(results_url)
+
+    async def run():
+        capture._on_request(request)
+        request.frame.page.url = "http://127.0.0.1:8765/"
+        capture._on_request_failed(request)
+        return await capture.rows_for(results_url, timeout=5)
+
+    assert asyncio.run(run()) is None
+    assert capture._pending == {}
+
+
+def test_parse_mock_search_keeps_order_and_drops_sold_out_fares():
+    rows = parse_mock_search(SEARCH_RESPONSE)
+    assert len(rows) == 1
+    row = rows[0]
+    assert (row.row, row.depart_time, row.arrive_time, row.stops) == (
+        0,
+        "6:00 AM",
+        "7:05 AM",
+        0,
+    )
+    assert row.next_day is False and row.duration_minutes is None
+    assert row.text == "Flight # 101"
+    assert [(fare.cabin, fare.price, fare.handle) for fare in row.fares] == [
+        ("Basic", 89, None)
+    ]
+
+
+@pytest.mark.parametrize("routing", ["direct", "one_stop", "any"])
+def test_parsed_mock_search_agrees_with_the_mock_sites_cheapest_fare(routing):
+    flights = generate_flights("DAL", "HOU", "2025-08-01")
+    rows = parse_mock_search({"flights": flights})
+    assert [row.depart_time for row in rows] == [f["depart_time"] for f in flights]
+    for fare_class in FARE_CLASSES:
+        selection = choose_fare(rows, fare_class, routing=routing)
+        expected = cheapest_fare(flights, fare_class, routing)
+        assert (selection.fare.price if selection.ok else None) == expected
@@ -0,0 +1,97 @@
+import pytest
+
+pytest.importorskip("browser_use")
+
+from agent.fares import FareOption, FareRow, cabin_fares, choose_fare  # noqa: E402
+
+
+def _row(row: int, stops: int | None, **fares: float) -> FareRow:
+    return FareRow(
+        row=row,
+        depart_time=f"{6 + row}:00 AM",
+        stops=stops,
+        fares=[
+            FareOption(cabin=cabin.replace("_", " "), price=price)
+            for cabin, price in fares.items()
+        ],
+    )
+
+
+ROWS = [
+    _row(0, 1, Wanna_Get_Away=120, Wanna_Get_Away_Plus=150),
+    _row(1, 0, Wanna_Get_Away=99, Wanna_Get_Away_Plus=140),
+    _row(2, 2, Wanna_Get_Away=79, Wanna_Get_Away_Plus=110),
+    _row(3, 0, Wanna_Get_Away=99, Anytime=260),
+]
+
+
+def test_exact_cabin_names_win_over_partial_matches():
+    fares = cabin_fares(ROWS, "wanna get away")
+    assert {fare.cabin for _, fare in fares} == {"Wanna Get Away"}
+
+
+def test_partial_cabin_match_without_an_exact_one():
+    rows = [_row(0, 0, Main_Cabin_Economy=180, First=600)]
+    assert [fare.cabin for _, fare in cabin_fares(rows, "Economy")] == [
+        "Main Cabin Economy"
+    ]
+    assert cabin_fares(rows, "Premium Economy") == []
+
+
+def test_cheapest_fare_in_cabin():
+    selection = choose_fare(ROWS, "Wanna Get Away")
+    assert selection.ok
+    assert (selection.row.row, selection.fare.price) == (2, 79)
+    assert selection.matching == 4
+
+
+def test_ties_go_to_the_earlier_row():
+    selection = choose_fare(ROWS, "Wanna Get Away", routing="direct")
+    assert (selection.row.row, selection.fare.price) == (1, 99)
+    assert selection.matching == 2
+
+
+def test_unknown_stops_only_count_for_any_routing():
+    rows = [_row(0, None, Basic=50), _row(1, 1, Basic=80)]
+    assert choose_fare(rows, "Basic", routing="any").fare.price == 50
+    assert choose_fare(rows, "Basic", routing="one_stop").fare.price == 80
+    assert not choose_fare(rows, "Basic", routing="direct").ok
+
+
+@pytest.mark.parametrize(
+    "rows, cabin, routing, budget, error",
+    [
+        ([], "Basic", "any", None, "no flight result rows found on the page"),
+        (
+            ROWS,
+            "Business Select",
+            "any",
+            None,
+            "no 'Business Select' fares (fares offered: Anytime, Wanna Get Away, Wanna Get Away Plus)",
+        ),
+        (
+            ROWS,
+            "Anytime",
+            "one_stop",
+            200,
+            "the cheapest matching fare is $260, above the budget of $200",
+        ),
+        (
+            [_row(0, 2, Basic=50)],
+            "Basic",
+            "one_stop",
+            None,
+            "no 'Basic' fares on flights allowed by routing 'one_stop'",
+        ),
+    ],
+)
+def test_errors(rows, cabin, routing, budget, error):
+    selection = choose_fare(rows, cabin, routing=routing, budget=budget)
+    assert not selection.ok and selection.row is None
+    assert selection.error == error
+
+
+def test_budget_at_the_cheapest_fare_is_accepted():
+    selection = choose_fare(ROWS, "Wanna Get Away Plus", routing="direct", budget=140)
+    assert selection.ok and selection.fare.price == 140
+    assert selection.matching == 1
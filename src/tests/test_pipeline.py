@@ -0,0 +1,174 @@
+import asyncio
+from types import SimpleNamespace
+
+from agent.pipeline import RetryPolicy, Stage, run_pipeline
+
+MODEL = "stub-model"
+
+
+class _History:
+    def __init__(self, steps: int, done: bool, success: bool):
+        self.history = [
+            SimpleNamespace(metadata=SimpleNamespace(duration_seconds=0.5))
+            for _ in range(steps)
+        ]
+        self.done = done
+        self.success = success
+
+    def is_done(self):
+        return self.done
+
+    def is_successful(self):
+        return self.success
+
+    def final_result(self):
+        return "booked" if self.success else None
+
+    def errors(self):
+        return [None] * (len(self.history) - 1) + [None if self.success else "no fares"]
+
+
+class _Agent:
+    def __init__(self, stage: Stage, history: _History):
+        self.stage = stage
+        self.history = history
+        self.state = SimpleNamespace(n_steps=len(history.history) + 1)
+        usage = SimpleNamespace(
+            prompt_tokens=100,
+            prompt_cached_tokens=40,
+            completion_tokens=10,
+            total_tokens=110,
+        )
+        self.token_cost_service = SimpleNamespace(
+            get_usage_tokens_for_model=lambda model: usage,
+            usage_history=[],
+        )
+
+    async def run(self, max_steps: int):
+        return self.history
+
+
+class _Agents:
+    """make_agent stand-in that hands out one scripted history per attempt, per stage"""
+
+    def __init__(self, **histories: list[_History]):
+        self.histories = {stage: list(items) for stage, items in histories.items()}
+        self.created: list[str] = []
+
+    def __call__(self, stage: Stage) -> _Agent:
+        self.created.append(stage.name)
+        return _Agent(stage, self.histories[stage.name].pop(0))
+
+
+def _succeeded(steps: int = 2) -> _History:
+    return _History(steps, done=True, success=True)
+
+
+def _failed(steps: int = 3) -> _History:
+    return _History(steps, done=True, success=False)
+
+
+STAGES = [
+    Stage(name="search_flights", task="search", shortcut=[{"go_to_url": {}}]),
+    Stage(name="select_flight", task="select"),
+    Stage(name="traveler_info", task="traveler"),
+]
+
+
+def _run(agents: _Agents, shortcut_completes: bool, retry_policy=None):
+    ended = []
+    shortcuts = []
+
+    async def run_shortcut(stage: Stage) -> bool:
+        shortcuts.append(stage.name)
+        return shortcut_completes
+
+    async def on_stage_end(outcome):
+        ended.append(outcome.stage)
+
+    result = asyncio.run(
+        run_pipeline(
+            run_id="run-1",
+            stages=STAGES,
+            make_agent=agents,
+            model=MODEL,
+            max_steps_per_stage=10,
+            retry_policy=retry_policy,
+            on_stage_end=on_stage_end,
+            run_shortcut=run_shortcut,
+        )
+    )
+    return result, ended, shortcuts
+
+
+def test_completed_shortcut_skips_the_agent():
+    agents = _Agents(select_flight=[_succeeded()], traveler_info=[_succeeded()])
+    result, ended, shortcuts = _run(agents, shortcut_completes=True)
+
+    assert result.success and result.failed_stage is None
+    assert shortcuts == ["search_flights"]
+    assert agents.created == ["select_flight", "traveler_info"]
+    search = result.outcomes[0]
+    assert search.shortcut and search.status == "success"
+    assert (search.attempts, search.steps, search.total_tokens) == (0, 0, 0)
+    assert ended == ["search_flights", "select_flight", "traveler_info"]
+    assert result.total_steps == 4
+
+
+def test_failed_attempt_is_retried_with_a_fresh_agent():
+    agents = _Agents(
+        search_flights=[_succeeded()],
+        select_flight=[_failed(), _succeeded()],
+        traveler_info=[_succeeded()],
+    )
+    result, _, _ = _run(
+        agents, shortcut_completes=False, retry_policy=RetryPolicy(max_attempts=2)
+    )
+
+    assert result.success
+    assert agents.created == [
+        "search_flights",
+        "select_flight",
+        "select_flight",
+        "traveler_info",
+    ]
+    select = result.outcomes[1]
+    assert (select.status, select.attempts, select.steps) == ("success", 2, 5)
+    assert select.total_tokens == 220 and select.step_seconds == [0.5] * 5
+    assert not result.outcomes[0].shortcut
+
+
+def test_failed_stage_stops_the_later_stages():
+    agents = _Agents(search_flights=[_succeeded()], select_flight=[_failed()])
+    result, ended, _ = _run(agents, shortcut_completes=False)
+
+    assert not result.success
+    assert result.failed_stage == "select_flight"
+    assert [o.status for o in result.outcomes] == ["success", "failed", "skipped"]
+    assert result.outcomes[1].error == "no fares"
+    assert agents.created == ["search_flights", "select_flight"]
+    # skipped stages never ran, so they don't end
+    assert ended == ["search_flights", "select_flight"]
+
+
+def test_raising_agent_is_an_error():
+    class _Raising(_Agent):
+        async def run(self, max_steps: int):
+            raise RuntimeError("browser closed")
+
+    result = asyncio.run(
+        run_pipeline(
+            run_id="run-1",
+            stages=STAGES[1:],
+            make_agent=lambda stage: _Raising(stage, _failed(steps=2)),
+            model=MODEL,
+        )
+    )
+    outcome = result.outcomes[0]
+    assert (outcome.status, outcome.error, outcome.steps) == (
+        "error",
+        "browser closed",
+        2,
+    )
+    assert result.failed_stage == "select_flight"
+    assert result.outcomes[1].status == "skipped"
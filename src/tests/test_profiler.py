@@ -0,0 +1,112 @@
+import asyncio
+import base64
+import io
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("browser_use")
+pytest.importorskip("playwright")
+
+from PIL import Image  # noqa: E402
+
+from agent.profiler import CATEGORIES, StepProfiler  # noqa: E402
+from agent.screenshots import ScreenshotPipeline, ScreenshotSettings  # noqa: E402
+from agent.stability import WAIT_FOR_QUIET_DOM_JS, PageStability  # noqa: E402
+
+
+def _png(width: int = 1600, height: int = 900) -> str:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (40, 120, 200)).save(out, format="PNG")
+    return base64.b64encode(out.getvalue()).decode()
+
+
+class _Page:
+    url = "https://mock.test/search"
+
+    async def evaluate(self, script, *args):
+        if script == WAIT_FOR_QUIET_DOM_JS:
+            return {"settled": True, "animations": 0}
+        # no focus region, the screenshot is not cropped
+        return None
+
+
+class _Session:
+    """The parts of BrowserSession the patchers and the profiler touch"""
+
+    browser_context = None
+    browser_profile = SimpleNamespace(wait_for_network_idle_page_load_time=0.5)
+
+    def __init__(self):
+        self.page = _Page()
+
+    async def get_current_page(self):
+        return self.page
+
+    async def _check_and_handle_navigation(self, page):
+        pass
+
+    async def _wait_for_stable_network(self):
+        await asyncio.sleep(0.5)
+
+    async def _wait_for_page_and_frames_load(self, timeout_overwrite=None):
+        await self._wait_for_stable_network()
+
+    async def take_screenshot(self):
+        return _png()
+
+    async def get_state_summary(self, cache_clickable_elements_hashes=True):
+        await self._wait_for_page_and_frames_load()
+        await self.take_screenshot()
+        await asyncio.sleep(0.005)
+        return SimpleNamespace(url=self.page.url)
+
+
+class _LLM:
+    async def ainvoke(self, messages):
+        await asyncio.sleep(0.005)
+
+
+class _Registry:
+    async def execute_action(self, name, params, **kwargs):
+        await asyncio.sleep(0.005)
+
+
+class _Agent:
+    def __init__(self, session: _Session, llm: _LLM):
+        self.session = session
+        self.llm = llm
+        self.state = SimpleNamespace(n_steps=1)
+        self.controller = SimpleNamespace(registry=_Registry())
+
+    async def step(self):
+        await self.session.get_state_summary()
+        await self.llm.ainvoke([])
+        await asyncio.sleep(0.005)
+        await self.controller.registry.execute_action("click_element_by_index", {})
+        self.state.n_steps += 1
+
+
+def test_every_category_is_profiled_with_the_default_patchers():
+    session = _Session()
+    llm = _LLM()
+    # the same order as do_flight_booking
+    PageStability(session, quiet=0.01)
+    ScreenshotPipeline(session, ScreenshotSettings(crop_to_focus=True))
+    profiler = StepProfiler("run-1", session, llm)
+    profiler.stage = "search_flights"
+    agent = _Agent(session, llm)
+    profiler.instrument_agent(agent)
+
+    async def run():
+        for _ in range(2):
+            await agent.step()
+
+    asyncio.run(run())
+    summary = profiler.stage_summary("search_flights")
+    for category in CATEGORIES:
+        assert summary[category]["spans"] > 0, category
+        assert summary[category]["seconds"] > 0, category
+    assert summary["steps"] == 2
+    # PageStability replaces the 0.5s network idle wait, and its stability wait is what gets timed
+    assert summary["page_wait"]["seconds"] < 0.5
@@ -0,0 +1,208 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from agent.run_archive import RetentionPolicy, RunArchive, archive_replayed_steps
+
+NOW = datetime(2025, 9, 1, 12)
+
+
+def _step(number: int, screenshot: str | None = "c2NyZWVuc2hvdA==") -> dict:
+    return {"model_output": {"action": number}, "state": {"screenshot": screenshot}}
+
+
+def _archive_run(archive: RunArchive, run_id: str = "run-1") -> RunArchive:
+    writer = archive.open_run(run_id, site="mock")
+    for number in (1, 2):
+        writer.append(
+            "step", _step(number), stage="select_flight", attempt=1, step=number
+        )
+    writer.finish(None)
+    return archive
+
+
+def test_compaction_moves_the_run_to_a_new_file(tmp_path):
+    archive = _archive_run(RunArchive(str(tmp_path), codec="gzip"))
+    run = archive.get_run("run-1")
+    old_path = archive.file_path(run)
+    old_run_path = run.path
+
+    freed = archive.compact_run(run)
+
+    compacted = archive.get_run("run-1")
+    assert compacted.path != old_run_path and compacted.compacted_at is not None
+    assert not os.path.exists(old_path)
+    assert os.path.getsize(archive.file_path(compacted)) == compacted.stored_bytes
+    assert freed > 0
+    assert archive.read_step("run-1", "select_flight", 2) == _step(2, screenshot=None)
+
+
+def test_reader_that_opened_the_run_before_compaction_finishes_reading(tmp_path):
+    archive = _archive_run(RunArchive(str(tmp_path), codec="gzip"))
+    records = archive.iter_records("run-1", kind="step")
+    first = next(records)
+
+    archive.compact_run(archive.get_run("run-1"))
+
+    assert first["data"] == _step(1)
+    assert next(records)["data"] == _step(2)
+
+
+def test_replayed_steps_are_archived(tmp_path):
+    archive = RunArchive(str(tmp_path), codec="gzip")
+    writer = archive.open_run("run-1", site="mock")
+    cached = [
+        {"action": "click_element_by_index", "params": {"index": n}} for n in (3, 5)
+    ]
+
+    class _Replayer:
+        async def replay(self, stage_name, initial_actions):
+            steps = [SimpleNamespace(model_dump=lambda s=s: s) for s in cached]
+            return SimpleNamespace(steps=steps, completed=True)
+
+    replayer = _Replayer()
+    archive_replayed_steps(replayer, writer)
+    asyncio.run(replayer.replay("search_flights", None))
+    writer.finish(None)
+
+    records = list(archive.iter_records("run-1", kind="replayed_step"))
+    assert [record["data"] for record in records] == cached
+    assert [record["step"] for record in records] == [1, 2]
+    assert {record["stage"] for record in records} == {"search_flights"}
+
+
+def test_read_step_reads_the_last_attempt_unless_asked(tmp_path):
+    archive = RunArchive(str(tmp_path), codec="gzip")
+    writer = archive.open_run("run-1", site="mock")
+    for attempt in (1, 2):
+        for number in (1, 2):
+            writer.append(
+                "step",
+                _step(number) | {"attempt": attempt},
+                stage="select_flight",
+                attempt=attempt,
+                step=number,
+            )
+    writer.append("summary", {"success": True})
+    writer.finish(None)
+
+    assert archive.read_step("run-1", "select_flight", 2)["attempt"] == 2
+    assert archive.read_step("run-1", "select_flight", 2, attempt=1) == _step(2) | {
+        "attempt": 1
+    }
+    with pytest.raises(KeyError):
+        archive.read_step("run-1", "select_flight", 3)
+    with pytest.raises(KeyError):
+        archive.read_step("run-2", "select_flight", 1)
+
+    run = archive.get_run("run-1")
+    assert run.records == 5 and run.status == "failed"
+    assert os.path.getsize(archive.file_path(run)) == run.stored_bytes
+    assert [r.kind for r in archive.records("run-1")] == ["step"] * 4 + ["summary"]
+    assert [r["data"] for r in archive.iter_records("run-1", kind="summary")] == [
+        {"success": True}
+    ]
+
+
+def test_reopened_run_appends_after_its_records(tmp_path):
+    archive = _archive_run(RunArchive(str(tmp_path), codec="gzip"))
+    writer = archive.open_run("run-1")
+    assert writer.append("mock_checks", {"purchased": False}) == 2
+    writer.close()
+    assert [r["kind"] for r in archive.iter_records("run-1")] == [
+        "step",
+        "step",
+        "mock_checks",
+    ]
+
+
+def _aged_run(
+    archive: RunArchive, run_id: str, days_old: float, succeeded: bool | None
+) -> None:
+    writer = archive.open_run(
+        run_id, site="mock", started_at=NOW - timedelta(days=days_old)
+    )
+    writer.append("step", _step(1), stage="select_flight", attempt=1, step=1)
+    if succeeded is None:
+        # still running
+        writer.close()
+    else:
+        writer.finish(
+            SimpleNamespace(success=succeeded, failed_stage=None, outcomes=[])
+        )
+
+
+def _retention_archive(tmp_path) -> RunArchive:
+    archive = RunArchive(str(tmp_path), codec="gzip")
+    _aged_run(archive, "old-success", 40, succeeded=True)
+    _aged_run(archive, "old-failure", 40, succeeded=False)
+    _aged_run(archive, "expired-failure", 100, succeeded=False)
+    _aged_run(archive, "week-old", 10, succeeded=True)
+    _aged_run(archive, "recent", 1, succeeded=True)
+    _aged_run(archive, "running", 0.5, succeeded=None)
+    # never finished, e.g. the worker was killed
+    _aged_run(archive, "stale", 5, succeeded=None)
+    _aged_run(archive, "abandoned", 200, succeeded=None)
+    return archive
+
+
+def test_retention_deletes_expired_runs_and_compacts_older_ones(tmp_path):
+    archive = _retention_archive(tmp_path)
+    report = archive.apply_retention(RetentionPolicy(), now=NOW)
+
+    assert sorted(report.stale_runs) == ["abandoned", "stale"]
+    assert sorted(report.deleted_runs) == [
+        "abandoned",
+        "expired-failure",
+        "old-success",
+    ]
+    assert sorted(report.compacted_runs) == ["old-failure", "week-old"]
+    assert report.freed_bytes > 0
+    assert sorted(run.run_id for run in archive.runs()) == [
+        "old-failure",
+        "recent",
+        "running",
+        "stale",
+        "week-old",
+    ]
+    assert archive.get_run("stale").status == "failed"
+    assert archive.get_run("running").status == "running"
+    assert archive.read_step("week-old", "select_flight", 1) == _step(1, None)
+    assert archive.read_step("recent", "select_flight", 1) == _step(1)
+
+
+def test_retention_dry_run_changes_nothing(tmp_path):
+    archive = _retention_archive(tmp_path)
+    before = archive.runs()
+    report = archive.apply_retention(RetentionPolicy(), now=NOW, dry_run=True)
+    assert sorted(report.stale_runs) == ["abandoned", "stale"]
+    assert sorted(report.deleted_runs) == [
+        "abandoned",
+        "expired-failure",
+        "old-success",
+    ]
+    assert archive.runs() == before
+
+
+def test_retention_deletes_the_oldest_runs_over_the_size_budget(tmp_path):
+    archive = _retention_archive(tmp_path)
+    newest = archive.get_run("recent")
+    policy = RetentionPolicy(
+        max_age_days=None,
+        failed_max_age_days=None,
+        compact_after_days=None,
+        max_total_mb=newest.stored_bytes / 2**20,
+    )
+    report = archive.apply_retention(policy, now=NOW)
+    assert sorted(report.deleted_runs) == [
+        "abandoned",
+        "expired-failure",
+        "old-failure",
+        "old-success",
+        "stale",
+        "week-old",
+    ]
+    assert sorted(run.run_id for run in archive.runs()) == ["recent", "running"]
@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import dataclasses
+import io
+
+import pytest
+
+pytest.importorskip("browser_use")
+
+from PIL import Image  # noqa: E402
+
+from agent.screenshots import ScreenshotPipeline, ScreenshotSettings  # noqa: E402
+
+
+def _png(width: int = 1600, height: int = 900, dialog: bool = False) -> str:
+    image = Image.new("RGB", (width, height), (40, 120, 200))
+    if dialog:
+        image.paste((250, 250, 250), (width // 4, height // 4, width // 2, height // 2))
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return base64.b64encode(out.getvalue()).decode()
+
+
+def _size(screenshot_b64: str) -> tuple[int, int]:
+    return Image.open(io.BytesIO(base64.b64decode(screenshot_b64))).size
+
+
+@dataclasses.dataclass
+class _State:
+    """Stands in for browser-use's BrowserStateSummary dataclass"""
+
+    url: str
+    screenshot: str | None
+
+
+class _Page:
+    def __init__(self, region=None):
+        self.region = region
+
+    async def evaluate(self, script, *args):
+        return self.region
+
+
+class _Session:
+    def __init__(self, screenshots: list[str], region=None):
+        self.screenshots = iter(screenshots)
+        self.page = _Page(region)
+
+    async def get_current_page(self):
+        return self.page
+
+    async def take_screenshot(self):
+        return next(self.screenshots)
+
+
+class _MessageManager:
+    def __init__(self):
+        self.states = []
+
+    def add_state_message(self, browser_state_summary, model_output=None):
+        self.states.append(browser_state_summary)
+
+
+def _agent():
+    return type("Agent", (), {"_message_manager": _MessageManager()})()
+
+
+def test_llm_gets_processed_screenshot_and_history_keeps_original():
+    original = _png()
+    session = _Session([original])
+    pipeline = ScreenshotPipeline(session, ScreenshotSettings(max_width=800))
+    agent = _agent()
+    pipeline.instrument_agent(agent)
+
+    state = _State(
+        url="https://mock.test", screenshot=asyncio.run(session.take_screenshot())
+    )
+    agent._message_manager.add_state_message(state)
+
+    assert state.screenshot == original
+    sent = agent._message_manager.states[0].screenshot
+    assert _size(sent) == (800, 450)
+    assert Image.open(io.BytesIO(base64.b64decode(sent))).format == "JPEG"
+    assert pipeline.stats.bytes_after > 0
+
+
+def test_duplicate_is_skipped_for_the_llm_only():
+    session = _Session([_png(), _png(), _png(dialog=True)])
+    pipeline = ScreenshotPipeline(session, ScreenshotSettings(crop_to_focus=False))
+    agent = _agent()
+    pipeline.instrument_agent(agent)
+
+    states = []
+    for _ in range(3):
+        screenshot = asyncio.run(session.take_screenshot())
+        states.append(_State(url="https://mock.test", screenshot=screenshot))
+        agent._message_manager.add_state_message(states[-1])
+
+    sent = [state.screenshot for state in agent._message_manager.states]
+    assert sent[0] is not None and sent[1] is None and sent[2] is not None
+    assert all(state.screenshot is not None for state in states)
+    assert pipeline.stats.summary()["sent"] == 2
+
+
+def test_crop_to_focus_region():
+    region = {"x": 100, "y": 100, "width": 300, "height": 200, "scale": 1}
+    session = _Session([], region=region)
+    pipeline = ScreenshotPipeline(session, ScreenshotSettings(crop_margin=0))
+    processed = asyncio.run(pipeline.process(_png()))
+    assert _size(processed) == (300, 200)
+    assert pipeline.stats.cropped == 1
+
+
+def test_unknown_screenshots_pass_through():
+    session = _Session([_png()])
+    pipeline = ScreenshotPipeline(session)
+    agent = _agent()
+    pipeline.instrument_agent(agent)
+    asyncio.run(session.take_screenshot())
+
+    other = _State(url="https://mock.test", screenshot=_png(dialog=True))
+    agent._message_manager.add_state_message(other)
+    assert agent._message_manager.states[0] is other
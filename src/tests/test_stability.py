@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("browser_use")
+pytest.importorskip("playwright")
+
+from agent.stability import WAIT_FOR_QUIET_DOM_JS, PageStability  # noqa: E402
+
+
+class _Page:
+    url = "https://mock.test/search"
+
+    async def evaluate(self, script, *args):
+        assert script == WAIT_FOR_QUIET_DOM_JS
+        return {"settled": True, "animations": 0}
+
+
+class _Session:
+    """Mirrors the structure of BrowserSession's page-load wait"""
+
+    browser_context = None
+    browser_profile = SimpleNamespace(
+        wait_for_network_idle_page_load_time=0.5, minimum_wait_page_load_time=0.1
+    )
+
+    def __init__(self):
+        self.page = _Page()
+        self.navigation_checks = 0
+
+    async def get_current_page(self):
+        return self.page
+
+    async def _check_and_handle_navigation(self, page):
+        self.navigation_checks += 1
+
+    async def _wait_for_stable_network(self):
+        await asyncio.sleep(self.browser_profile.wait_for_network_idle_page_load_time)
+
+    async def _wait_for_page_and_frames_load(self, timeout_overwrite=None):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await self._wait_for_stable_network()
+        await self._check_and_handle_navigation(self.page)
+        minimum = timeout_overwrite or self.browser_profile.minimum_wait_page_load_time
+        await asyncio.sleep(max(minimum - (loop.time() - start), 0))
+
+
+def _timed(coro) -> float:
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await coro
+        return loop.time() - start
+
+    return asyncio.run(run())
+
+
+def test_page_loads_wait_for_stability_instead_of_network_idle():
+    session = _Session()
+    stability = PageStability(session, quiet=0.01)
+    seconds = _timed(session._wait_for_page_and_frames_load())
+
+    assert seconds < 0.5
+    assert session.navigation_checks == 1
+    stats = stability.reset_stats()
+    assert stats.waits == 1
+    assert stats.fixed_seconds == 0.5
+    assert stats.summary()["saved_seconds"] > 0
+
+
+def test_timeout_overwrite_is_honoured():
+    session = _Session()
+    PageStability(session, quiet=0.01)
+    assert _timed(session._wait_for_page_and_frames_load(timeout_overwrite=0.6)) >= 0.6
+
+
+def test_explicit_waits_replace_no_fixed_delay():
+    session = _Session()
+    stability = PageStability(session, quiet=0.01)
+    asyncio.run(stability.wait(timeout=3))
+    assert stability.stats.fixed_seconds == 0
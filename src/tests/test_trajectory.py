@@ -0,0 +1,223 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("browser_use")
+
+from agent.trajectory import (  # noqa: E402
+    Trajectory,
+    TrajectoryCache,
+    TrajectoryReplayer,
+    TrajectoryStep,
+    index_targets,
+    literal_values,
+    render,
+    replay_trajectory,
+    steps_from_history,
+    templatize,
+    trajectory_params,
+)
+
+PARAMS = trajectory_params(
+    {"origin": "JFK", "destination": "LAX", "departure_date": "2025-08-01"},
+    [{"first_name": "Kenneth", "last_name": "Lin", "gender": "Male"}],
+    {"card_number": "4147 5678 9100", "expiration_date": "09-2026", "cvv": "808"},
+)
+
+
+def test_templatize_replaces_exact_booking_inputs():
+    params = {
+        "index": 4,
+        "text": "Kenneth",
+        "fields": [{"target": "Card number", "value": "4147 5678 9100"}],
+    }
+    assert templatize(params, PARAMS) == {
+        "index": 4,
+        "text": "${passenger1_first_name}",
+        "fields": [{"target": "Card number", "value": "${billing_card_number}"}],
+    }
+    assert templatize("0801", PARAMS) == "${flight_departure_date_mmdd}"
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"index": 3, "text": "Kenneth"},
+        {
+            "fields": [
+                {"target": "Expiry", "value": "09-2026"},
+                {"target": "CVV", "value": "808"},
+            ]
+        },
+        {"text": "costs $5"},
+        {"down": True, "num_pages": 1.5},
+    ],
+)
+def test_render_inverts_templatize(params):
+    assert render(templatize(params, PARAMS), PARAMS) == params
+
+
+def test_render_with_another_passengers_values():
+    other = dict(PARAMS, passenger1_first_name="Alice")
+    assert render(templatize({"text": "Kenneth"}, PARAMS), other) == {"text": "Alice"}
+
+
+def test_render_raises_for_missing_values():
+    with pytest.raises(KeyError):
+        render({"text": "${passenger2_first_name}"}, PARAMS)
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["4147567891 00", "09/26", "Kenneth Lin", "Kenn", "+16263756087"],
+)
+def test_reformatted_and_partial_values_stay_literal(value):
+    templatized = templatize({"index": 1, "text": value}, PARAMS)
+    assert literal_values(templatized) == [value]
+
+
+def test_field_names_are_not_literal_values():
+    templatized = templatize(
+        {"fields": [{"target": "First name", "value": "Kenneth"}]}, PARAMS
+    )
+    assert literal_values(templatized) == []
+
+
+def _history(*actions: tuple[str, dict]):
+    """AgentHistoryList stand-in with one step per action, all of which succeeded"""
+    items = [
+        SimpleNamespace(
+            model_output=SimpleNamespace(
+                action=[
+                    SimpleNamespace(model_dump=lambda exclude_none, a=a: {a[0]: a[1]})
+                ]
+            ),
+            result=[SimpleNamespace(error=None)],
+            state=SimpleNamespace(interacted_element=[None], url="https://mock/pay"),
+        )
+        for a in actions
+    ]
+    return SimpleNamespace(history=items)
+
+
+class _Session:
+    async def get_current_page(self):
+        return SimpleNamespace(url="https://mock/review")
+
+
+def _replayer(tmp_path) -> TrajectoryReplayer:
+    return TrajectoryReplayer(
+        TrajectoryCache(str(tmp_path)),
+        site="mock",
+        variant="one_way",
+        params=PARAMS,
+        controller=None,
+        browser_session=_Session(),
+    )
+
+
+def test_sensitive_stage_with_literal_values_is_not_recorded(tmp_path):
+    replayer = _replayer(tmp_path)
+    history = _history(
+        ("input_text", {"index": 2, "text": "4147 5678 9100"}),
+        ("input_text", {"index": 3, "text": "09/26"}),
+    )
+    asyncio.run(replayer.record("payment_info", [], history))
+    assert replayer.cache.load("mock", "one_way", "payment_info") is None
+
+
+def test_sensitive_stage_with_only_placeholders_is_recorded(tmp_path):
+    replayer = _replayer(tmp_path)
+    history = _history(
+        ("input_text", {"index": 2, "text": "4147 5678 9100"}),
+        ("click_element_by_index", {"index": 7}),
+    )
+    asyncio.run(replayer.record("payment_info", [], history))
+    trajectory = replayer.cache.load("mock", "one_way", "payment_info")
+    assert [step.params for step in trajectory.steps] == [
+        {"index": 2, "text": "${billing_card_number}"},
+        {"index": 7},
+    ]
+
+
+def test_other_stages_keep_literal_values(tmp_path):
+    replayer = _replayer(tmp_path)
+    history = _history(("send_keys", {"keys": "Enter"}))
+    asyncio.run(replayer.record("search_flights", [], history))
+    assert replayer.cache.load("mock", "one_way", "search_flights") is not None
+
+
+def test_sensitive_trajectory_with_literal_values_is_not_replayed(tmp_path):
+    replayer = _replayer(tmp_path)
+    history = _history(("input_text", {"index": 2, "text": "Kenneth Lin"}))
+    replayer.sensitive_stages = set()
+    asyncio.run(replayer.record("traveler_info", [], history))
+    replayer.sensitive_stages = {"traveler_info"}
+    assert asyncio.run(replayer.replay("traveler_info", None)) is None
+
+
+def test_steps_from_history_templatizes_params():
+    steps = steps_from_history(
+        _history(("input_text", {"index": 2, "text": "Lin"})), PARAMS
+    )
+    assert steps[0].params == {"index": 2, "text": "${passenger1_last_name}"}
+
+
+def _fill_form(*targets: str) -> tuple[str, dict]:
+    return (
+        "fill_form",
+        {"fields": [{"target": t, "value": "Kenneth"} for t in targets]},
+    )
+
+
+def test_index_targets():
+    assert index_targets(_fill_form("12", "First name", " 7 ")[1]) == ["12", " 7 "]
+    assert index_targets({"index": 3, "text": "Kenneth"}) == []
+
+
+def test_fill_form_with_index_targets_is_not_recorded(tmp_path):
+    replayer = _replayer(tmp_path)
+    asyncio.run(replayer.record("traveler_info", [], _history(_fill_form("12"))))
+    assert replayer.cache.load("mock", "one_way", "traveler_info") is None
+
+
+def test_fill_form_with_label_targets_is_recorded(tmp_path):
+    replayer = _replayer(tmp_path)
+    asyncio.run(
+        replayer.record("traveler_info", [], _history(_fill_form("First name")))
+    )
+    trajectory = replayer.cache.load("mock", "one_way", "traveler_info")
+    assert trajectory.steps[0].params == {
+        "fields": [{"target": "First name", "value": "${passenger1_first_name}"}]
+    }
+
+
+class _Registry:
+    def __init__(self):
+        self.calls = []
+
+    async def execute_action(self, name, params, **kwargs):
+        self.calls.append(name)
+
+
+class _ReplaySession(_Session):
+    async def get_browser_state_with_recovery(self, **kwargs):
+        return SimpleNamespace(url="https://mock/pay", element_tree=None)
+
+
+def test_replay_stops_at_index_targets_in_a_cached_trajectory():
+    action, params = _fill_form("12")
+    trajectory = Trajectory(
+        site="mock",
+        variant="one_way",
+        stage="traveler_info",
+        steps=[TrajectoryStep(action=action, params=params, url="https://mock/pay")],
+    )
+    controller = SimpleNamespace(registry=_Registry())
+    result = asyncio.run(
+        replay_trajectory(trajectory, controller, _ReplaySession(), PARAMS, delay=0)
+    )
+    assert not result.completed and result.replayed_steps == 0
+    assert "can't be remapped" in result.diverged_reason
+    assert controller.registry.calls == []
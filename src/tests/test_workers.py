@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+
+from agent.artifacts import ArtifactWriter
+from agent.assistance import AssistanceBroker
+from agent.pipeline import PipelineResult, StageOutcome
+from agent.workers import WorkerLimits, run_booking_worker
+
+
+async def stub_booking(
+    run_id: str, artifact_dir: str, assistance_broker=None, on_stage_end=None
+) -> PipelineResult:
+    """Does what do_flight_booking does around its agents, without a browser"""
+    # the artifact writer starts its own process pool, like every real booking
+    writer = ArtifactWriter(max_workers=1)
+    await writer.submit_json(
+        os.path.join(artifact_dir, "summary.json"), {"run": run_id}
+    )
+    writer.shutdown(wait=True)
+    request = await assistance_broker.request("enter the code", booking_id=run_id)
+    outcome = StageOutcome(
+        stage="search", status="success", final_result=request.answer
+    )
+    await on_stage_end(outcome)
+    return PipelineResult(run_id=run_id, outcomes=[outcome])
+
+
+def test_booking_runs_end_to_end_in_a_worker(tmp_path):
+    broker = AssistanceBroker()
+    broker.on_request(lambda request: broker.answer(request.request_id, "1234"))
+    reported = []
+
+    async def on_stage_end(outcome: StageOutcome):
+        reported.append(outcome)
+
+    result = asyncio.run(
+        run_booking_worker(
+            {"run_id": "run-1", "artifact_dir": str(tmp_path)},
+            limits=WorkerLimits(timeout_seconds=60, poll_seconds=0.1),
+            on_stage_end=on_stage_end,
+            assistance_broker=broker,
+            booking_fn=stub_booking,
+        )
+    )
+
+    assert result.status == "succeeded", result.error
+    assert result.result.outcomes[0].final_result == "1234"
+    assert [outcome.stage for outcome in reported] == ["search"]
+    with open(tmp_path / "summary.json", encoding="utf-8") as f:
+        assert json.load(f) == {"run": "run-1"}
+    assert result.usage.peak_rss_mb > 0